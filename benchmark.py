@@ -0,0 +1,846 @@
+"""密码管理器性能测试脚本
+
+用法：
+    python benchmark.py container [--size-mb 50]    比较 JSON 包装格式、二进制容器和只解密元数据（lazy）的加载耗时和内存峰值
+    python benchmark.py stream [--size-mb 50]       比较 JSON 导出与分块流式导出的耗时和内存峰值
+    python benchmark.py kdf [--target-ms 250]       比较各密钥派生算法和参数的耗时，并给出本机校准结果
+    python benchmark.py search                      比较逐条扫描与三元组索引在 1k/10k/100k 条目下的搜索和逐字输入耗时，以及后台搜索的首批结果耗时
+    python benchmark.py quick [--entries 50000]     快速搜索（模糊匹配）每次按键的耗时
+    python benchmark.py query [--entries 100000]    比较字段查询语法逐条判断与查询计划的耗时
+    python benchmark.py pinyin [--entries 100000]   中文标题用拼音全拼、首字母查询的耗时，以及生成拼音检索键前后的建索引耗时
+    python benchmark.py details [--entries 200]     比较富文本 QLabel 与字段控件在浏览列表时显示详情的耗时
+    python benchmark.py theme [--entries 1000]      比较整张样式表重新设置与只更换调色板切换主题的耗时
+    python benchmark.py dialogs                     比较每次新建对话框与重复使用对话框从打开到显示完成的耗时
+    python benchmark.py startup                     比较解锁时重建搜索索引与读取索引缓存在 1k/10k/100k 条目下的耗时
+    python benchmark.py groups [--entries 100000]   比较扫描全部条目与分组索引的分组切换和分组内搜索耗时
+    python benchmark.py list                        比较 QListWidget 与 QListView+模型在 100/10k/200k 条目下的刷新耗时和内存
+"""
+import argparse
+import gc
+import itertools
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+import types
+
+import password_manager as pm
+
+
+def iter_entries(size_mb, note_size=10 * 1024):
+    """逐条生成测试条目，避免测试数据本身占用内存"""
+    for i in range(max(1, size_mb * 1024 * 1024 // note_size)):
+        yield {
+            'id': pm.new_entry_id(),
+            'title': f'站点{i}',
+            'username': f'user{i}@example.com',
+            'password': f'Pa55word!{i}',
+            'url': f'https://site{i}.example.com/login',
+            'notes': ('note %d: lorem ipsum ' % i) * (note_size // 24),
+            'group': '默认分组'
+        }
+
+
+def make_entries(size_mb, note_size=10 * 1024):
+    """生成总大小约为 size_mb 的测试条目"""
+    return list(iter_entries(size_mb, note_size))
+
+
+def fake_manager(session_key, data_file, lazy=False):
+    """只包含解密所需属性的替身对象，用于在没有窗口的情况下调用 PasswordManager.decrypt_data"""
+    return types.SimpleNamespace(
+        session_key=session_key,
+        record_vault=pm.RecordVault(data_file, lazy=lazy),
+        loaded_version=None,
+        show_messagebox=lambda *args: print(args)
+    )
+
+
+def max_rss_mb():
+    """进程的物理内存峰值（MB）"""
+    # ru_maxrss 在 Linux 上会继承 fork 前父进程的峰值，优先读取 VmHWM
+    if os.path.exists('/proc/self/status'):
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux 单位为 KB，macOS 为字节
+    return usage / 1024 / 1024 if sys.platform == 'darwin' else usage / 1024
+
+
+def container_child(fmt, directory, trace):
+    """在独立进程中加载一次，输出耗时和内存峰值
+
+    tracemalloc 会拖慢内存分配，因此耗时和堆峰值分两个进程测量。"""
+    with open(os.path.join(directory, 'key.bin'), 'rb') as f:
+        session_key = pm.SessionKey(f.read())
+    rss_before = max_rss_mb()
+    if trace:
+        tracemalloc.start()
+    start = time.perf_counter()
+    if fmt == 'json':
+        data_file = os.path.join(directory, 'vault_v1.json')
+        with open(data_file, 'r', encoding='utf-8') as f:
+            entries = pm.PasswordManager.decrypt_data(fake_manager(session_key, data_file), f.read())
+    else:
+        data_file = os.path.join(directory, 'vault_v2.json')
+        manager = fake_manager(session_key, data_file, lazy=fmt == 'lazy')
+        with open(data_file, 'rb') as f:
+            with pm.mmap.mmap(f.fileno(), 0, access=pm.mmap.ACCESS_READ) as mm:
+                entries = pm.PasswordManager.decrypt_data(manager, mm)
+    elapsed = time.perf_counter() - start
+    peak = 0
+    if trace:
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    print(json.dumps({
+        'entries': len(entries),
+        'seconds': elapsed,
+        'heap_peak_mb': peak / 1024 / 1024,
+        'rss_growth_mb': max_rss_mb() - rss_before
+    }))
+
+
+def run_child(args):
+    """在新进程中运行测试，返回最后一行输出的 JSON 结果"""
+    output = subprocess.run(
+        [sys.executable, __file__] + args,
+        capture_output=True, text=True, check=True
+    ).stdout.strip().splitlines()[-1]
+    return json.loads(output)
+
+
+def run_container(size_mb):
+    entries = make_entries(size_mb)
+    with tempfile.TemporaryDirectory() as directory:
+        session_key = pm.SessionKey(pm.get_random_bytes(32))
+        with open(os.path.join(directory, 'key.bin'), 'wb') as f:
+            f.write(session_key.key)
+
+        # 1.0：JSON 包装 + base64 密文
+        manager = types.SimpleNamespace(session_key=session_key, show_messagebox=lambda *args: print(args))
+        with open(os.path.join(directory, 'vault_v1.json'), 'w', encoding='utf-8') as f:
+            f.write(pm.PasswordManager.encrypt_data(manager, entries))
+        # 2.0：二进制容器 + 记录文件
+        pm.RecordVault(os.path.join(directory, 'vault_v2.json')).write_all(session_key, entries)
+        del entries
+
+        sizes = {
+            'json': os.path.getsize(os.path.join(directory, 'vault_v1.json')),
+            'binary': sum(os.path.getsize(os.path.join(directory, name))
+                          for name in os.listdir(directory) if name.startswith('vault_v2'))
+        }
+        sizes['lazy'] = sizes['binary']
+        print(f"{'格式':<10}{'条目数':>8}{'文件大小(MB)':>14}{'加载耗时(s)':>12}{'堆峰值(MB)':>12}{'RSS增长(MB)':>13}")
+        for fmt in ('json', 'binary', 'lazy'):
+            timing = run_child(['container', '--child', fmt, '--dir', directory])
+            memory = run_child(['container', '--child', fmt, '--dir', directory, '--trace'])
+            print(f"{fmt:<10}{timing['entries']:>8}{sizes[fmt] / 1024 / 1024:>14.1f}"
+                  f"{timing['seconds']:>12.3f}{memory['heap_peak_mb']:>12.1f}{timing['rss_growth_mb']:>13.1f}")
+
+
+def measure(func):
+    """运行一次，返回 (耗时, 堆峰值MB)"""
+    start = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - start
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak / 1024 / 1024
+
+
+def run_stream(size_mb):
+    session_key = pm.SessionKey(pm.get_random_bytes(32))
+    salt = pm.get_random_bytes(16)
+    manager = types.SimpleNamespace(session_key=session_key, show_messagebox=lambda *args: print(args))
+    with tempfile.TemporaryDirectory() as directory:
+        json_file = os.path.join(directory, 'backup.json')
+        stream_file = os.path.join(directory, 'backup.pmv')
+
+        def export_json():
+            # 1.0 导出需要先在内存中拼出完整的明文和密文
+            with open(json_file, 'w', encoding='utf-8') as f:
+                f.write(pm.PasswordManager.encrypt_data(manager, list(iter_entries(size_mb))))
+
+        def import_json():
+            with open(json_file, 'r', encoding='utf-8') as f:
+                pm.PasswordManager.decrypt_data(fake_manager(session_key, json_file), f.read())
+
+        def export_stream():
+            with open(stream_file, 'wb') as f:
+                pm.StreamVault.write(f, session_key, salt, iter_entries(size_mb))
+
+        def import_stream():
+            with open(stream_file, 'rb') as f:
+                _, _, header = pm.StreamVault.read_header(f)
+                for _ in pm.StreamVault.iter_entries(f, session_key.key, header):
+                    pass
+
+        print(f"{'操作':<16}{'耗时(s)':>10}{'堆峰值(MB)':>12}")
+        for name, func in (('json 导出', export_json), ('json 导入', import_json),
+                           ('stream 导出', export_stream), ('stream 导入', import_stream)):
+            elapsed, peak = measure(func)
+            print(f"{name:<16}{elapsed:>10.3f}{peak:>12.1f}")
+
+
+KDF_PARAM_SETS = [
+    pm.LEGACY_KDF_PARAMS,
+    {'name': 'pbkdf2-sha256', 'iterations': 100000},
+    {'name': 'pbkdf2-sha256', 'iterations': 300000},
+    {'name': 'pbkdf2-sha256', 'iterations': 600000},
+    {'name': 'scrypt', 'n': 2 ** 14, 'r': 8, 'p': 1},
+    {'name': 'scrypt', 'n': 2 ** 15, 'r': 8, 'p': 1},
+    {'name': 'scrypt', 'n': 2 ** 16, 'r': 8, 'p': 1},
+    {'name': 'scrypt', 'n': 2 ** 17, 'r': 8, 'p': 1},
+]
+
+
+def describe_kdf(kdf_params):
+    return ' '.join(f"{field}={kdf_params[field]}" for field in pm.KDF_FIELDS[kdf_params['name']])
+
+
+def run_kdf(target_ms):
+    print(f"{'算法':<16}{'参数':<24}{'耗时(ms)':>10}{'内存(MB)':>10}")
+    for kdf_params in KDF_PARAM_SETS:
+        elapsed = pm.time_kdf(kdf_params, rounds=3)
+        memory = 128 * kdf_params['n'] * kdf_params['r'] / 1024 / 1024 if kdf_params['name'] == 'scrypt' else 0
+        print(f"{kdf_params['name']:<16}{describe_kdf(kdf_params):<24}{elapsed * 1000:>10.1f}{memory:>10.0f}")
+    print(f"\n校准结果（目标 {target_ms} ms）：")
+    for name in ('pbkdf2-sha256', 'scrypt'):
+        kdf_params = pm.calibrate_kdf(name, target_ms)
+        elapsed = pm.time_kdf(kdf_params, rounds=3)
+        print(f"{name:<16}{describe_kdf(kdf_params):<24}{elapsed * 1000:>10.1f}")
+
+
+def linear_search(entries, text):
+    """索引之前 search_passwords 的做法：逐条转小写后查找子串，字段与索引相同以便比较"""
+    text = text.lower()
+    return [entry for entry in entries
+            if text in entry['title'].lower()
+            or text in entry['username'].lower()
+            or text in entry.get('url', '').lower()
+            or text in entry.get('notes', '').lower()]
+
+
+def timeit(func):
+    """运行一次，返回耗时"""
+    start = time.perf_counter()
+    func()
+    return time.perf_counter() - start
+
+
+SEARCH_QUERIES = ['si', 'example', 'user4242', 'nomatch']
+
+
+def run_search(sizes):
+    print(f"{'条目数':>8}{'建索引(s)':>12}{'索引内存(MB)':>14}  {'查询':<10}{'逐条扫描(ms)':>14}{'索引(ms)':>10}{'结果数':>8}")
+    typing = []
+    for size in sizes:
+        # 备注取 64 字节，条目数由 size 决定
+        entries = list(itertools.islice(iter_entries(size * 64 // (1024 * 1024) + 1, note_size=64), size))
+        index = pm.SearchIndex()
+        build_seconds, build_peak = measure(lambda: index.build(entries))
+        for query in SEARCH_QUERIES:
+            linear = min(timeit(lambda: linear_search(entries, query)) for _ in range(3))
+            indexed = min(timeit(lambda: index.search(query)) for _ in range(3))
+            count = len(index.search(query))
+            assert count == len(linear_search(entries, query))
+            print(f"{size:>8}{build_seconds:>12.3f}{build_peak:>14.1f}  {query:<10}"
+                  f"{linear * 1000:>14.2f}{indexed * 1000:>10.2f}{count:>8}")
+        typing.append((size, entries, index))
+
+    # 逐字输入一个 10 个字符的查询：逐条扫描每个字符都要全量扫描一次，
+    # 索引的结果缓存让后面的字符只在上一次的结果里筛选；整段输入重复三次取最快的一次
+    query = 'site4242.e'
+    print(f"\n逐字输入 {query!r}")
+    print(f"{'条目数':>8}{'逐条扫描(ms)':>14}{'索引+缓存(ms)':>15}{'单次全量扫描(ms)':>18}")
+
+    def type_query(index):
+        index.results.clear()
+        return sum(timeit(lambda: index.search(query[:end])) for end in range(1, len(query) + 1))
+
+    for size, entries, index in typing:
+        linear = sum(timeit(lambda: linear_search(entries, query[:end])) for end in range(1, len(query) + 1))
+        indexed = min(type_query(index) for _ in range(3))
+        single = min(timeit(lambda: linear_search(entries, query[:1])) for _ in range(3))
+        print(f"{size:>8}{linear * 1000:>14.2f}{indexed * 1000:>15.2f}{single * 1000:>18.2f}")
+
+
+def linear_query(index, entries, query):
+    """不用索引：对每个条目逐个判断查询中的全部条件"""
+    terms = pm.SearchQuery.parse(index.normalize(query))
+    results = []
+    for entry in entries:
+        for field, text, negated in terms:
+            if field is None:
+                value = '\n'.join(str(entry.get(name) or '').lower() for name in pm.SearchIndex.FIELDS)
+            elif field == 'host':
+                value = index.host(entry)
+            else:
+                value = str(entry.get(field) or '').lower()
+            if (text in value) == negated:
+                break
+        else:
+            results.append(entry)
+    return results
+
+
+QUERY_EXAMPLES = ['host:site4242', 'title:站点42 -user:user421', 'user:user99 notes:lorem',
+                  'group:分组3 site12', '"ipsum note 77"', '-example']
+
+
+def run_query(count):
+    rng = random.Random(1)
+    entries = list(itertools.islice(iter_entries(count * 64 // (1024 * 1024) + 1, note_size=64), count))
+    for entry in entries:
+        entry['group'] = rng.choice(['默认分组'] * 80 + [f'分组{i}' for i in range(20)])
+    index = pm.SearchIndex()
+    index.build(entries)
+    print(f"条目数 {count}")
+    print(f"{'查询':<32}{'逐条判断(ms)':>14}{'查询计划(ms)':>14}{'结果数':>8}")
+    for query in QUERY_EXAMPLES:
+        linear = timeit(lambda: linear_query(index, entries, query))
+        index.results.clear()
+        planned = timeit(lambda: index.search(query))
+        count = len(index.search(query))
+        assert count == len(linear_query(index, entries, query))
+        print(f"{query:<32}{linear * 1000:>14.2f}{planned * 1000:>14.2f}{count:>8}")
+
+
+def run_search_worker(count):
+    """后台搜索从开始查询到第一批结果送出的耗时，和同步查询完整结果的耗时比较"""
+    entries = list(itertools.islice(iter_entries(count * 1024 // (1024 * 1024) + 1, note_size=1024), count))
+    index = pm.SearchIndex()
+    index.build(entries)
+    worker = pm.SearchWorker(index)
+    print(f"条目数 {count}，备注 1 KB")
+    print(f"{'查询':<10}{'同步查询(ms)':>14}{'首批结果(ms)':>14}{'全部结果(ms)':>14}{'批数':>6}{'结果数':>8}")
+    for query in ('site', 'example', 'user4242', 'nomatch'):
+        index.results.clear()
+        sync = timeit(lambda: index.search(query))
+        index.results.clear()
+        # 同步查询留下的大量临时对象先回收，避免回收落在后台查询的计时中
+        gc.collect()
+        times = []
+        done = threading.Event()
+        # 直接在工作线程中记录时间，不经过事件循环
+        worker.batch.connect(lambda generation, batch: times.append((time.perf_counter(), len(batch))),
+                             pm.Qt.ConnectionType.DirectConnection)
+        worker.finished.connect(lambda generation: done.set(), pm.Qt.ConnectionType.DirectConnection)
+        start = time.perf_counter()
+        worker.start(query, None)
+        done.wait()
+        total = time.perf_counter() - start
+        worker.batch.disconnect()
+        worker.finished.disconnect()
+        first = times[0][0] - start if times else total
+        print(f"{query:<10}{sync * 1000:>14.2f}{first * 1000:>14.2f}{total * 1000:>14.2f}"
+              f"{len(times):>6}{sum(size for _, size in times):>8}")
+
+
+def run_startup(sizes):
+    """解锁时的耗时：解密条目之后重建搜索索引，或者从索引缓存文件恢复"""
+    print(f"{'条目数':>8}{'解密(s)':>10}{'重建索引(s)':>13}{'读取缓存(s)':>13}{'缓存(MB)':>10}"
+          f"{'无缓存合计(s)':>15}{'有缓存合计(s)':>15}")
+    for size in sizes:
+        entries = list(itertools.islice(iter_entries(size * 64 // (1024 * 1024) + 1, note_size=64), size))
+        with tempfile.TemporaryDirectory() as directory:
+            session_key = pm.SessionKey(pm.get_random_bytes(32))
+            data_file = os.path.join(directory, 'passwords.json')
+            pm.RecordVault(data_file).write_all(session_key, entries)
+            del entries
+            manager = fake_manager(session_key, data_file)
+            start = time.perf_counter()
+            with open(data_file, 'rb') as f:
+                with pm.mmap.mmap(f.fileno(), 0, access=pm.mmap.ACCESS_READ) as mm:
+                    entries = pm.PasswordManager.decrypt_data(manager, mm)
+            decrypt = time.perf_counter() - start
+
+            index = pm.SearchIndex()
+            rebuild = timeit(lambda: index.build(entries))
+            sidecar = pm.IndexSidecar(data_file)
+            sidecar.write(session_key.key, sidecar.digest(session_key.key, False), index)
+            gc.collect()
+            start = time.perf_counter()
+            restored = sidecar.load(session_key.key, sidecar.digest(session_key.key, False), entries)
+            load = time.perf_counter() - start
+            assert restored.postings == index.postings and restored.groups.members == index.groups.members
+            assert restored.texts == index.texts and restored.fuzzy.labels == index.fuzzy.labels
+            print(f"{size:>8}{decrypt:>10.3f}{rebuild:>13.3f}{load:>13.3f}"
+                  f"{os.path.getsize(sidecar.path) / 1024 / 1024:>10.1f}"
+                  f"{decrypt + rebuild:>15.3f}{decrypt + load:>15.3f}")
+            del index, restored, entries
+            gc.collect()
+
+
+QUICK_WORDS = ['git', 'hub', 'mail', 'bank', 'shop', 'cloud', 'home', 'work', 'amazon', 'google',
+               'apple', 'micro', 'soft', 'steam', 'net', 'box', 'drop', 'slack', 'zoom', 'pay']
+
+
+def run_quick(count):
+    # 标题由常见单词组合而成，比 iter_entries 的编号标题更接近真实的模糊匹配场景
+    rng = random.Random(1)
+    index = pm.FuzzyIndex()
+    for i in range(count):
+        first, second = rng.sample(QUICK_WORDS, 2)
+        index.add({
+            'id': pm.new_entry_id(),
+            'title': f'{first.title()} {second} {i}',
+            'username': f'user{i}@example.com',
+            'url': f'https://{rng.choice(QUICK_WORDS)}{i}.example.com/login'
+        })
+    # 与 SearchIndex.prepare_fuzzy 一样在加载后建好位图和拼接串，不计入逐字输入的耗时
+    build = timeit(index.build_bits)
+    print(f"条目数 {count}，加载后建立字符位图和拼接串 {build * 1000:.1f} ms")
+    print(f"{'逐字输入':<12}{'中位数(ms)':>12}{'最大(ms)':>10}{'结果数':>8}")
+    for query in ('github', 'amzn', 'user4242', 'mail 12', 'zzqx'):
+        # 模拟逐字输入，每个前缀都查询一次
+        timings = []
+        for end in range(1, len(query) + 1):
+            timings.append(min(timeit(lambda: index.search(query[:end])) for _ in range(5)))
+        timings.sort()
+        print(f"{query:<12}{timings[len(timings) // 2] * 1000:>12.2f}{timings[-1] * 1000:>10.2f}"
+              f"{len(index.search(query)):>8}")
+
+
+PINYIN_WORDS = ['支付宝', '微信', '淘宝', '京东', '招商银行', '中国银行', '工商银行', '网易邮箱', '百度网盘',
+                '哔哩哔哩', '重庆银行', '长城宽带', '知乎', '豆瓣', '携程旅行', '美团外卖']
+
+
+def run_pinyin(count):
+    """中文标题用拼音全拼、首字母查询的耗时，和英文查询比较；并比较生成拼音检索键前后的建索引耗时"""
+    rng = random.Random(1)
+    entries = []
+    for i in range(count):
+        entry = {
+            'id': pm.new_entry_id(),
+            'title': f'{rng.choice(PINYIN_WORDS)}{i}' if i % 2 else f'{rng.choice(QUICK_WORDS).title()} {i}',
+            'username': f'user{i}@example.com',
+            'url': f'https://site{i}.example.com/login'
+        }
+        entries.append(entry)
+    keys = pm.pinyin_keys
+    pm.pinyin_keys = lambda text: ''
+    try:
+        plain = timeit(lambda: pm.SearchIndex().build(entries))
+    finally:
+        pm.pinyin_keys = keys
+    index = pm.SearchIndex()
+    build = timeit(lambda: index.build(entries))
+    print(f"条目数 {count}（一半为中文标题），建索引 {plain * 1000:.0f} ms，生成拼音检索键后 {build * 1000:.0f} ms")
+    print(f"{'查询':<14}{'索引查询(ms)':>14}{'快速搜索(ms)':>14}{'结果数':>8}")
+    for query in ('google', 'mail', 'zhifubao', 'zfb', 'yinhang', 'zsyh', '招商'):
+        index.results.clear()
+        planned = min(timeit(lambda: (index.results.clear(), index.search(query))) for _ in range(5))
+        quick = min(timeit(lambda: index.fuzzy.search(query)) for _ in range(5))
+        print(f"{query:<14}{planned * 1000:>14.2f}{quick * 1000:>14.2f}{len(index.search(query)):>8}")
+
+
+def legacy_detail_html(entry):
+    """改造前 show_password_details 生成的富文本表格（浅色主题）"""
+    cell = 'padding: 12px 20px; color: #606266; font-size: 14px;'
+    link = 'color: #67c23a; text-decoration: none; font-size: 14px; transition: color 0.3s;'
+    head = 'background-color: #f5f7fa; padding: 12px 20px; text-align: left; font-weight: 500; color: #909399; font-size: 14px;'
+    rows = [('用户名', entry['username'], 'font-family: Consolas, Monaco, monospace;'),
+            ('密码', entry['password'], 'font-family: Consolas, Monaco, monospace;')]
+    if entry.get('url'):
+        rows.append(('登录地址', f'<a href="{entry["url"]}" style="color: #409eff; text-decoration: none;">{entry["url"]}</a>'
+                     '<span style="color: #909399; margin-left: 8px; font-size: 12px;">(按住Ctrl点击打开)</span>', ''))
+    if entry.get('notes'):
+        rows.append(('备注', entry['notes'], 'white-space: pre-wrap; line-height: 1.5;'))
+    body = ''.join(
+        f'<tr style="background-color: #ffffff;"><td style="{cell}">{name}</td><td style="{cell} {extra}">{value}</td>'
+        f'<td style="padding: 12px 20px; text-align: center;"><a href="copy:{value}" class="el-link" style="{link}">复制</a></td></tr>'
+        for name, value, extra in rows)
+    return ("<div style=\"font-family: 'Microsoft YaHei', '微软雅黑', sans-serif;\">"
+            '<table style="width: 100%; border-collapse: separate; border-spacing: 0; border-radius: 4px; overflow: hidden;">'
+            f'<thead><tr><th style="{head} width: 120px;">字段</th><th style="{head}">内容</th>'
+            f'<th style="{head} text-align: center; width: 120px;">操作</th></tr></thead><tbody>{body}</tbody></table></div>')
+
+
+def run_details(count):
+    """按住方向键在列表中浏览时，每次选中条目到详情显示完成的耗时：富文本 QLabel 与字段控件比较"""
+    os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    app = pm.QApplication.instance() or pm.QApplication([])
+    entries = list(itertools.islice(iter_entries(count * 1024 // (1024 * 1024) + 1, note_size=1024), count))
+    for i, entry in enumerate(entries):
+        if i % 3 == 0:
+            entry['url'] = ''  # 部分条目没有登录地址，详情的行数随选中条目变化
+
+    label = pm.QLabel()
+    label.setWordWrap(True)
+    label.setTextFormat(pm.Qt.TextFormat.RichText)
+    label.setTextInteractionFlags(pm.Qt.TextInteractionFlag.TextSelectableByMouse |
+                                  pm.Qt.TextInteractionFlag.LinksAccessibleByMouse)
+    panel = pm.DetailPanel()
+
+    def browse(widget, show):
+        widget.resize(700, 800)
+        widget.show()
+        app.processEvents()
+        timings = []
+        for entry in entries:
+            start = time.perf_counter()
+            show(entry)
+            # 处理事件直到重新排版和绘制完成
+            widget.repaint()
+            app.processEvents()
+            timings.append(time.perf_counter() - start)
+        widget.hide()
+        timings.sort()
+        return timings[len(timings) // 2], timings[int(len(timings) * 0.95)]
+
+    print(f"条目数 {count}，备注 1 KB")
+    print(f"{'详情显示':<12}{'中位数(ms)':>12}{'P95(ms)':>10}")
+    for name, widget, show in (('富文本QLabel', label, lambda entry: label.setText(legacy_detail_html(entry))),
+                               ('字段控件', panel, panel.show_entry)):
+        median, p95 = browse(widget, show)
+        print(f"{name:<12}{median * 1000:>12.2f}{p95 * 1000:>10.2f}")
+
+
+# 改造前主窗口 setup_style 的样式表（节选主要规则），切换主题时整张重新设置
+LEGACY_QSS = """
+    QMainWindow, QWidget { background-color: %(window)s; color: %(text)s; font-family: "Microsoft YaHei", "微软雅黑"; }
+    QWidget#leftPanel { background-color: %(panel)s; border-right: 1px solid %(border)s; }
+    QPushButton { padding: 10px 20px; border: none; border-radius: 8px; font-size: 14px; min-width: 100px; font-weight: 500; }
+    QPushButton#newBtn { background-color: #4CAF50; color: white; padding: 12px 24px; border-radius: 8px; min-width: 120px; margin: 15px; }
+    QPushButton#newBtn:hover { background-color: #43A047; }
+    QPushButton#editBtn { background-color: #2196F3; color: white; }
+    QPushButton#editBtn:hover { background-color: #1E88E5; }
+    QPushButton#deleteBtn { background-color: #F44336; color: white; }
+    QPushButton#deleteBtn:hover { background-color: #E53935; }
+    QPushButton#settingsBtn { background-color: #607D8B; color: white; }
+    QPushButton#shareBtn { background-color: #4CAF50; color: white; }
+    QLineEdit { padding: 12px 16px; border: 2px solid %(border)s; border-radius: 8px; background-color: %(base)s; font-size: 14px; margin: 15px; }
+    QLineEdit:focus { border: 2px solid #4CAF50; }
+    QListView { border: none; background-color: transparent; outline: none; font-size: 14px; padding: 5px; }
+    QListView::item { padding: 12px 15px; margin: 2px 5px; border-radius: 6px; color: %(text)s; }
+    QListView::item:selected { background-color: %(selected)s; color: %(selected_text)s; }
+    QListView::item:hover { background-color: %(hover)s; }
+    QLabel { color: %(text)s; font-size: 14px; }
+    QScrollBar:vertical { border: none; background: %(panel)s; width: 8px; border-radius: 4px; margin: 0px; }
+    QScrollBar::handle:vertical { background: #bdbdbd; border-radius: 4px; min-height: 20px; }
+    QScrollBar::add-line:vertical, QScrollBar::sub-line:vertical { height: 0px; }
+"""
+LEGACY_COLORS = {
+    False: {'window': '#ffffff', 'text': '#2c3e50', 'panel': '#f8f9fa', 'border': '#e9ecef', 'base': '#ffffff',
+            'selected': '#E3F2FD', 'selected_text': '#1976D2', 'hover': '#F5F5F5'},
+    True: {'window': '#23272e', 'text': '#e0e0e0', 'panel': '#2d2d2d', 'border': '#3a3f4b', 'base': '#1e1e1e',
+           'selected': '#1565c0', 'selected_text': '#ffffff', 'hover': '#33373e'},
+}
+
+
+def theme_window(entries):
+    """和主窗口结构相近的窗口：左侧搜索框、分组框和密码列表，右侧详情面板和操作按钮"""
+    window = pm.QMainWindow()
+    central = pm.QWidget()
+    layout = pm.QHBoxLayout(central)
+    left = pm.QWidget()
+    left.setObjectName("leftPanel")
+    left_layout = pm.QVBoxLayout(left)
+    left_layout.addWidget(pm.QLineEdit())
+    left_layout.addWidget(pm.QComboBox())
+    view = pm.QListView()
+    view.setModel(pm.QStringListModel([entry['title'] for entry in entries]))
+    left_layout.addWidget(view)
+    new_btn = pm.QPushButton("新建密码")
+    new_btn.setObjectName("newBtn")
+    left_layout.addWidget(new_btn)
+    right = pm.QWidget()
+    right_layout = pm.QVBoxLayout(right)
+    panel = pm.DetailPanel()
+    panel.show_entry(entries[0])
+    right_layout.addWidget(panel)
+    buttons = pm.QHBoxLayout()
+    for name, text in (('editBtn', "修改"), ('deleteBtn', "删除"), ('shareBtn', "分享"), ('settingsBtn', "设置")):
+        button = pm.QPushButton(text)
+        button.setObjectName(name)
+        buttons.addWidget(button)
+    right_layout.addLayout(buttons)
+    layout.addWidget(left)
+    layout.addWidget(right, 1)
+    window.setCentralWidget(central)
+    window.resize(1100, 700)
+    return window
+
+
+def run_theme(count, rounds=20):
+    """切换主题的耗时：整张样式表重新设置与只更换调色板比较"""
+    os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    app = pm.QApplication.instance() or pm.QApplication([])
+    entries = list(itertools.islice(iter_entries(1, note_size=256), count))
+    engine = pm.ThemeEngine(app)
+
+    def toggle(window, switch):
+        window.show()
+        app.processEvents()
+        timings = []
+        for i in range(rounds):
+            start = time.perf_counter()
+            switch(i % 2 == 0)
+            # 处理事件直到重新布局和绘制完成
+            window.repaint()
+            app.processEvents()
+            timings.append(time.perf_counter() - start)
+        window.hide()
+        timings.sort()
+        return timings[len(timings) // 2], timings[-1]
+
+    print(f"列表 {count} 条，切换 {rounds} 次")
+    print(f"{'切换方式':<12}{'中位数(ms)':>12}{'最大(ms)':>10}")
+    legacy = theme_window(entries)
+    legacy_switch = lambda dark: legacy.setStyleSheet(LEGACY_QSS % LEGACY_COLORS[dark])
+    legacy_switch(False)
+    median, worst = toggle(legacy, legacy_switch)
+    print(f"{'样式表':<12}{median * 1000:>12.2f}{worst * 1000:>10.2f}")
+    legacy.setStyleSheet("")
+
+    window = theme_window(entries)
+    engine.decorate(window)
+    median, worst = toggle(window, engine.apply)
+    print(f"{'调色板':<12}{median * 1000:>12.2f}{worst * 1000:>10.2f}")
+
+
+def run_dialogs(rounds=20):
+    """打开对话框到显示完成的耗时：每次新建对话框与重复使用池中的实例比较"""
+    os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    app = pm.QApplication.instance() or pm.QApplication([])
+    pm.ThemeEngine(app).apply(False)
+    window = pm.QMainWindow()
+    window.resize(1100, 700)
+    window.show()
+    app.processEvents()
+    entry = next(iter_entries(1, note_size=1024))
+
+    def eager_settings(parent):
+        # 改造前的设置对话框在构造时创建全部页面
+        dialog = pm.SettingsDialog(parent)
+        for index in range(len(dialog.PAGES)):
+            dialog.show_settings_page(index)
+        dialog.show_settings_page(0)
+        return dialog
+
+    cases = [
+        ('PasswordDialog', lambda: pm.PasswordDialog(window, entry), lambda dialog: dialog.reset(entry)),
+        ('SettingsDialog', lambda: eager_settings(window), lambda dialog: dialog.reset()),
+        ('ShareDialog', lambda: pm.ShareDialog(window, entry), lambda dialog: dialog.reset(entry)),
+    ]
+
+    def visible(open_dialog):
+        timings = []
+        for _ in range(rounds):
+            start = time.perf_counter()
+            dialog = open_dialog()
+            dialog.show()
+            app.processEvents()
+            timings.append(time.perf_counter() - start)
+            dialog.hide()
+        timings.sort()
+        return timings[len(timings) // 2], timings[-1]
+
+    print(f"打开 {rounds} 次")
+    print(f"{'对话框':<16}{'新建中位数(ms)':>16}{'新建最大(ms)':>14}{'复用中位数(ms)':>16}{'复用最大(ms)':>14}")
+    for name, create, reset in cases:
+        created = []
+
+        def open_new():
+            dialog = create()
+            created.append(dialog)
+            return dialog
+        new_median, new_worst = visible(open_new)
+        for dialog in created:
+            dialog.deleteLater()
+        app.processEvents()
+
+        pooled = create()
+        def open_pooled():
+            reset(pooled)
+            return pooled
+        pooled_median, pooled_worst = visible(open_pooled)
+        print(f"{name:<16}{new_median * 1000:>16.2f}{new_worst * 1000:>14.2f}"
+              f"{pooled_median * 1000:>16.2f}{pooled_worst * 1000:>14.2f}")
+    # 只打开设置对话框的第一页时，其余页面不会创建
+    lazy = pm.SettingsDialog(window)
+    print(f"设置对话框首次打开：全部页面 {visible(lambda: eager_settings(window))[0] * 1000:.2f} ms，"
+          f"只创建第一页 {visible(lambda: pm.SettingsDialog(window))[0] * 1000:.2f} ms（已创建 {len(lazy.pages)} 页）")
+
+
+def run_groups(count):
+    # 大部分条目在默认分组，另有 20 个小分组，切换到小分组时差别最明显
+    rng = random.Random(1)
+    groups = ['默认分组'] * 80 + [f'分组{i}' for i in range(20)]
+    entries = list(itertools.islice(iter_entries(count * 64 // (1024 * 1024) + 1, note_size=64), count))
+    for entry in entries:
+        entry['group'] = rng.choice(groups)
+    index = pm.SearchIndex()
+    index.build(entries)
+    print(f"条目数 {count}，分组 {len(index.groups.names())} 个")
+    print(f"{'操作':<24}{'逐条扫描(ms)':>14}{'分组索引(ms)':>14}")
+
+    def row(name, linear, indexed):
+        print(f"{name:<24}{min(timeit(linear) for _ in range(3)) * 1000:>14.2f}"
+              f"{min(timeit(indexed) for _ in range(3)) * 1000:>14.2f}")
+
+    row("统计分组", lambda: set(entry.get('group', '默认分组') for entry in entries),
+        lambda: [index.groups.count(group) for group in index.groups.names()])
+    for group in ('默认分组', '分组7'):
+        row(f"切换到 {group}", lambda: [entry for entry in entries if entry.get('group', '默认分组') == group],
+            lambda: index.group_entries(group))
+
+        def filtered():
+            index.results.clear()
+            return [entry for entry in index.search('site1') if entry.get('group', '默认分组') == group]
+
+        def scoped():
+            index.results.clear()
+            return index.search('site1', group)
+
+        assert filtered() == scoped()
+        row(f"在 {group} 内搜索", filtered, scoped)
+
+
+def list_child(kind, count):
+    """在独立进程中填充一次列表并做增删改，输出耗时和 RSS 增长"""
+    os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    app = pm.QApplication.instance() or pm.QApplication([])
+    entries = [{'id': str(i), 'title': f'站点{i}', 'group': '默认分组'} for i in range(count)]
+    rss_before = max_rss_mb()
+    if kind == 'widget':
+        view = pm.QListWidget()
+
+        def fill():
+            # 改造前 update_list 的做法：清空后逐条创建 QListWidgetItem
+            view.clear()
+            for entry in entries:
+                view.addItem(pm.QListWidgetItem(entry['title']))
+        add = edit = delete = fill
+    else:
+        model = pm.EntryListModel()
+        view = pm.QListView()
+        view.setModel(model)
+        view.setUniformItemSizes(True)
+
+        def fill():
+            model.set_entries(entries)
+
+        def add():
+            model.append_entries([{'id': 'new', 'title': '新条目', 'group': '默认分组'}])
+
+        def edit():
+            model.replace_entry(0, {'id': '0', 'title': '改名', 'group': '默认分组'})
+
+        def delete():
+            model.remove_rows(model.rowCount() - 1)
+    view.resize(300, 600)
+    view.show()
+    results = {}
+    for name, func in (('fill', fill), ('add', add), ('edit', edit), ('delete', delete)):
+        start = time.perf_counter()
+        func()
+        app.processEvents()
+        results[name] = time.perf_counter() - start
+    results['rss_growth_mb'] = max_rss_mb() - rss_before
+    print(json.dumps(results))
+
+
+def run_list(sizes):
+    print(f"{'列表':<8}{'条目数':>8}{'填充(ms)':>10}{'新增(ms)':>10}{'修改(ms)':>10}{'删除(ms)':>10}{'RSS增长(MB)':>13}")
+    for kind in ('widget', 'model'):
+        for count in sizes:
+            result = run_child(['list', '--child', kind, '--entries', str(count)])
+            print(f"{kind:<8}{count:>8}{result['fill'] * 1000:>10.1f}{result['add'] * 1000:>10.2f}"
+                  f"{result['edit'] * 1000:>10.2f}{result['delete'] * 1000:>10.2f}{result['rss_growth_mb']:>13.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="密码管理器性能测试")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    container = subparsers.add_parser('container', help="数据文件格式加载测试")
+    container.add_argument('--size-mb', type=int, default=50)
+    container.add_argument('--child', choices=['json', 'binary', 'lazy'])
+    container.add_argument('--dir')
+    container.add_argument('--trace', action='store_true')
+
+    stream = subparsers.add_parser('stream', help="流式导出导入测试")
+    stream.add_argument('--size-mb', type=int, default=50)
+
+    kdf = subparsers.add_parser('kdf', help="密钥派生耗时测试")
+    kdf.add_argument('--target-ms', type=int, default=250)
+
+    subparsers.add_parser('search', help="搜索耗时测试")
+
+    quick = subparsers.add_parser('quick', help="快速搜索耗时测试")
+    quick.add_argument('--entries', type=int, default=50000)
+
+    query = subparsers.add_parser('query', help="字段查询语法耗时测试")
+    query.add_argument('--entries', type=int, default=100000)
+
+    pinyin = subparsers.add_parser('pinyin', help="中文标题拼音查询耗时测试")
+    pinyin.add_argument('--entries', type=int, default=100000)
+
+    details = subparsers.add_parser('details', help="详情面板渲染耗时测试")
+    details.add_argument('--entries', type=int, default=200)
+
+    theme = subparsers.add_parser('theme', help="切换主题耗时测试")
+    theme.add_argument('--entries', type=int, default=1000)
+
+    subparsers.add_parser('dialogs', help="对话框打开耗时测试")
+
+    subparsers.add_parser('startup', help="解锁时重建索引与读取索引缓存的耗时")
+
+    group_parser = subparsers.add_parser('groups', help="分组切换和分组内搜索耗时测试")
+    group_parser.add_argument('--entries', type=int, default=100000)
+
+    list_parser = subparsers.add_parser('list', help="密码列表刷新测试")
+    list_parser.add_argument('--child', choices=['widget', 'model'])
+    list_parser.add_argument('--entries', type=int)
+
+    args = parser.parse_args()
+    if args.command == 'container':
+        if args.child:
+            container_child(args.child, args.dir, args.trace)
+        else:
+            run_container(args.size_mb)
+    elif args.command == 'stream':
+        run_stream(args.size_mb)
+    elif args.command == 'kdf':
+        run_kdf(args.target_ms)
+    elif args.command == 'search':
+        run_search([1000, 10000, 100000])
+        print()
+        run_search_worker(100000)
+    elif args.command == 'quick':
+        run_quick(args.entries)
+    elif args.command == 'query':
+        run_query(args.entries)
+    elif args.command == 'pinyin':
+        run_pinyin(args.entries)
+    elif args.command == 'details':
+        run_details(args.entries)
+    elif args.command == 'theme':
+        run_theme(args.entries)
+    elif args.command == 'dialogs':
+        run_dialogs()
+    elif args.command == 'startup':
+        run_startup([1000, 10000, 100000])
+    elif args.command == 'groups':
+        run_groups(args.entries)
+    elif args.command == 'list':
+        if args.child:
+            list_child(args.child, args.entries)
+        else:
+            run_list([100, 10000, 200000])
+
+
+if __name__ == "__main__":
+    main()
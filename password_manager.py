@@ -11,19 +11,63 @@ from PyQt6.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout,
                             QHBoxLayout, QListWidget, QLineEdit, QPushButton, 
                             QLabel, QMessageBox, QDialog, QFormLayout, QTextEdit,
                             QGroupBox, QComboBox, QStyleFactory, QFrame, QInputDialog,
-                            QListWidgetItem, QStackedWidget, QSpinBox)
-from PyQt6.QtCore import Qt, QSize, QBuffer, QTimer
+                            QStackedWidget, QSpinBox, QListView, QGridLayout,
+                            QPlainTextEdit, QTableWidget, QTableWidgetItem, QHeaderView)
+from PyQt6.QtCore import (Qt, QSize, QBuffer, QTimer, QObject, pyqtSignal,
+                          QStringListModel, QModelIndex, QAbstractEventDispatcher)
 from PyQt6.QtGui import QIcon, QPixmap, QFont, QPalette, QColor, QShortcut, QKeySequence
 from Cryptodome.Cipher import AES
 from Cryptodome.Random import get_random_bytes
 from Cryptodome.Protocol.KDF import PBKDF2
 from Cryptodome.Util.Padding import pad, unpad
 import base64
+import hashlib
+import hmac
+import mmap
+import sqlite3
+import re
+import struct
+import uuid
+from array import array
+from urllib.parse import urlsplit
+from collections import OrderedDict, deque
 from datetime import datetime
 import subprocess
+import time
+import heapq
+import bisect
+import itertools
+import functools
+import inspect
+import unicodedata
+import pinyin_table
 
 print("开始初始化...")
 
+VAULT_CONFIG_FILE = 'vault_config.json'
+DEFAULT_VAULT_CONFIG = {
+    'backend': 'json',  # 存储后端：json（数据文件 + 日志）或 sqlite
+    'journal_max_bytes': 1024 * 1024,  # 日志超过该大小时合并到快照
+    'journal_max_records': 500,  # 日志超过该记录数时合并到快照
+    'kdf': 'scrypt',  # 设置或修改主密码时使用的密钥派生算法：scrypt 或 pbkdf2-sha256
+    'kdf_target_ms': 250,  # 校准密钥派生参数时的目标解锁耗时（毫秒）
+    'lazy_secrets': False,  # 启动时只解密元数据，密码和备注在打开条目时再解密（仅 JSON 后端）
+    'secret_cache_size': 16,  # 已解密密码和备注最多缓存的条目数
+    'secret_cache_ttl': 120,  # 已解密密码和备注的缓存时间（秒）
+    'diagnostics': False  # 记录界面各处理的耗时，在设置的"诊断"页查看
+}
+
+def load_vault_config():
+    """加载存储配置，缺少的项使用默认值"""
+    config = dict(DEFAULT_VAULT_CONFIG)
+    try:
+        if os.path.exists(VAULT_CONFIG_FILE):
+            with open(VAULT_CONFIG_FILE, 'r', encoding='utf-8') as f:
+                config.update(json.load(f))
+    except Exception as e:
+        print(f"加载存储配置失败，使用默认配置: {str(e)}")
+    return config
+
 def check_dependencies():
     try:
         import PIL
@@ -41,64 +85,2442 @@ def check_dependencies():
 
 check_dependencies()
 
+KDF_IDS = {'pbkdf2-sha1': 1, 'pbkdf2-sha256': 2, 'scrypt': 3}
+KDF_FIELDS = {  # 各算法的参数名，依次存入容器头部的参数1-3
+    'pbkdf2-sha1': ('iterations',),
+    'pbkdf2-sha256': ('iterations',),
+    'scrypt': ('n', 'r', 'p')
+}
+LEGACY_KDF_PARAMS = {'name': 'pbkdf2-sha1', 'iterations': 1000}  # pycryptodome PBKDF2 的默认参数
+PBKDF2_MIN_ITERATIONS = 100000
+SCRYPT_MIN_N = 2 ** 14
+SCRYPT_MAX_N = 2 ** 18  # r=8 时约占用 256MB 内存
+_calibrated_kdf_params = {}
+
+def derive_key(password, salt, kdf_params):
+    """按给定参数从主密码派生 32 字节密钥"""
+    name = kdf_params['name']
+    password = password.encode('utf-8')
+    if name == 'pbkdf2-sha1':
+        return PBKDF2(password, salt, dkLen=32, count=kdf_params['iterations'])
+    if name == 'pbkdf2-sha256':
+        return hashlib.pbkdf2_hmac('sha256', password, salt, kdf_params['iterations'], 32)
+    if name == 'scrypt':
+        n, r, p = kdf_params['n'], kdf_params['r'], kdf_params['p']
+        return hashlib.scrypt(password, salt=salt, n=n, r=r, p=p,
+                              maxmem=256 * n * r + 1024 * 1024, dklen=32)
+    raise ValueError(f"不支持的密钥派生算法: {name}")
+
+def time_kdf(kdf_params, rounds=2):
+    """测量一次密钥派生的耗时（秒），取多次中的最小值"""
+    salt = get_random_bytes(32)
+    best = None
+    for _ in range(rounds):
+        start = time.perf_counter()
+        derive_key('calibration', salt, kdf_params)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+def calibrate_kdf(name='scrypt', target_ms=250):
+    """测量本机性能，选出单次派生耗时接近 target_ms 的参数，结果在进程内缓存"""
+    if (name, target_ms) in _calibrated_kdf_params:
+        return dict(_calibrated_kdf_params[(name, target_ms)])
+    target = target_ms / 1000
+    if name == 'pbkdf2-sha256':
+        sample = {'name': name, 'iterations': 20000}
+        iterations = int(sample['iterations'] * target / time_kdf(sample))
+        params = {'name': name, 'iterations': max(PBKDF2_MIN_ITERATIONS, iterations // 1000 * 1000)}
+    elif name == 'scrypt':
+        # 耗时与 n 近似成正比，n 必须是 2 的幂
+        params = {'name': name, 'n': SCRYPT_MIN_N, 'r': 8, 'p': 1}
+        elapsed = time_kdf(params)
+        while params['n'] < SCRYPT_MAX_N and elapsed * 1.5 < target:
+            params['n'] *= 2
+            elapsed *= 2
+    else:
+        raise ValueError(f"不支持的密钥派生算法: {name}")
+    _calibrated_kdf_params[(name, target_ms)] = params
+    return dict(params)
+
+def read_master_key(path='master.key'):
+    """读取主密码校验文件，返回密钥派生参数和校验值
+
+    早期版本直接保存 32 字节的派生密钥，读取后以 'key' 返回，由调用方升级为新格式。"""
+    with open(path, 'rb') as f:
+        data = f.read()
+    if len(data) == 32:
+        return {'kdf': LEGACY_KDF_PARAMS, 'key': data}
+    master_key = json.loads(data.decode('utf-8'))
+    return {'kdf': master_key['kdf'], 'verifier': base64.b64decode(master_key['verifier'])}
+
+class SessionKey:
+    """会话密钥：解锁时派生一次，保存在可清零的缓冲区中，供所有加解密路径共用"""
+    def __init__(self, key, kdf_params=LEGACY_KDF_PARAMS):
+        self._buffer = bytearray(key)
+        self.kdf_params = kdf_params
+
+    @classmethod
+    def derive(cls, password, salt, kdf_params=LEGACY_KDF_PARAMS):
+        """按给定参数从主密码派生会话密钥"""
+        return cls(derive_key(password, salt, kdf_params), kdf_params)
+
+    @property
+    def key(self):
+        if self._buffer is None:
+            raise ValueError("会话密钥已失效，请重新解锁")
+        return self._buffer
+
+    def matches(self, other):
+        """以恒定时间比较密钥"""
+        if self._buffer is None:
+            return False
+        return hmac.compare_digest(bytes(self._buffer), bytes(other))
+
+    def verifier(self):
+        """写入 master.key 的校验值，不能反推出密钥"""
+        return hmac.new(self.key, b'master-key-verifier', hashlib.sha256).digest()
+
+    def verifies(self, master_key):
+        """校验是否与 read_master_key 读出的内容一致"""
+        if self._buffer is None:
+            return False
+        if 'key' in master_key:
+            return self.matches(master_key['key'])
+        return hmac.compare_digest(self.verifier(), master_key['verifier'])
+
+    def master_key_data(self):
+        """master.key 的内容：密钥派生参数和校验值"""
+        return json.dumps({
+            'version': 2,
+            'kdf': self.kdf_params,
+            'verifier': base64.b64encode(self.verifier()).decode('utf-8')
+        }).encode('utf-8')
+
+    def matches_password(self, password, salt):
+        """校验用户输入的主密码是否与当前会话密钥一致"""
+        candidate = SessionKey.derive(password, salt, self.kdf_params)
+        try:
+            return self.matches(candidate.key)
+        finally:
+            candidate.wipe()
+
+    def wipe(self):
+        """清零并使密钥失效"""
+        if self._buffer is not None:
+            for i in range(len(self._buffer)):
+                self._buffer[i] = 0
+            self._buffer = None
+
+VAULT_MAGIC = b'PMVT'
+CONTAINER_PREFIX = struct.Struct('>4sHBIII')  # 魔数、版本、密钥派生算法、参数1-3
+
+def pack_container_prefix(version, kdf_params):
+    """打包二进制容器的公共头部"""
+    name = kdf_params['name']
+    values = [kdf_params[field] for field in KDF_FIELDS[name]]
+    values += [0] * (3 - len(values))
+    return CONTAINER_PREFIX.pack(VAULT_MAGIC, version, KDF_IDS[name], *values)
+
+def unpack_container_prefix(buffer):
+    """解析二进制容器的公共头部，返回 (版本, 密钥派生参数, 头部之后的偏移)"""
+    magic, version, kdf_id, *values = CONTAINER_PREFIX.unpack_from(buffer, 0)
+    if magic != VAULT_MAGIC:
+        raise ValueError("不是有效的密码库文件")
+    names = {value: name for name, value in KDF_IDS.items()}
+    if kdf_id not in names:
+        raise ValueError(f"不支持的密钥派生算法: {kdf_id}")
+    kdf_params = {'name': names[kdf_id]}
+    kdf_params.update(zip(KDF_FIELDS[names[kdf_id]], values))
+    return version, kdf_params, CONTAINER_PREFIX.size
+
+def check_kdf_params(kdf_params, session_key):
+    """数据文件记录的密钥派生参数必须与当前会话密钥一致"""
+    if kdf_params != session_key.kdf_params:
+        raise ValueError("数据文件的密钥派生参数与当前会话不一致")
+
+def write_file_atomic(path, data):
+    """先写入临时文件并 fsync，再替换原文件；中途失败时原文件保持不变"""
+    temp_file = path + '.tmp'
+    with open(temp_file, 'wb') as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp_file, path)
+
+def new_entry_id():
+    """生成条目的稳定ID"""
+    return uuid.uuid4().hex
+
+SECRET_FIELDS = ('password', 'notes')  # 单独加密、可按需解密的字段
+
+def split_secrets(entry):
+    """拆分为 (元数据, 密码和备注)"""
+    meta = {k: v for k, v in entry.items() if k not in SECRET_FIELDS}
+    secrets = {k: entry[k] for k in SECRET_FIELDS if k in entry}
+    return meta, secrets
+
+class SecretCache:
+    """按需解密的密码和备注缓存：最多保留 max_entries 个条目，超过 ttl 秒即丢弃，锁定时清空"""
+    def __init__(self, max_entries=16, ttl=120):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.entries = OrderedDict()  # 条目ID -> (过期时间, 字段)
+
+    def get(self, entry_id):
+        item = self.entries.get(entry_id)
+        if item is None:
+            return None
+        if item[0] < time.monotonic():
+            del self.entries[entry_id]
+            return None
+        self.entries.move_to_end(entry_id)
+        return item[1]
+
+    def put(self, entry_id, secrets):
+        self.entries[entry_id] = (time.monotonic() + self.ttl, secrets)
+        self.entries.move_to_end(entry_id)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def discard(self, entry_id):
+        self.entries.pop(entry_id, None)
+
+    def purge(self):
+        """丢弃已过期的条目"""
+        now = time.monotonic()
+        for entry_id in [k for k, (expires, _) in self.entries.items() if expires < now]:
+            del self.entries[entry_id]
+
+    def clear(self):
+        self.entries.clear()
+
+class RecordVault:
+    """2.0 版本存储：每个条目单独加密（独立 IV），记录表将条目ID映射到记录文件中的偏移
+
+    数据文件是二进制容器：固定头部（魔数、版本、密钥派生参数、IV、长度）之后是
+    加密后的记录表；密文记录追加写入同目录下的记录文件。修改一个条目只需加密并
+    追加这一条记录，再改写很小的记录表。读取时通过 mmap 直接在映射的缓冲区上解密。
+    早期的 JSON 记录表仍可读取，下次写入时自动转为二进制容器。
+
+    每条记录由两段密文组成：元数据在前，密码和备注在后，记录表保存元数据段的长度，
+    lazy 模式下加载时只解密元数据。容器版本 2 的记录是整体加密的（元数据长度为 0），
+    仍可读取，修改后的条目按新格式写入。"""
+    VERSION = '2.0'
+    CONTAINER_VERSION = 4
+    LEGACY_CONTAINER_VERSION = 2
+    TABLE_HEADER = struct.Struct('>16sIQI')  # IV、代数、废弃字节数、记录表密文长度
+    TABLE_ENTRY = struct.Struct('>QII')  # 偏移、长度、元数据段长度
+    LEGACY_TABLE_ENTRY = struct.Struct('>QI')  # 偏移、长度
+    COMPACT_MIN_BYTES = 64 * 1024  # 废弃记录超过该大小且超过有效数据时整理记录文件
+    BATCH_SIZE = 200  # 加载时每批送回界面的条目数
+
+    def __init__(self, data_file, lazy=False):
+        self.data_file = data_file
+        self.lazy = lazy  # 加载时只解密元数据
+        self.table = {}  # 条目ID -> [偏移, 长度, 元数据段长度]，插入顺序即条目顺序
+        self.records_file = None
+        self.generation = 0
+        self.garbage = 0
+        self.loaded = False
+
+    def records_path(self, name=None):
+        return os.path.join(os.path.dirname(os.path.abspath(self.data_file)), name or self.records_file)
+
+    def load(self, header, session_key, on_batch=None):
+        """读取早期的 JSON 记录表并逐条解密"""
+        self.table = {entry_id: [offset, length, 0] for entry_id, offset, length in header['table']}
+        self.records_file = header['records']
+        self.generation = header.get('generation', 0)
+        self.garbage = header.get('garbage', 0)
+        self.loaded = True
+        return self.read_records(session_key.key, on_batch)
+
+    def load_container(self, buffer, session_key, on_batch=None):
+        """读取二进制容器中的记录表并逐条解密"""
+        version, kdf_params, offset = unpack_container_prefix(buffer)
+        if version not in (self.CONTAINER_VERSION, self.LEGACY_CONTAINER_VERSION):
+            raise ValueError(f"不支持的数据文件版本: {version}")
+        check_kdf_params(kdf_params, session_key)
+        iv, generation, garbage, table_length = self.TABLE_HEADER.unpack_from(buffer, offset)
+        offset += self.TABLE_HEADER.size
+        view = memoryview(buffer)
+        try:
+            cipher = AES.new(session_key.key, AES.MODE_CBC, iv)
+            table = unpad(cipher.decrypt(view[offset:offset + table_length]), AES.block_size)
+        finally:
+            view.release()
+        self.table = {}
+        position = 0
+        while position < len(table):
+            id_length = table[position]
+            entry_id = table[position + 1:position + 1 + id_length].decode('utf-8')
+            position += 1 + id_length
+            if version == self.LEGACY_CONTAINER_VERSION:
+                self.table[entry_id] = list(self.LEGACY_TABLE_ENTRY.unpack_from(table, position)) + [0]
+                position += self.LEGACY_TABLE_ENTRY.size
+            else:
+                self.table[entry_id] = list(self.TABLE_ENTRY.unpack_from(table, position))
+                position += self.TABLE_ENTRY.size
+        self.generation = generation
+        self.garbage = garbage
+        self.records_file = self.new_records_name()
+        self.loaded = True
+        return self.read_records(session_key.key, on_batch)
+
+    def read_records(self, key, on_batch=None):
+        """映射记录文件，直接在映射的缓冲区上解密每条记录
+
+        指定 on_batch 时每解密 BATCH_SIZE 条调用一次，用于边解密边显示。"""
+        entries = []
+        if not self.table:
+            return entries
+        with open(self.records_path(), 'rb') as f:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                view = memoryview(mm)
+                try:
+                    for entry_id, (offset, length, meta_length) in self.table.items():
+                        entry = self.decrypt_record(key, view[offset:offset + length], meta_length, self.lazy)
+                        entry['id'] = entry_id
+                        entries.append(entry)
+                        if on_batch is not None and len(entries) % self.BATCH_SIZE == 0:
+                            on_batch(entries[-self.BATCH_SIZE:])
+                finally:
+                    view.release()
+        if on_batch is not None and len(entries) % self.BATCH_SIZE:
+            on_batch(entries[-(len(entries) % self.BATCH_SIZE):])
+        return entries
+
+    def encrypt_part(self, key, data):
+        iv = get_random_bytes(AES.block_size)
+        cipher = AES.new(key, AES.MODE_CBC, iv)
+        return iv + cipher.encrypt(pad(json.dumps(data).encode('utf-8'), AES.block_size))
+
+    def decrypt_part(self, key, part):
+        cipher = AES.new(key, AES.MODE_CBC, part[:AES.block_size])
+        return json.loads(unpad(cipher.decrypt(part[AES.block_size:]), AES.block_size).decode('utf-8'))
+
+    def encrypt_record(self, key, entry):
+        """加密一条记录，返回 (记录, 元数据段长度)"""
+        meta, secrets = split_secrets(entry)
+        meta_part = self.encrypt_part(key, meta)
+        return meta_part + self.encrypt_part(key, secrets), len(meta_part)
+
+    def decrypt_record(self, key, record, meta_length, metadata_only=False):
+        """解密一条记录；metadata_only 时只解密元数据段（整体加密的旧记录总是完整解密）"""
+        if not meta_length:
+            return self.decrypt_part(key, record)
+        entry = self.decrypt_part(key, record[:meta_length])
+        if not metadata_only:
+            entry.update(self.decrypt_part(key, record[meta_length:]))
+        return entry
+
+    def read_secrets(self, key, entry_id):
+        """只读取并解密一个条目的密码和备注，条目不在记录表中时返回 None"""
+        if entry_id not in self.table:
+            return None
+        offset, length, meta_length = self.table[entry_id]
+        with open(self.records_path(), 'rb') as f:
+            f.seek(offset + meta_length)
+            part = f.read(length - meta_length)
+        if not meta_length:
+            return split_secrets(self.decrypt_part(key, part))[1]
+        return self.decrypt_part(key, part)
+
+    def write_all(self, session_key, entries):
+        """全量写入：新建一代记录文件，写完后再切换记录表
+
+        写入失败时数据文件没有被替换，恢复原来的记录表，旧的记录文件仍然有效。"""
+        old_records = self.records_file if self.loaded else None
+        old_state = (self.generation, self.records_file, self.table, self.garbage, self.loaded)
+        self.generation += 1
+        self.records_file = self.new_records_name()
+        self.table = {}
+        try:
+            offset = 0
+            with open(self.records_path(), 'wb') as f:
+                for entry in entries:
+                    record, meta_length = self.encrypt_record(session_key.key, entry)
+                    f.write(record)
+                    self.table[entry['id']] = [offset, len(record), meta_length]
+                    offset += len(record)
+                f.flush()
+                os.fsync(f.fileno())
+            self.garbage = 0
+            self.loaded = True
+            self.write_header(session_key)
+        except BaseException:
+            failed = self.records_file
+            self.generation, self.records_file, self.table, self.garbage, self.loaded = old_state
+            self.remove_records_file(failed)
+            raise
+        self.remove_records_file(old_records)
+
+    def write_changes(self, session_key, changed, deleted):
+        """增量写入：只加密并追加变更的条目"""
+        path = self.records_path()
+        with open(path, 'ab') as f:
+            offset = f.tell()
+            for entry in changed:
+                record, meta_length = self.encrypt_record(session_key.key, entry)
+                f.write(record)
+                old = self.table.get(entry['id'])
+                if old:
+                    self.garbage += old[1]
+                self.table[entry['id']] = [offset, len(record), meta_length]
+                offset += len(record)
+            f.flush()
+            os.fsync(f.fileno())
+        for entry_id in deleted:
+            old = self.table.pop(entry_id, None)
+            if old:
+                self.garbage += old[1]
+        if self.garbage > max(self.COMPACT_MIN_BYTES, self.live_bytes()):
+            self.compact(session_key)
+        else:
+            self.write_header(session_key)
+
+    def live_bytes(self):
+        return sum(length for _, length, _ in self.table.values())
+
+    def compact(self, session_key):
+        """整理记录文件：只复制有效记录的密文，不需要重新加密"""
+        old_records = self.records_file
+        self.generation += 1
+        self.records_file = self.new_records_name()
+        table = {}
+        offset = 0
+        with open(self.records_path(old_records), 'rb') as src, open(self.records_path(), 'wb') as f:
+            if self.table:
+                with mmap.mmap(src.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    view = memoryview(mm)
+                    try:
+                        for entry_id, (old_offset, length, meta_length) in self.table.items():
+                            f.write(view[old_offset:old_offset + length])
+                            table[entry_id] = [offset, length, meta_length]
+                            offset += length
+                    finally:
+                        view.release()
+            f.flush()
+            os.fsync(f.fileno())
+        self.table = table
+        self.garbage = 0
+        self.write_header(session_key)
+        self.remove_records_file(old_records)
+
+    def new_records_name(self):
+        base = os.path.splitext(os.path.basename(self.data_file))[0]
+        return f"{base}.{self.generation}.records"
+
+    def remove_records_file(self, name):
+        if name and name != self.records_file:
+            try:
+                os.remove(self.records_path(name))
+            except OSError:
+                pass
+
+    def write_header(self, session_key):
+        """写入二进制容器：头部 + 加密的记录表"""
+        table = bytearray()
+        for entry_id, (offset, length, meta_length) in self.table.items():
+            encoded_id = entry_id.encode('utf-8')
+            table.append(len(encoded_id))
+            table += encoded_id
+            table += self.TABLE_ENTRY.pack(offset, length, meta_length)
+        iv = get_random_bytes(AES.block_size)
+        cipher = AES.new(session_key.key, AES.MODE_CBC, iv)
+        ct = cipher.encrypt(pad(bytes(table), AES.block_size))
+        temp_file = self.data_file + '.tmp'
+        with open(temp_file, 'wb') as f:
+            f.write(pack_container_prefix(self.CONTAINER_VERSION, session_key.kdf_params))
+            f.write(self.TABLE_HEADER.pack(iv, self.generation, self.garbage, len(ct)))
+            f.write(ct)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_file, self.data_file)
+
+class StreamVault:
+    """3.0 版本：分块 AES-GCM 流式加密，用于导出备份等需要单个自包含文件的场景
+
+    明文是每行一个条目的 JSON，按固定大小分块加密。每块的 nonce 由随机前缀、
+    块序号和结束标记组成，并把文件头作为附加认证数据，因此块被篡改、调换或
+    截断都能在读到该块时发现。读写时内存只需容纳一个块。"""
+    VERSION = '3.0'
+    CONTAINER_VERSION = 3
+    HEADER = struct.Struct('>7sIH')  # nonce 前缀、块大小、盐长度
+    CHUNK_HEADER = struct.Struct('>IB')  # 块密文长度、结束标记
+    CHUNK_SIZE = 64 * 1024
+    TAG_SIZE = 16
+
+    @classmethod
+    def nonce(cls, prefix, counter, final):
+        return prefix + struct.pack('>IB', counter, 1 if final else 0)
+
+    @classmethod
+    def write(cls, f, session_key, salt, entries, chunk_size=None):
+        """把条目逐块加密写入文件对象"""
+        chunk_size = chunk_size or cls.CHUNK_SIZE
+        prefix = get_random_bytes(7)
+        header = (pack_container_prefix(cls.CONTAINER_VERSION, session_key.kdf_params) +
+                  cls.HEADER.pack(prefix, chunk_size, len(salt)) + salt)
+        f.write(header)
+        counter = 0
+        buffer = bytearray()
+
+        def write_chunk(chunk, final):
+            cipher = AES.new(session_key.key, AES.MODE_GCM, nonce=cls.nonce(prefix, counter, final))
+            cipher.update(header)
+            ct, tag = cipher.encrypt_and_digest(chunk)
+            f.write(cls.CHUNK_HEADER.pack(len(ct), 1 if final else 0))
+            f.write(ct)
+            f.write(tag)
+
+        for entry in entries:
+            buffer += json.dumps(entry).encode('utf-8') + b'\n'
+            while len(buffer) > chunk_size:
+                write_chunk(bytes(buffer[:chunk_size]), False)
+                del buffer[:chunk_size]
+                counter += 1
+        write_chunk(bytes(buffer), True)
+
+    @classmethod
+    def read_header(cls, f):
+        """读取文件头，返回 (密钥派生参数, 盐, 头部信息)"""
+        prefix_bytes = f.read(CONTAINER_PREFIX.size)
+        version, kdf_params, _ = unpack_container_prefix(prefix_bytes)
+        if version != cls.CONTAINER_VERSION:
+            raise ValueError(f"不支持的数据文件版本: {version}")
+        stream_header = f.read(cls.HEADER.size)
+        nonce_prefix, chunk_size, salt_length = cls.HEADER.unpack(stream_header)
+        salt = f.read(salt_length)
+        header = {
+            'bytes': prefix_bytes + stream_header + salt,
+            'nonce_prefix': nonce_prefix,
+            'chunk_size': chunk_size
+        }
+        return kdf_params, salt, header
+
+    @classmethod
+    def iter_entries(cls, f, key, header):
+        """逐块解密并逐条返回条目"""
+        counter = 0
+        pending = b''
+        while True:
+            length_bytes = f.read(cls.CHUNK_HEADER.size)
+            if len(length_bytes) < cls.CHUNK_HEADER.size:
+                raise ValueError("数据不完整：缺少结束块")
+            length, final = cls.CHUNK_HEADER.unpack(length_bytes)
+            if length > header['chunk_size']:
+                raise ValueError(f"第 {counter + 1} 块长度无效")
+            ct = f.read(length)
+            tag = f.read(cls.TAG_SIZE)
+            if len(ct) < length or len(tag) < cls.TAG_SIZE:
+                raise ValueError("数据不完整：块被截断")
+            # 结束标记参与 nonce，被篡改时校验同样会失败
+            cipher = AES.new(key, AES.MODE_GCM, nonce=cls.nonce(header['nonce_prefix'], counter, final))
+            cipher.update(header['bytes'])
+            try:
+                chunk = cipher.decrypt_and_verify(ct, tag)
+            except ValueError:
+                raise ValueError(f"第 {counter + 1} 块校验失败，密码不正确或数据已损坏")
+            lines = (pending + chunk).split(b'\n')
+            pending = lines.pop()
+            for line in lines:
+                yield json.loads(line.decode('utf-8'))
+            if final:
+                break
+            counter += 1
+        if pending or f.read(1):
+            raise ValueError("结束块之后存在多余数据")
+
+class VaultJournal:
+    """追加写入的加密日志：每次增删改追加一条 AES-GCM 加密的变更记录并 fsync
+
+    记录格式为 4 字节长度 + 12 字节 nonce + 16 字节 tag + 密文。加载时在快照之上
+    重放日志，末尾写了一半的记录会被校验发现并截断，最多丢失最后一条记录。"""
+    HEADER = struct.Struct('>I')
+    NONCE_SIZE = 12
+    TAG_SIZE = 16
+
+    def __init__(self, data_file):
+        self.path = os.path.splitext(data_file)[0] + '.journal'
+        self.lock = threading.Lock()
+        self.size = 0
+        self.records = 0
+        self.changed_ids = {}  # 尚未合并到快照的条目ID（保持顺序）
+        self.deleted_ids = set()
+
+    def append_many(self, key, ops):
+        """一次追加多条变更记录，只 fsync 一次；op 为 {'op': 'put', 'entry': ...} 或 {'op': 'delete', 'id': ...}"""
+        records = []
+        for op in ops:
+            nonce = get_random_bytes(self.NONCE_SIZE)
+            cipher = AES.new(key, AES.MODE_GCM, nonce=nonce)
+            ct, tag = cipher.encrypt_and_digest(json.dumps(op).encode('utf-8'))
+            records.append(self.HEADER.pack(len(ct)) + nonce + tag + ct)
+        if not records:
+            return
+        data = b''.join(records)
+        with self.lock:
+            if not os.path.exists(self.path):
+                open(self.path, 'wb').close()
+            # 在已知的有效长度处写入，而不是盲目追加到文件末尾
+            with open(self.path, 'r+b', buffering=0) as f:
+                try:
+                    f.seek(self.size)
+                    view = memoryview(data)
+                    while view:
+                        view = view[f.write(view):]
+                    f.truncate()
+                    os.fsync(f.fileno())
+                except OSError:
+                    # 写了一半的记录会让之后追加的记录都无法重放，截断回写入前的长度
+                    f.truncate(self.size)
+                    os.fsync(f.fileno())
+                    raise
+            self.size += len(data)
+            self.records += len(records)
+            for op in ops:
+                self.track(op)
+
+    def track(self, op):
+        if op['op'] == 'put':
+            entry_id = op['entry']['id']
+            self.changed_ids[entry_id] = None
+            self.deleted_ids.discard(entry_id)
+        else:
+            self.changed_ids.pop(op['id'], None)
+            self.deleted_ids.add(op['id'])
+
+    def replay(self, key, entries):
+        """在快照条目上重放日志，返回新的条目列表"""
+        self.size = 0
+        self.records = 0
+        self.changed_ids = {}
+        self.deleted_ids = set()
+        if not os.path.exists(self.path):
+            return entries
+        with open(self.path, 'rb') as f:
+            blob = f.read()
+        by_id = {entry['id']: entry for entry in entries}
+        offset = 0
+        for op, end in self.decode(key, blob):
+            if op['op'] == 'put':
+                by_id[op['entry']['id']] = op['entry']
+            else:
+                by_id.pop(op['id'], None)
+            self.track(op)
+            self.records += 1
+            offset = end
+        self.size = offset
+        if offset < len(blob):
+            # 截断末尾损坏或未写完的记录
+            with open(self.path, 'r+b') as f:
+                f.truncate(offset)
+                f.flush()
+                os.fsync(f.fileno())
+        return list(by_id.values())
+
+    def decode(self, key, blob):
+        """依次解密日志记录，生成 (变更记录, 记录结束偏移)；末尾写了一半的记录被忽略"""
+        offset = 0
+        prefix = self.HEADER.size + self.NONCE_SIZE + self.TAG_SIZE
+        while offset + prefix <= len(blob):
+            (length,) = self.HEADER.unpack_from(blob, offset)
+            end = offset + prefix + length
+            if end > len(blob):
+                return
+            nonce = blob[offset + self.HEADER.size:offset + self.HEADER.size + self.NONCE_SIZE]
+            tag = blob[offset + self.HEADER.size + self.NONCE_SIZE:offset + prefix]
+            try:
+                cipher = AES.new(key, AES.MODE_GCM, nonce=nonce)
+                op = json.loads(cipher.decrypt_and_verify(blob[offset + prefix:end], tag).decode('utf-8'))
+            except (ValueError, KeyError):
+                if end < len(blob):
+                    raise ValueError(f"日志记录损坏（偏移 {offset}）")
+                return
+            yield op, end
+            offset = end
+
+    def read_secrets(self, key, entry_id):
+        """日志中该条目最后一次写入的密码和备注；尚未合并到快照的新增、修改条目从这里读取
+
+        条目不在日志中或最后一次是删除时返回 None。"""
+        with self.lock:
+            if not self.size:
+                return None
+            with open(self.path, 'rb') as f:
+                blob = f.read(self.size)
+        secrets = None
+        for op, _ in self.decode(key, blob):
+            if op['op'] == 'put' and op['entry']['id'] == entry_id:
+                secrets = split_secrets(op['entry'])[1]
+            elif op['op'] == 'delete' and op['id'] == entry_id:
+                secrets = None
+        return secrets
+
+    def needs_compaction(self, config):
+        return (self.size >= config['journal_max_bytes'] or
+                self.records >= config['journal_max_records'])
+
+    def take_pending(self):
+        """取出待合并的变更，返回 (变更ID, 删除ID, 当前日志长度)"""
+        with self.lock:
+            pending = (list(self.changed_ids), list(self.deleted_ids), self.size, self.records)
+            self.changed_ids = {}
+            self.deleted_ids = set()
+            return pending
+
+    def restore_pending(self, changed_ids, deleted_ids):
+        """合并失败时放回待合并的变更"""
+        with self.lock:
+            for entry_id in changed_ids:
+                if entry_id not in self.deleted_ids:
+                    self.changed_ids.setdefault(entry_id, None)
+            for entry_id in deleted_ids:
+                if entry_id not in self.changed_ids:
+                    self.deleted_ids.add(entry_id)
+
+    def discard_until(self, offset, records):
+        """丢弃已合并到快照的前 offset 字节，保留合并期间新追加的记录"""
+        with self.lock:
+            tail = b''
+            if os.path.exists(self.path):
+                with open(self.path, 'rb') as f:
+                    f.seek(offset)
+                    tail = f.read()
+            temp_file = self.path + '.tmp'
+            with open(temp_file, 'wb') as f:
+                f.write(tail)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temp_file, self.path)
+            self.size = len(tail)
+            self.records = max(0, self.records - records)
+
+    def reset(self):
+        """清空日志（全量写入快照后调用）"""
+        with self.lock:
+            if os.path.exists(self.path):
+                os.remove(self.path)
+            self.size = 0
+            self.records = 0
+            self.changed_ids = {}
+            self.deleted_ids = set()
+
+class SqliteVault:
+    """SQLite 存储后端：每个条目一行，密文与可检索的带密钥哈希列分开存放
+
+    分组和标题只保存 HMAC 值并建立索引，可以按分组查出条目ID，不需要解密整个密码库；
+    修改条目时只写入变更的行。seq 保持条目顺序，条目改了分组时排到末尾，与分组索引一致。"""
+    VERSION = '3'
+
+    def __init__(self, path):
+        self.path = path
+        self.conn = None
+
+    def connect(self):
+        if self.conn is None:
+            # 写入在后台保存线程中执行，读写由 PasswordManager.storage_lock 串行化
+            self.conn = sqlite3.connect(self.path, check_same_thread=False)
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("PRAGMA synchronous=NORMAL")
+            with self.conn:
+                self.conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+                self.conn.execute(
+                    "CREATE TABLE IF NOT EXISTS entries ("
+                    " id TEXT PRIMARY KEY,"
+                    " seq INTEGER NOT NULL,"
+                    " group_tag BLOB,"
+                    " title_tag BLOB,"
+                    " iv BLOB NOT NULL,"
+                    " ciphertext BLOB NOT NULL)"
+                )
+                self.upgrade(self.conn)
+                # 读取时按 seq 排序，新增条目时取最大的 seq
+                self.conn.execute("CREATE INDEX IF NOT EXISTS idx_entries_seq ON entries(seq)")
+                self.conn.execute("CREATE INDEX IF NOT EXISTS idx_entries_group ON entries(group_tag, seq)")
+                self.conn.execute("CREATE INDEX IF NOT EXISTS idx_entries_title ON entries(title_tag)")
+        return self.conn
+
+    def upgrade(self, conn):
+        """版本 2 的表没有哈希列，补上后为空，下次用密钥读取时填入"""
+        columns = [row[1] for row in conn.execute("PRAGMA table_info(entries)")]
+        if 'group_tag' in columns:
+            return
+        conn.execute("ALTER TABLE entries ADD COLUMN group_tag BLOB")
+        conn.execute("ALTER TABLE entries ADD COLUMN title_tag BLOB")
+        conn.execute("UPDATE meta SET value = ? WHERE key = 'version'", (self.VERSION,))
+
+    def close(self):
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+
+    def initialized(self):
+        row = self.connect().execute("SELECT value FROM meta WHERE key = 'version'").fetchone()
+        return row is not None
+
+    def tag(self, key, field, value):
+        """可检索列的带密钥哈希，不同字段使用不同的子密钥"""
+        sub_key = hmac.new(key, f"search:{field}".encode('utf-8'), hashlib.sha256).digest()
+        return hmac.new(sub_key, value.encode('utf-8'), hashlib.sha256).digest()
+
+    def tags(self, key, entry):
+        return (
+            self.tag(key, 'group', entry.get('group', GroupIndex.DEFAULT)),
+            self.tag(key, 'title', entry.get('title', '').lower())
+        )
+
+    def row_values(self, key, entry):
+        iv = get_random_bytes(AES.block_size)
+        cipher = AES.new(key, AES.MODE_CBC, iv)
+        ct = cipher.encrypt(pad(json.dumps(entry).encode('utf-8'), AES.block_size))
+        return self.tags(key, entry) + (iv, ct)
+
+    def decrypt_row(self, key, entry_id, iv, ct):
+        cipher = AES.new(key, AES.MODE_CBC, iv)
+        entry = json.loads(unpad(cipher.decrypt(ct), AES.block_size).decode('utf-8'))
+        entry['id'] = entry_id
+        return entry
+
+    def load(self, key):
+        conn = self.connect()
+        rows = conn.execute("SELECT id, iv, ciphertext, group_tag IS NULL FROM entries ORDER BY seq").fetchall()
+        entries = [self.decrypt_row(key, entry_id, iv, ct) for entry_id, iv, ct, _ in rows]
+        # 从版本 2 升级的行还没有哈希列，条目已经解密，顺便填入
+        missing = [self.tags(key, entry) + (entry['id'],) for entry, row in zip(entries, rows) if row[3]]
+        if missing:
+            with conn:
+                conn.executemany("UPDATE entries SET group_tag = ?, title_tag = ? WHERE id = ?", missing)
+        return entries
+
+    def group_ids(self, key, group):
+        """通过分组索引按顺序查出一个分组的条目ID，不解密任何一行"""
+        rows = self.connect().execute(
+            "SELECT id FROM entries WHERE group_tag = ? ORDER BY seq", (self.tag(key, 'group', group),)
+        )
+        return [row[0] for row in rows]
+
+    def apply_changes(self, key, changed, deleted):
+        """在一个事务中写入变更的行和删除的行"""
+        conn = self.connect()
+        with conn:
+            for entry in changed:
+                values = self.row_values(key, entry)
+                # 改了分组的条目排到末尾，和内存中的分组索引顺序一致
+                cursor = conn.execute(
+                    "UPDATE entries SET seq = CASE WHEN group_tag IS ?1 THEN seq"
+                    " ELSE (SELECT MAX(seq) + 1 FROM entries) END,"
+                    " group_tag = ?1, title_tag = ?2, iv = ?3, ciphertext = ?4 WHERE id = ?5",
+                    values + (entry['id'],)
+                )
+                if cursor.rowcount == 0:
+                    conn.execute(
+                        "INSERT INTO entries (id, seq, group_tag, title_tag, iv, ciphertext) "
+                        "VALUES (?, (SELECT COALESCE(MAX(seq), 0) + 1 FROM entries), ?, ?, ?, ?)",
+                        (entry['id'],) + values
+                    )
+            conn.executemany("DELETE FROM entries WHERE id = ?", [(entry_id,) for entry_id in deleted])
+
+    def replace_all(self, key, entries):
+        """全量替换所有条目（迁移、导入、修改主密码时使用）"""
+        conn = self.connect()
+        with conn:
+            conn.execute("DELETE FROM entries")
+            conn.executemany(
+                "INSERT INTO entries (id, seq, group_tag, title_tag, iv, ciphertext) VALUES (?, ?, ?, ?, ?, ?)",
+                [(entry['id'], seq) + self.row_values(key, entry) for seq, entry in enumerate(entries)]
+            )
+            conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('version', ?)", (self.VERSION,))
+
+def load_pinyin_table():
+    """汉字 -> 不带声调的读音列表，最常用的读音在前"""
+    table = {}
+    for readings in (pinyin_table.READINGS, pinyin_table.ALTERNATE_READINGS):
+        for line in readings.strip().splitlines():
+            reading, chars = line.split(' ', 1)
+            for char in chars:
+                table.setdefault(char, []).append(reading)
+    return table
+
+PINYIN_TABLE = load_pinyin_table()
+PINYIN_VARIANTS = 4
+
+def pinyin_keys(text):
+    """规范化后的文字的拼音检索键：全拼和首字母，各占一行；没有汉字时返回空串
+
+    多音字按常用读音生成一组，每个多音字换成第二个读音再各生成一组（如"银行"的 yinhang），
+    最多 PINYIN_VARIANTS 组。汉字以外的字符原样保留。"""
+    readings = [PINYIN_TABLE.get(char) for char in text]
+    if not any(readings):
+        return ''
+    primary = [found[0] if found else char for char, found in zip(text, readings)]
+    variants = [primary]
+    for i, found in enumerate(readings):
+        if found and len(found) > 1 and len(variants) < PINYIN_VARIANTS:
+            variants.append(primary[:i] + [found[1]] + primary[i + 1:])
+    keys = []
+    for variant in variants:
+        keys.append(''.join(variant))
+        keys.append(''.join(syllable[0] for syllable in variant))
+    return '\n'.join(keys)
+
+class SearchQuery:
+    """搜索框的查询语法
+
+    空格分隔的多个词都要匹配；`title:`、`user:`、`url:`、`host:`、`group:`、`notes:` 只在对应字段中查找，
+    `host:` 匹配登录地址的主机名；双引号括起的短语可以包含空格；词前加 `-` 表示排除。
+    其他前缀（如 `https:`）连同冒号按普通文字处理。"""
+    FIELDS = {'title': 'title', 'user': 'username', 'url': 'url', 'host': 'host',
+              'group': 'group', 'notes': 'notes'}
+    TOKEN = re.compile(r'(-?)(?:([a-z]+):)?("[^"]*"?|\S*)')
+
+    @classmethod
+    def parse(cls, query):
+        """解析规范化后的查询，返回 [(字段, 文字, 是否排除)]，字段为 None 表示任意字段"""
+        terms = []
+        for match in cls.TOKEN.finditer(query):
+            negated, prefix, text = match.groups()
+            if prefix is not None and prefix not in cls.FIELDS:
+                text = match.group(0)[len(negated):]
+                prefix = None
+            elif text.startswith('"'):
+                text = text[1:-1] if len(text) > 1 and text.endswith('"') else text[1:]
+            if text:
+                terms.append((cls.FIELDS.get(prefix), text, bool(negated)))
+        return terms
+
+    @staticmethod
+    def plain(query, terms):
+        """只由普通词组成的查询：结果一定包含在它的任何前缀的结果里"""
+        return '"' not in query and all(field is None and not negated for field, _, negated in terms)
+
+class SearchIndex:
+    """搜索用的三元组倒排索引
+
+    标题、用户名、登录地址和备注规范化（NFKC 兼容分解后折叠大小写，全角和半角视为相同）后，
+    连同标题的拼音检索键切成三个字符的片段，每个片段记录包含它的条目，输入拼音全拼或首字母也能找到中文标题。
+    子串查询取查询串各片段倒排表的交集，再逐条确认，不需要扫描全部条目；只有一个三个字符的词时倒排表就是结果，
+    只有一个更短的词且它属于全部条目都包含的某个片段时结果就是全部条目。
+    最近的查询结果按查询串缓存：新查询是某个缓存查询的延长时只在它的结果里筛选，
+    退回到之前输入过的前缀时直接取缓存。
+    条目增删改时原地更新并清空结果缓存，锁定时清空；快速搜索用的 FuzzyIndex
+    和按分组列出条目用的 GroupIndex 随之更新。"""
+    FIELDS = ('title', 'username', 'url', 'notes')
+    GRAM = 3
+    CACHE_SIZE = 32
+
+    def __init__(self):
+        self.fuzzy = FuzzyIndex()
+        self.groups = GroupIndex()
+        # 后台搜索线程与 GUI 线程的增删改互斥；version 在每次变更时递增，
+        # 后台查询期间索引变化过，结果就不再写入缓存
+        self.lock = threading.RLock()
+        self.version = 0
+        self.clear()
+
+    def clear(self):
+        with self.lock:
+            self.postings = {}  # 片段 -> 条目ID集合
+            self.texts = {}  # 条目ID -> 规范化后的文本
+            self.entries = {}  # 条目ID -> 条目
+            self.order = {}  # 条目ID -> 顺序号，搜索结果按加入顺序返回
+            self.next_order = 0
+            self.results = OrderedDict()  # (分组, 规范化后的查询) -> 结果条目ID
+            self.universal = (None, [])  # (索引版本, 全部条目都包含的片段)
+            self.version += 1
+            self.fuzzy.clear()
+            self.groups.clear()
+
+    @staticmethod
+    def normalize(text):
+        return unicodedata.normalize('NFKC', text).casefold()
+
+    def grams(self, text):
+        return {text[i:i + self.GRAM] for i in range(len(text) - self.GRAM + 1)}
+
+    def build(self, entries):
+        self.clear()
+        for entry in entries:
+            self.add(entry)
+
+    def text(self, entry):
+        fields = [self.normalize(str(entry.get(field) or '')) for field in self.FIELDS]
+        keys = pinyin_keys(fields[0])
+        if keys:
+            fields.append(keys)
+        return '\n'.join(fields)
+
+    def add(self, entry):
+        """加入或更新一个条目，更新时保留原来的顺序"""
+        entry_id = entry['id']
+        text = self.text(entry)
+        with self.lock:
+            if entry_id in self.texts:
+                self.discard_grams(entry_id)
+            else:
+                self.order[entry_id] = self.next_order
+                self.next_order += 1
+            self.texts[entry_id] = text
+            self.entries[entry_id] = entry
+            self.results.clear()
+            self.version += 1
+            postings = self.postings
+            for gram in self.grams(text):
+                ids = postings.get(gram)
+                if ids is None:
+                    postings[gram] = {entry_id}
+                else:
+                    ids.add(entry_id)
+            self.fuzzy.add(entry)
+            self.groups.add(entry)
+
+    def discard_grams(self, entry_id):
+        for gram in self.grams(self.texts[entry_id]):
+            ids = self.postings[gram]
+            ids.discard(entry_id)
+            if not ids:
+                del self.postings[gram]
+
+    def remove(self, entry_id):
+        with self.lock:
+            if entry_id not in self.texts:
+                return
+            self.discard_grams(entry_id)
+            del self.texts[entry_id]
+            del self.entries[entry_id]
+            del self.order[entry_id]
+            self.results.clear()
+            self.version += 1
+            self.fuzzy.remove(entry_id)
+            self.groups.remove(entry_id)
+
+    def restore(self, entries, texts, labels, postings, groups):
+        """用索引缓存文件中的规范化文本、快速搜索的串、倒排表和分组恢复索引，不再逐条规范化"""
+        with self.lock:
+            self.clear()
+            for entry, text in zip(entries, texts):
+                entry_id = entry['id']
+                self.order[entry_id] = self.next_order
+                self.next_order += 1
+                self.texts[entry_id] = text
+                self.entries[entry_id] = entry
+            self.fuzzy.restore(entries, labels)
+            self.postings = postings
+            self.groups.restore(groups)
+
+    def prepare_fuzzy(self):
+        """建立快速搜索的字符位图和拼接串（加载完成后在后台线程中调用），期间条目有变化时放弃，留到第一次查询时建立"""
+        with self.lock:
+            fuzzy = self.fuzzy
+            if fuzzy.bits is not None:
+                return
+            slots, labels, modified = list(fuzzy.slots), dict(fuzzy.labels), fuzzy.modified
+        bits = FuzzyIndex.compute_bits(slots, labels)
+        joined, starts = FuzzyIndex.compute_joined(slots, labels)
+        with self.lock:
+            if fuzzy is self.fuzzy and fuzzy.modified == modified:
+                fuzzy.bits = bits
+                fuzzy.joined, fuzzy.starts = joined, starts
+
+    def take(self, other):
+        """换用在其他线程中建好的索引"""
+        with self.lock:
+            self.postings, self.texts, self.entries = other.postings, other.texts, other.entries
+            self.order, self.next_order = other.order, other.next_order
+            self.fuzzy, self.groups = other.fuzzy, other.groups
+            self.results = OrderedDict()
+            self.version += 1
+
+    def group_entries(self, group):
+        """按加入分组的顺序返回分组的条目"""
+        return list(self.groups.ids(group).values())
+
+    def parse(self, query):
+        return SearchQuery.parse(self.normalize(query))
+
+    def search(self, query, group=None):
+        """返回符合查询的条目，指定分组时只在分组内查找；查询中没有词时返回 None"""
+        query = self.normalize(query)
+        terms = SearchQuery.parse(query)
+        if not terms:
+            return None
+        with self.lock:
+            ids = self.cached(query, group)
+            if ids is None:
+                ids = self.lookup(query, group, terms)
+                self.remember(query, group, ids)
+            return self.entries_of(ids, group)
+
+    def cached_search(self, query, group=None):
+        """只查结果缓存，没有缓存时返回 None，GUI 线程用来跳过后台查询"""
+        query = self.normalize(query)
+        with self.lock:
+            ids = self.cached(query, group)
+            return None if ids is None else self.entries_of(ids, group)
+
+    def entries_of(self, ids, group):
+        """结果条目ID对应的条目；不限分组时结果按加入顺序排列，全部条目都匹配时直接取全部条目"""
+        if group is None and len(ids) == len(self.entries):
+            return list(self.entries.values())
+        return list(map(self.entries.__getitem__, ids))
+
+    def cached(self, query, group):
+        key = (group, query)
+        ids = self.results.get(key)
+        if ids is not None:
+            self.results.move_to_end(key)
+        return ids
+
+    def remember(self, query, group, ids):
+        self.results[(group, query)] = ids
+        if len(self.results) > self.CACHE_SIZE:
+            self.results.popitem(last=False)
+
+    def universal_grams(self):
+        """全部条目都包含的片段，索引变化后第一次用到时重新统计"""
+        version, grams = self.universal
+        if version != self.version:
+            count = len(self.texts)
+            grams = [gram for gram, ids in self.postings.items() if len(ids) == count]
+            self.universal = (self.version, grams)
+        return grams
+
+    def counted(self, terms, group):
+        """只有一个普通词且不限分组时，不逐条确认就能得出的结果；其他情况返回 None
+
+        GRAM 个字符的词的倒排表就是结果。更短的词是某个全部条目都包含的片段的一部分时，
+        结果就是全部条目，开始输入的几个字符通常如此。"""
+        if group is not None or len(terms) != 1 or terms[0][0] is not None or terms[0][2]:
+            return None
+        text = terms[0][1]
+        if len(text) < self.GRAM:
+            if any(text in gram for gram in self.universal_grams()):
+                return list(self.texts)
+            return None
+        if len(text) != self.GRAM:
+            return None
+        ids = self.postings.get(text, ())
+        if len(ids) == len(self.texts):
+            return list(self.texts)
+        return self.ordered(ids, self.texts)
+
+    def lookup(self, query, group, terms=None):
+        texts = self.texts
+        if terms is None:
+            terms = SearchQuery.parse(query)
+        ids = self.counted(terms, group)
+        if ids is not None:
+            return ids
+        candidates, match, text = self.plan(query, group, terms)
+        if text is None:
+            return [entry_id for entry_id in candidates if match(entry_id)]
+        # 只有一个普通词时直接在规范化文本上查找
+        if candidates is texts:
+            return [entry_id for entry_id, entry_text in texts.items() if text in entry_text]
+        return [entry_id for entry_id in candidates if text in texts[entry_id]]
+
+    def plan(self, query, group, terms=None):
+        """把查询编译成执行计划，返回 (候选条目ID, 逐条判断的函数, 单个普通词)
+
+        候选取自估计最小的一个有索引的条件：同一分组下缓存的前缀结果、某个词的片段倒排表的交集、
+        group: 匹配的分组；都不够小时扫描整个范围。其余条件只对候选逐条判断，普通词在前，
+        限定字段的词其次，排除的词最后。查询只有一个普通词时第三项是这个词，否则为 None。
+        需要扫描整个范围时候选直接是 texts 或分组成员的 dict，调用方不能在锁外遍历。"""
+        if terms is None:
+            terms = SearchQuery.parse(query)
+        texts = self.texts
+        # 查询中指定了分组时不再限于当前分组
+        if any(field == 'group' and not negated for field, _, negated in terms):
+            group = None
+        members = texts if group is None else self.groups.ids(group)
+        # (估计代价, 生成候选)：逐个查找文本比直接遍历慢，前缀结果和分组成员按两倍、倒排表按四倍计
+        options = [(len(members), lambda: members)]
+        if SearchQuery.plain(query, terms):
+            for end in range(len(query) - 1, 0, -1):
+                previous = self.results.get((group, query[:end]))
+                if previous is not None:
+                    options.append((len(previous) * 2, lambda previous=previous: previous))
+                    break
+        for field, text, negated in terms:
+            if negated:
+                continue
+            if field == 'group':
+                groups = [self.groups.ids(name) for name in self.groups.names() if text in self.normalize(name)]
+                options.append((sum(map(len, groups)) * 2, lambda groups=groups: self.ordered(
+                    (entry_id for ids in groups for entry_id in ids), members)))
+            elif len(text) >= self.GRAM:
+                # 字段中包含的文字在合并后的文本中也一定出现，倒排表同样可以缩小候选
+                postings = sorted((self.postings.get(gram, set()) for gram in self.grams(text)), key=len)
+                options.append((len(postings[0]) * 4, lambda postings=postings: self.ordered(
+                    postings[0].intersection(*postings[1:]), members)))
+        candidates = min(options, key=lambda option: option[0])[1]()
+
+        checks = [self.predicate(field, text, negated) for field, text, negated
+                  in sorted(terms, key=lambda term: (term[2], term[0] is not None))]
+
+        def match(entry_id):
+            # 后台查询期间条目可能已被删除
+            if entry_id not in texts:
+                return False
+            for check in checks:
+                if not check(entry_id):
+                    return False
+            return True
+
+        single = len(terms) == 1 and terms[0][0] is None and not terms[0][2]
+        return candidates, match, terms[0][1] if single else None
+
+    def ordered(self, ids, members):
+        if members is not self.texts:
+            # 不限分组时倒排表中的条目都在范围内，不必逐个判断
+            ids = [entry_id for entry_id in ids if entry_id in members]
+        return sorted(ids, key=self.order.__getitem__)
+
+    def predicate(self, field, text, negated):
+        texts, entries, normalize = self.texts, self.entries, self.normalize
+        if field is None:
+            check = lambda entry_id: text in texts[entry_id]
+        elif field == 'title':
+            def check(entry_id):
+                title = normalize(str(entries[entry_id].get('title') or ''))
+                return text in title or text in pinyin_keys(title)
+        elif field == 'host':
+            check = lambda entry_id: text in self.host(entries[entry_id])
+        elif field == 'group':
+            check = lambda entry_id: text in normalize(entries[entry_id].get('group', GroupIndex.DEFAULT))
+        else:
+            check = lambda entry_id: text in normalize(str(entries[entry_id].get(field) or ''))
+        return (lambda entry_id: not check(entry_id)) if negated else check
+
+    def host(self, entry):
+        """登录地址的主机名，没有协议前缀的地址也能解析"""
+        url = str(entry.get('url') or '').strip()
+        try:
+            return self.normalize(urlsplit(url if '://' in url else '//' + url).hostname or '')
+        except ValueError:
+            return ''
+
+class GroupIndex:
+    """分组索引：分组名 -> 分组内的条目
+
+    每个分组是按加入顺序排列的 条目ID -> 条目 的 dict；另记录每个条目所在的分组，
+    条目增删改时只移动这一个条目，切换分组和分组内搜索只看分组的成员，
+    分组的条目数就是集合的大小。默认分组总是排在第一个。"""
+    DEFAULT = '默认分组'
+
+    def __init__(self):
+        self.clear()
+
+    def clear(self):
+        self.members = {self.DEFAULT: {}}  # 分组名 -> {条目ID: 条目}
+        self.group_of = {}  # 条目ID -> 分组名
+
+    def add(self, entry):
+        """加入条目，条目改了分组时移到新分组的末尾"""
+        entry_id = entry['id']
+        group = entry.get('group', self.DEFAULT)
+        previous = self.group_of.get(entry_id)
+        if previous == group:
+            self.members[group][entry_id] = entry
+            return
+        if previous is not None:
+            del self.members[previous][entry_id]
+        self.members.setdefault(group, {})[entry_id] = entry
+        self.group_of[entry_id] = group
+
+    def remove(self, entry_id):
+        group = self.group_of.pop(entry_id, None)
+        if group is not None:
+            del self.members[group][entry_id]
+
+    def restore(self, groups):
+        """按 [(分组名, 条目列表)] 恢复，条目顺序即分组内的顺序"""
+        self.clear()
+        for group, entries in groups:
+            members = self.members.setdefault(group, {})
+            for entry in entries:
+                members[entry['id']] = entry
+                self.group_of[entry['id']] = group
+
+    def add_group(self, group):
+        """新建空分组，已存在时返回 False"""
+        if group in self.members:
+            return False
+        self.members[group] = {}
+        return True
+
+    def names(self):
+        return list(self.members)
+
+    def count(self, group):
+        return len(self.members.get(group, ()))
+
+    def ids(self, group):
+        return self.members.get(group, {})
+
+class FuzzyIndex:
+    """快速搜索用的模糊匹配索引
+
+    标题（后接拼音检索键）、用户名、登录地址规范化后用制表符拼成一个串，查询字符按顺序出现在串中即算匹配，
+    连续匹配、落在单词开头、落在标题内的匹配加分。每个条目占一个固定槽位，
+    每个字符对应一个以槽位为位的大整数，查询时各字符的位图相与即得到可能匹配的条目。
+    打分时先看最近查看的条目，再从新到旧看查询词连续出现（子串命中）的条目，
+    最后看只是字符按顺序出现的条目，后两类合计最多打分 BUDGET 个；子串命中排在前面，
+    不会因为有大量更新的子序列候选而轮不到。用小顶堆保留得分最高的几个。"""
+    FIELDS = ('title', 'username', 'url')
+    SEPARATORS = frozenset(' \t._-@/:')
+    # 打分：每个匹配字符、连续匹配、单词开头、整个匹配落在标题内、跳过字符的扣分
+    SCORE_MATCH = 16
+    SCORE_CONSECUTIVE = 8
+    SCORE_WORD_START = 12
+    SCORE_TITLE = 16
+    PENALTY_GAP = 1
+    MAX_GAP_PENALTY = 12
+    # 越近查看或加入的条目加分越多，加分随排名递减
+    SCORE_RECENCY = 8
+    RECENT_SIZE = 64
+    # 每次查询最多查看的子串命中数和最多打分的条目数，保证条目很多、查询很短时输入也不卡顿
+    BUDGET = 1000
+
+    def __init__(self):
+        self.clear()
+
+    def clear(self):
+        self.labels = {}  # 条目ID -> 规范化后的串
+        self.entries = {}  # 条目ID -> 条目
+        self.slots = []  # 槽位 -> 条目ID，删除后留空
+        self.slot_of = {}  # 条目ID -> 槽位
+        self.bits = None  # 字符键 -> 位图，加载完成后在后台建立，没有建好时在第一次查询时建立
+        self.joined = None  # 各槽位的串用换行拼接，查找子串命中；条目变化后在下次查询时重建
+        self.starts = None  # 各槽位在 joined 中的起始位置
+        self.modified = 0  # 条目变化的次数，后台建好的位图只在期间没有变化时采用
+        self.recent = OrderedDict()  # 最近查看的条目ID，最近的在最后
+
+    @staticmethod
+    def keys(text):
+        """text 中出现的字符，非 ASCII 字符按码点折叠到 128 个键上，误判的条目在打分时排除"""
+        return {char if char < '\x80' else chr(0x80 + ord(char) % 128) for char in set(text)}
+
+    def add(self, entry):
+        """加入或更新一个条目，更新时保留原来的槽位"""
+        entry_id = entry['id']
+        slot = self.slot_of.get(entry_id)
+        appended = slot is None
+        if appended:
+            slot = len(self.slots)
+            self.slots.append(entry_id)
+            self.slot_of[entry_id] = slot
+        else:
+            self.set_bits(self.labels[entry_id], slot, False)
+        fields = [SearchIndex.normalize(str(entry.get(field) or '')) for field in self.FIELDS]
+        keys = pinyin_keys(fields[0])
+        if keys:
+            # 拼音接在标题之后，匹配拼音同样按标题内的匹配加分
+            fields[0] += ' ' + keys.replace('\n', ' ')
+        label = '\t'.join(fields)
+        self.labels[entry_id] = label
+        self.entries[entry_id] = entry
+        self.set_bits(label, slot, True)
+        if appended and self.joined is not None:
+            # 新条目接在末尾，不必重新拼接
+            self.starts.append(len(self.joined) + 1 if slot else 0)
+            self.joined += '\n' + label if slot else label
+        else:
+            self.joined = None
+        self.modified += 1
+
+    def restore(self, entries, labels):
+        """按顺序恢复条目和已经规范化的串，位图之后再建立"""
+        self.clear()
+        for slot, (entry, label) in enumerate(zip(entries, labels)):
+            entry_id = entry['id']
+            self.slots.append(entry_id)
+            self.slot_of[entry_id] = slot
+            self.labels[entry_id] = label
+            self.entries[entry_id] = entry
+        self.modified += 1
+
+    def remove(self, entry_id):
+        slot = self.slot_of.pop(entry_id, None)
+        if slot is None:
+            return
+        self.set_bits(self.labels.pop(entry_id), slot, False)
+        del self.entries[entry_id]
+        self.slots[slot] = None
+        self.recent.pop(entry_id, None)
+        self.joined = None
+        self.modified += 1
+        if len(self.slots) > 2 * len(self.slot_of) + 64:
+            # 空槽位太多时重新编号，位图下次查询时重建
+            self.slots = [entry_id for entry_id in self.slots if entry_id is not None]
+            self.slot_of = {entry_id: slot for slot, entry_id in enumerate(self.slots)}
+            self.bits = None
+
+    def touch(self, entry_id):
+        """记录条目刚被查看，快速搜索时排在前面"""
+        if entry_id in self.slot_of:
+            self.recent.pop(entry_id, None)
+            self.recent[entry_id] = None
+            if len(self.recent) > self.RECENT_SIZE:
+                self.recent.popitem(last=False)
+
+    def set_bits(self, label, slot, present):
+        if self.bits is None:
+            return
+        bit = 1 << slot
+        for key in self.keys(label):
+            if present:
+                self.bits[key] = self.bits.get(key, 0) | bit
+            else:
+                self.bits[key] &= ~bit
+
+    @classmethod
+    def compute_bits(cls, slots, labels):
+        # 每个键先用一个字节一个槽位的 bytearray 记录，最后整体转换成整数，避免反复复制大整数
+        arrays = {}
+        for slot, entry_id in enumerate(slots):
+            if entry_id is not None:
+                for key in cls.keys(labels[entry_id]):
+                    data = arrays.get(key)
+                    if data is None:
+                        data = arrays[key] = bytearray(len(slots))
+                    data[slot] = 1
+        digits = bytes.maketrans(b'\x00\x01', b'01')
+        return {key: int(data[::-1].translate(digits), 2) for key, data in arrays.items()}
+
+    def build_bits(self):
+        self.bits = self.compute_bits(self.slots, self.labels)
+        if self.joined is None:
+            self.joined, self.starts = self.compute_joined(self.slots, self.labels)
+
+    @staticmethod
+    def compute_joined(slots, labels):
+        """各槽位的串用换行拼接，返回 (拼接串, 各槽位的起始位置)"""
+        texts = [labels[entry_id] if entry_id is not None else '' for entry_id in slots]
+        starts = list(itertools.accumulate((len(text) + 1 for text in texts[:-1]), initial=0)) if texts else []
+        return '\n'.join(texts), starts
+
+    def rarest(self, terms):
+        """在拼接串中出现次数最少的词，用它查找子串命中"""
+        if self.joined is None:
+            self.joined, self.starts = self.compute_joined(self.slots, self.labels)
+        return min(terms, key=self.joined.count) if len(terms) > 1 else terms[0]
+
+    def substring_hits(self, term):
+        """串中含有 term 的条目ID，从新到旧；在拼接后的串上查找，不逐条比较"""
+        if self.joined is None:
+            self.joined, self.starts = self.compute_joined(self.slots, self.labels)
+        end = len(self.joined)
+        while end > 0:
+            pos = self.joined.rfind(term, 0, end)
+            if pos < 0:
+                return
+            slot = bisect.bisect_right(self.starts, pos) - 1
+            yield self.slots[slot]
+            # 同一个条目只返回一次，接着在前一个槽位之前查找
+            end = self.starts[slot] - 1
+
+    def candidates(self, query):
+        """包含查询全部字符、不在最近查看中的条目ID，从新到旧"""
+        if self.bits is None:
+            self.build_bits()
+        bits = -1
+        for key in self.keys(query):
+            bits &= self.bits.get(key, 0)
+        if bits <= 0:
+            return
+        # 二进制串里越靠前的位槽位越大，也就是越新加入的条目
+        digits = bin(bits)
+        last = len(digits) - 1
+        pos = digits.find('1', 2)
+        while pos >= 0:
+            entry_id = self.slots[last - pos]
+            if entry_id not in self.recent:
+                yield entry_id
+            pos = digits.find('1', pos + 1)
+
+    def score(self, query, label):
+        """查询字符按顺序出现在 label 中时返回得分，否则返回 None"""
+        title_end = label.find('\t')
+        if title_end < 0:
+            title_end = len(label)
+        pos = label.find(query)
+        if pos >= 0:
+            # 连续出现时优先取落在单词开头的位置
+            first = pos
+            while pos > 0 and label[pos - 1] not in self.SEPARATORS:
+                pos = label.find(query, pos + 1)
+            if pos < 0:
+                pos = first
+            score = len(query) * self.SCORE_MATCH + (len(query) - 1) * self.SCORE_CONSECUTIVE
+            if pos == 0 or label[pos - 1] in self.SEPARATORS:
+                score += self.SCORE_WORD_START
+            if pos + len(query) <= title_end:
+                score += self.SCORE_TITLE
+            return score - min(pos, self.MAX_GAP_PENALTY) * self.PENALTY_GAP
+        # 子序列匹配：每个字符取最靠前的位置
+        score = 0
+        gap = 0
+        pos = -1
+        for char in query:
+            found = label.find(char, pos + 1)
+            if found < 0:
+                return None
+            score += self.SCORE_MATCH
+            if found == pos + 1:
+                score += self.SCORE_CONSECUTIVE
+            elif found == 0 or label[found - 1] in self.SEPARATORS:
+                score += self.SCORE_WORD_START
+            gap += found - pos - 1
+            pos = found
+        if pos < title_end:
+            score += self.SCORE_TITLE
+        return score - min(gap, self.MAX_GAP_PENALTY) * self.PENALTY_GAP
+
+    def max_score(self, query):
+        """score 对该查询可能给出的最高分"""
+        return (len(query) * self.SCORE_MATCH + (len(query) - 1) * self.SCORE_CONSECUTIVE
+                + self.SCORE_WORD_START + self.SCORE_TITLE)
+
+    def search(self, query, limit=20):
+        """返回得分最高的 limit 个条目，按得分从高到低排列
+
+        空格分隔的多个词分别匹配，全部匹配才算命中，得分相加。
+        最近查看的条目加分随排名递减；同分时新加入的条目在前。其余条目按从新到旧打分，
+        堆里的最低分已经达到可能的最高分时，后面的条目不会再排进来，提前结束。"""
+        terms = SearchIndex.normalize(query).split()
+        if not terms:
+            return []
+        best = sum(self.max_score(term) for term in terms)
+        heap = []
+        seen = set()
+
+        def consider(entry_id, recency):
+            seen.add(entry_id)
+            label = self.labels[entry_id]
+            score = 0
+            for term in terms:
+                term_score = self.score(term, label)
+                if term_score is None:
+                    return
+                score += term_score
+            item = (score + recency, self.slot_of[entry_id], entry_id)
+            if len(heap) < limit:
+                heapq.heappush(heap, item)
+            elif item > heap[0]:
+                heapq.heapreplace(heap, item)
+
+        for rank, entry_id in enumerate(reversed(self.recent)):
+            consider(entry_id, self.SCORE_RECENCY / (rank + 1))
+        # 子串命中通常得分最高，先于子序列候选打分；多个词时沿出现最少的词查找
+        scored = 0
+        for checked, entry_id in enumerate(self.substring_hits(self.rarest(terms))):
+            if checked >= self.BUDGET:
+                break
+            if len(heap) == limit and heap[0][0] >= best:
+                return self.ranked(heap)
+            label = self.labels[entry_id]
+            if entry_id not in seen and all(term in label for term in terms):
+                consider(entry_id, 0)
+                scored += 1
+        for entry_id in self.candidates(''.join(terms)):
+            if scored >= self.BUDGET or (len(heap) == limit and heap[0][0] >= best):
+                break
+            if entry_id not in seen:
+                consider(entry_id, 0)
+                scored += 1
+        return self.ranked(heap)
+
+    def ranked(self, heap):
+        return [self.entries[entry_id] for _, _, entry_id in sorted(heap, reverse=True)]
+
+class IndexSidecar:
+    """搜索索引的加密缓存文件，与数据文件同名、扩展名为 .index
+
+    保存三元组倒排表和各分组的条目顺序，条目ID换成序号后存为 uint32 数组，连同各条目规范化后的文本
+    和快速搜索的串整体用 AES-GCM 加密。文件头记录生成时数据文件和日志内容的带密钥摘要，
+    解锁时先比较摘要，一致才解密并直接恢复索引，不必再做 NFKC 规范化和拼音转换；
+    不一致或文件损坏时照常逐条建立。快速搜索的位图不保存，加载完成后在后台建立。"""
+    MAGIC = b'PMIX'
+    VERSION = 4  # 规范化方式、检索键或建立索引的条目内容变化时递增，旧的缓存文件视为过期
+    HEADER = struct.Struct('>4sH32s12s16s')  # 魔数、版本、密码库摘要、nonce、tag
+    TAG_SIZE = 16
+
+    def __init__(self, data_file):
+        base = os.path.splitext(data_file)[0]
+        self.data_file = data_file
+        self.journal_path = base + '.journal'
+        self.path = base + '.index'
+
+    def digest(self, key, lazy):
+        """数据文件和日志内容的摘要；索引的字段或 lazy 模式不同时摘要也不同"""
+        mac = hmac.new(key, b'search-index', hashlib.sha256)
+        mac.update(json.dumps([SearchIndex.FIELDS, SearchIndex.GRAM, lazy]).encode('utf-8'))
+        for path in (self.data_file, self.journal_path):
+            if os.path.exists(path):
+                with open(path, 'rb') as f:
+                    mac.update(f.read())
+            mac.update(b'\0')
+        return mac.digest()
+
+    def matches(self, digest):
+        """只读文件头，判断缓存是否对应当前的密码库"""
+        try:
+            with open(self.path, 'rb') as f:
+                header = f.read(self.HEADER.size)
+        except OSError:
+            return False
+        if len(header) < self.HEADER.size:
+            return False
+        magic, version, stored, _, _ = self.HEADER.unpack(header)
+        return magic == self.MAGIC and version == self.VERSION and hmac.compare_digest(stored, digest)
+
+    def write(self, key, digest, index):
+        """把索引写入缓存文件，先写临时文件再替换"""
+        ids = list(index.order)
+        ordinals = {entry_id: i for i, entry_id in enumerate(ids)}
+        grams = list(index.postings)
+        groups = [group for group in index.groups.names()
+                  if index.groups.count(group) or group == GroupIndex.DEFAULT]
+        counts = array('I')
+        values = array('I')
+        for gram in grams:
+            # 序号排好序，读取时按顺序访问条目ID，建集合比乱序快
+            counts.append(len(index.postings[gram]))
+            values.extend(sorted(map(ordinals.__getitem__, index.postings[gram])))
+        for group in groups:
+            counts.append(index.groups.count(group))
+            values.extend(map(ordinals.__getitem__, index.groups.ids(group)))
+        if sys.byteorder != 'little':
+            counts.byteswap()
+            values.byteswap()
+        meta = json.dumps({
+            'ids': ids, 'grams': grams, 'groups': groups,
+            'texts': [index.texts[entry_id] for entry_id in ids],
+            'labels': [index.fuzzy.labels[entry_id] for entry_id in ids]
+        }).encode('utf-8')
+        nonce = get_random_bytes(12)
+        cipher = AES.new(key, AES.MODE_GCM, nonce=nonce)
+        cipher.update(self.MAGIC + struct.pack('>H', self.VERSION) + digest + nonce)
+        ct, tag = cipher.encrypt_and_digest(struct.pack('>I', len(meta)) + meta + counts.tobytes() + values.tobytes())
+        temp_file = self.path + '.tmp'
+        with open(temp_file, 'wb') as f:
+            f.write(self.HEADER.pack(self.MAGIC, self.VERSION, digest, nonce, tag))
+            f.write(ct)
+        os.replace(temp_file, self.path)
+
+    def load(self, key, digest, entries):
+        """摘要一致时解密缓存文件，返回恢复好的 SearchIndex；过期或损坏时返回 None"""
+        if not self.matches(digest):
+            return None
+        with open(self.path, 'rb') as f:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                _, _, _, nonce, tag = self.HEADER.unpack_from(data, 0)
+                cipher = AES.new(key, AES.MODE_GCM, nonce=nonce)
+                cipher.update(data[:self.HEADER.size - self.TAG_SIZE])
+                try:
+                    with memoryview(data) as view:
+                        plaintext = cipher.decrypt_and_verify(view[self.HEADER.size:], tag)
+                except ValueError:
+                    return None
+        (meta_length,) = struct.unpack_from('>I', plaintext, 0)
+        meta = json.loads(plaintext[4:4 + meta_length].decode('utf-8'))
+        ids, grams, groups = meta['ids'], meta['grams'], meta['groups']
+        by_id = {entry['id']: entry for entry in entries}
+        if len(ids) != len(by_id) or by_id.keys() != set(ids):
+            return None
+        counts = array('I')
+        values = array('I')
+        start = 4 + meta_length
+        counts.frombytes(plaintext[start:start + (len(grams) + len(groups)) * counts.itemsize])
+        values.frombytes(plaintext[start + len(counts) * counts.itemsize:])
+        if sys.byteorder != 'little':
+            counts.byteswap()
+            values.byteswap()
+        postings = {}
+        members = []
+        offset = 0
+        for i, count in enumerate(counts):
+            ordinals = values[offset:offset + count]
+            offset += count
+            if i < len(grams):
+                postings[grams[i]] = set(map(ids.__getitem__, ordinals))
+            else:
+                members.append((groups[i - len(grams)], [by_id[ids[ordinal]] for ordinal in ordinals]))
+        index = SearchIndex()
+        index.restore([by_id[entry_id] for entry_id in ids], meta['texts'], meta['labels'], postings, members)
+        return index
+
+class SearchWorker(QObject):
+    """后台搜索：在工作线程中分块确认候选条目，匹配的条目分批通过信号送回 GUI 线程
+
+    每次开始新的查询时取消正在进行的查询：旧查询的取消标记被置位，工作线程在两块之间
+    检查后退出；已经排队的旧批次带着旧的编号，GUI 线程收到后直接丢弃。
+    查询完整结束且期间索引没有变化时，结果写入索引的缓存，之后退格或重复输入不再进入后台。"""
+    CHUNK = 4096  # 每块确认的候选条目数，一块的耗时远小于一帧
+    batch = pyqtSignal(int, object)  # (查询编号, 匹配的条目)
+    finished = pyqtSignal(int)
+
+    def __init__(self, index):
+        super().__init__()
+        self.index = index
+        self.generation = 0
+        self.cancelled = threading.Event()
+
+    def start(self, query, group):
+        """取消之前的查询并在新线程中开始查询，返回查询编号"""
+        self.cancel()
+        self.cancelled = threading.Event()
+        threading.Thread(target=self.run, args=(self.index.normalize(query), group,
+                                                self.generation, self.cancelled), daemon=True).start()
+        return self.generation
+
+    def cancel(self):
+        self.generation += 1
+        self.cancelled.set()
+
+    def run(self, query, group, generation, cancelled):
+        try:
+            self.search(query, group, generation, cancelled)
+        except Exception as e:
+            # 出错时也要结束这次查询，否则列表停留在上一次的结果
+            print(f"搜索失败: {str(e)}")
+        if not cancelled.is_set():
+            self.finished.emit(generation)
+
+    def search(self, query, group, generation, cancelled):
+        index = self.index
+        with index.lock:
+            version = index.version
+            ids = index.counted(SearchQuery.parse(query), group)
+            if ids is not None:
+                index.remember(query, group, ids)
+                matched = index.entries_of(ids, group)
+            else:
+                candidates, match, _ = index.plan(query, group)
+                candidates = list(candidates)
+        if ids is not None:
+            # 不必逐条确认，结果按块送出
+            for start in range(0, len(matched), self.CHUNK):
+                if cancelled.is_set():
+                    return
+                self.batch.emit(generation, matched[start:start + self.CHUNK])
+            return
+        ids = []
+        for start in range(0, len(candidates), self.CHUNK):
+            if cancelled.is_set():
+                return
+            chunk = candidates[start:start + self.CHUNK]
+            with index.lock:
+                # 查询期间条目可能被删除或锁定时清空，match 会跳过已经不在索引中的条目
+                try:
+                    found = [entry_id for entry_id in chunk if match(entry_id)]
+                except Exception:
+                    # 个别条目判断出错时逐条重试，跳过出错的条目
+                    found = [entry_id for entry_id in chunk if self.safe_match(match, entry_id)]
+                matched = [index.entries[entry_id] for entry_id in found if entry_id in index.entries]
+            ids.extend(found)
+            if matched and not cancelled.is_set():
+                self.batch.emit(generation, matched)
+        with index.lock:
+            if index.version == version:
+                index.remember(query, group, ids)
+
+    @staticmethod
+    def safe_match(match, entry_id):
+        try:
+            return match(entry_id)
+        except Exception as e:
+            print(f"搜索时跳过条目 {entry_id}: {str(e)}")
+            return False
+
+class VaultSaver(QObject):
+    """后台保存线程：合并短时间内的多次变更，一次写入存储
+
+    GUI 线程只把变更条目的副本放入队列，工作线程每次取出已积累的全部变更
+    调用 write(full, changed, deleted) 写入。写完或失败时通过信号通知，
+    跨线程的信号会排队到 GUI 线程执行。
+
+    写入失败的一批变更直接丢弃，不再放回队列：之后重放旧快照会覆盖期间的修改。
+    失败后 lost 保持为真，直到用当前数据重新提交的全量快照写入成功。"""
+    saved = pyqtSignal()
+    failed = pyqtSignal(str)
+
+    def __init__(self, write):
+        super().__init__()
+        self.write = write
+        self.condition = threading.Condition()
+        self.full = None  # 待写入的全量快照
+        self.changed = {}  # 待写入的变更条目，同一条目多次修改只保留最后一次
+        self.deleted = set()
+        self.thread = None
+        self.lost = False  # 有变更写入失败，存储中的数据不完整
+
+    def pending(self):
+        return self.full is not None or bool(self.changed) or bool(self.deleted)
+
+    def idle(self):
+        """所有提交都已写入存储：没有排队的变更，没有正在写入的一批，之前也没有写入失败"""
+        with self.condition:
+            return self.thread is None and not self.pending() and not self.lost
+
+    def queue(self, changed, deleted):
+        """把变更并入队列，调用时需持有 condition"""
+        if self.full is not None:
+            # 全量快照尚未写入，直接在快照上修改
+            positions = {entry['id']: i for i, entry in enumerate(self.full)}
+            for entry in changed:
+                if entry['id'] in positions:
+                    self.full[positions[entry['id']]] = entry
+                else:
+                    self.full.append(entry)
+            if deleted:
+                self.full = [entry for entry in self.full if entry['id'] not in deleted]
+            return
+        for entry in changed:
+            self.changed[entry['id']] = entry
+            self.deleted.discard(entry['id'])
+        for entry_id in deleted:
+            self.changed.pop(entry_id, None)
+            self.deleted.add(entry_id)
+
+    def submit(self, changed=(), deleted=()):
+        """提交增量变更"""
+        with self.condition:
+            self.queue([dict(entry) for entry in changed], set(deleted))
+            self.start()
+
+    def submit_full(self, entries):
+        """提交全量快照，之前排队的变更都已包含在内"""
+        with self.condition:
+            self.full = [dict(entry) for entry in entries]
+            self.changed = {}
+            self.deleted = set()
+            self.start()
+
+    def start(self):
+        """需要时启动工作线程，调用时需持有 condition"""
+        if self.thread is None:
+            self.thread = threading.Thread(target=self.run, daemon=True)
+            self.thread.start()
+
+    def run(self):
+        error = None
+        try:
+            while True:
+                with self.condition:
+                    if not self.pending():
+                        break
+                    full, changed, deleted = self.full, list(self.changed.values()), self.deleted
+                    self.full, self.changed, self.deleted = None, {}, set()
+                try:
+                    self.write(full, changed, list(deleted))
+                except Exception as e:
+                    error = e
+                    with self.condition:
+                        # 丢弃失败的这一批，由 GUI 线程提示用户并按当前数据重新全量保存
+                        self.lost = True
+                    break
+                with self.condition:
+                    if full is not None:
+                        self.lost = False
+                    done = not self.pending()
+                if done:
+                    self.saved.emit()
+        finally:
+            with self.condition:
+                self.thread = None
+                # 退出前又有新的提交时继续写入
+                if error is None and self.pending():
+                    self.start()
+                self.condition.notify_all()
+        if error is not None:
+            self.failed.emit(str(error))
+
+    def flush(self, timeout=None):
+        """等待排队的变更全部写入，返回是否全部写入；之前有写入失败且还没有重新全量保存时返回 False"""
+        with self.condition:
+            if self.pending() and self.thread is None:
+                self.start()
+            self.condition.wait_for(lambda: self.thread is None, timeout)
+            return not self.pending() and not self.lost
+
+class UnlockCancelled(Exception):
+    """解锁已被取消，读取数据的工作线程在两批条目之间退出"""
+
+class UnlockPipeline(QObject):
+    """后台解锁：派生密钥、校验主密码、读取并解密数据都在工作线程中完成
+
+    界面先绘制出来并显示加载状态，条目分批解密后通过信号送回 GUI 线程，
+    边解密边加入列表。load(session_key, on_batch) 返回 (条目列表, 是否需要全量保存)。
+    工作线程的信号都经 progress 排队回到 GUI 线程，再由 relay 按编号转发，取消之后才送到的旧信号直接丢弃；
+    取消时只置位取消标记，不在 GUI 线程等待，工作线程在下一批条目前退出。"""
+    rejected = pyqtSignal()  # 主密码不正确
+    unlocked = pyqtSignal(object)  # 主密码正确，开始读取数据；参数为会话密钥
+    batch = pyqtSignal(object)
+    loaded = pyqtSignal(object)
+    failed = pyqtSignal(str)  # 校验主密码时出错
+    load_failed = pyqtSignal(str)  # 读取数据时出错
+    progress = pyqtSignal(int, str, tuple)  # (解锁编号, 信号名, 参数)
+
+    def __init__(self, load):
+        super().__init__()
+        self.load = load
+        self.thread = None
+        self.cancelled_thread = None  # 已取消但可能还没有退出的工作线程
+        self.generation = 0  # 每次启动或取消时递增，旧线程的信号不再转发
+        self.cancelled = threading.Event()
+        self.progress.connect(self.relay)
+
+    def running(self):
+        return self.thread is not None
+
+    def start(self, password, salt):
+        if self.cancelled_thread is not None:
+            # 已取消的上一次解锁很快会退出，等它结束，避免两个线程同时读取存储
+            self.cancelled_thread.join()
+            self.cancelled_thread = None
+        self.generation += 1
+        self.cancelled = threading.Event()
+        self.thread = threading.Thread(target=self.run, args=(password, salt, self.generation, self.cancelled),
+                                       daemon=True)
+        self.thread.start()
+
+    def cancel(self):
+        """放弃正在进行的解锁（锁定时调用），不等待工作线程结束"""
+        self.generation += 1
+        self.cancelled.set()
+        if self.thread is not None:
+            self.cancelled_thread = self.thread
+            self.thread = None
+
+    def relay(self, generation, name, args):
+        """在 GUI 线程中转发工作线程的信号"""
+        if generation == self.generation:
+            getattr(self, name).emit(*args)
+        elif name == 'unlocked':
+            args[0].wipe()  # 取消之后才送到的会话密钥不再使用
+
+    def run(self, password, salt, generation, cancelled):
+        def emit(name, *args):
+            if not cancelled.is_set():
+                self.progress.emit(generation, name, args)
+
+        def on_batch(entries):
+            if cancelled.is_set():
+                raise UnlockCancelled()
+            emit('batch', entries)
+
+        try:
+            try:
+                master_key = read_master_key()
+                session_key = SessionKey.derive(password, salt, master_key['kdf'])
+                if not session_key.verifies(master_key):
+                    session_key.wipe()
+                    emit('rejected')
+                    return
+                if 'key' in master_key:
+                    # 旧格式直接保存了派生密钥，改为只保存校验值
+                    with open('master.key', 'wb') as f:
+                        f.write(session_key.master_key_data())
+            except Exception as e:
+                emit('failed', str(e))
+                return
+            if cancelled.is_set():
+                session_key.wipe()
+                return
+            # 会话密钥交给 GUI 线程设置，工作线程只用自己的引用解密
+            emit('unlocked', session_key)
+            try:
+                result = self.load(session_key, on_batch)
+            except UnlockCancelled:
+                return
+            except Exception as e:
+                emit('load_failed', str(e))
+                return
+            emit('loaded', result)
+        finally:
+            if self.thread is threading.current_thread():
+                self.thread = None
+
+class EntryListModel(QStringListModel):
+    """密码列表的数据模型
+
+    QListView 只为可见的行取数据，不再为每个条目创建 QListWidgetItem。
+    增删改通过 rowsInserted/rowsRemoved/dataChanged 通知视图，只重绘受影响的行。
+    显示文字存放在 QStringListModel 中，视图排版时逐行调用的 rowCount/index 都在 C++ 中完成，
+    不会每行回调一次 Python；entries 是与之逐行对应的条目。"""
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.entries = []
+        self.rows = None  # 条目ID -> 行号，行增删后失效，查找时再重建
+
+    @staticmethod
+    def label(entry):
+        group = entry.get('group', '默认分组')
+        return entry['title'] if group == '默认分组' else f"{entry['title']} ({group})"
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        # UserRole 返回该行条目的ID，行号随搜索和筛选变化，ID 不变
+        if role == Qt.ItemDataRole.UserRole:
+            if index.isValid() and index.row() < len(self.entries):
+                return self.entries[index.row()]['id']
+            return None
+        return super().data(index, role)
+
+    def row_of(self, entry_id):
+        """条目所在的行号，不在列表中时返回 None"""
+        if self.rows is None:
+            self.rows = {entry['id']: row for row, entry in enumerate(self.entries)}
+        return self.rows.get(entry_id)
+
+    def set_entries(self, entries):
+        self.entries = list(entries)
+        self.rows = None
+        self.setStringList([self.label(entry) for entry in self.entries])
+
+    def append_entries(self, entries):
+        if entries:
+            self.insert_entries(len(self.entries), entries)
+
+    def insert_entries(self, row, entries):
+        self.entries[row:row] = entries
+        self.rows = None
+        self.insertRows(row, len(entries))
+        for offset, entry in enumerate(entries):
+            self.setData(self.index(row + offset), self.label(entry))
+
+    def remove_rows(self, row, count=1):
+        # 删除前选择模型会按删除前的行号切换当前行并查询 UserRole，entries 要在之后再删除
+        self.removeRows(row, count)
+        del self.entries[row:row + count]
+        self.rows = None
+
+    def replace_entry(self, row, entry):
+        if self.rows is not None and self.entries[row]['id'] != entry['id']:
+            self.rows = None
+        self.entries[row] = entry
+        self.setData(self.index(row), self.label(entry))
+
+    def apply(self, entries):
+        """把显示的条目改成 entries，只删除和插入有变化的行"""
+        ids = [entry['id'] for entry in entries]
+        wanted = set(ids)
+        kept = [entry['id'] for entry in self.entries if entry['id'] in wanted]
+        kept_ids = set(kept)
+        # 保留的行顺序不一致，或者大部分行都要删除或新增时，重置模型更快
+        if (kept != [entry_id for entry_id in ids if entry_id in kept_ids]
+                or len(kept) * 2 < len(self.entries) or len(kept) * 2 < len(entries)):
+            self.set_entries(entries)
+            return
+        # 从后往前删除，连续的行一次删除
+        row = len(self.entries) - 1
+        while row >= 0:
+            if self.entries[row]['id'] in wanted:
+                row -= 1
+                continue
+            last = row
+            while row > 0 and self.entries[row - 1]['id'] not in wanted:
+                row -= 1
+            self.remove_rows(row, last - row + 1)
+            row -= 1
+        # 保留的行已经是 entries 的子序列，按顺序插入缺少的连续片段
+        row = 0
+        while row < len(entries):
+            if entries[row]['id'] in kept_ids:
+                if self.entries[row] is not entries[row]:
+                    self.replace_entry(row, entries[row])
+                row += 1
+                continue
+            end = row
+            while end < len(entries) and entries[end]['id'] not in kept_ids:
+                end += 1
+            self.insert_entries(row, entries[row:end])
+            row = end
+
+def timed(func):
+    """记录方法的耗时，名称为方法的限定名
+
+    只有开启诊断后才计时；关闭时只多一次 DIAGNOSTICS.enabled 判断，不修改任何类。"""
+    name = func.__qualname__
+    # 信号连接到方法时 PyQt 会传入信号的全部参数，包装后无法再按原方法的参数个数舍去多余的，这里代为截断
+    params = inspect.signature(func).parameters.values()
+    if any(param.kind == param.VAR_POSITIONAL for param in params):
+        limit = None
+    else:
+        limit = sum(param.kind in (param.POSITIONAL_ONLY, param.POSITIONAL_OR_KEYWORD) for param in params)
+
+    @functools.wraps(func)
+    def timed_call(*args, **kwargs):
+        if not DIAGNOSTICS.enabled:
+            return func(*args[:limit], **kwargs)
+        start = time.perf_counter()
+        try:
+            return func(*args[:limit], **kwargs)
+        finally:
+            DIAGNOSTICS.record(name, time.perf_counter() - start)
+    return timed_call
+
+class LatencyHistogram:
+    """最近 WINDOW 次耗时的滚动记录，查看时才排序计算中位数、P95 和最大值"""
+    WINDOW = 1000
+
+    def __init__(self):
+        self.samples = deque(maxlen=self.WINDOW)
+        self.count = 0  # 累计次数，包括已经移出窗口的
+
+    def add(self, seconds):
+        self.samples.append(seconds)
+        self.count += 1
+
+    def summary(self):
+        samples = sorted(self.samples)
+        return {
+            'count': self.count,
+            'p50_ms': round(samples[len(samples) // 2] * 1000, 3),
+            'p95_ms': round(samples[int(len(samples) * 0.95)] * 1000, 3),
+            'max_ms': round(samples[-1] * 1000, 3),
+        }
+
+class EventLoopMonitor(QObject):
+    """应用程序级的事件过滤器：记录事件循环每一轮的处理耗时，并按事件类型估计耗时
+
+    过滤器只在事件分发前被调用，一个事件的耗时按它到下一个事件开始或事件循环进入等待的间隔估计；
+    处理中同步发送的事件会分走后面的耗时。事件循环从被唤醒到再次进入等待，界面都无法响应输入。"""
+    LOOP = "事件循环 每轮处理"
+
+    def __init__(self, diagnostics, app):
+        super().__init__(app)
+        self.diagnostics = diagnostics
+        self.current = None  # 正在处理的事件的记录名称
+        self.started = 0.0
+        self.awoken = None
+        dispatcher = QAbstractEventDispatcher.instance()
+        dispatcher.awake.connect(self.on_awake)
+        dispatcher.aboutToBlock.connect(self.on_about_to_block)
+        app.installEventFilter(self)
+
+    def finish_event(self, now):
+        if self.current is not None:
+            self.diagnostics.record(self.current, now - self.started)
+            self.current = None
+
+    def eventFilter(self, obj, event):
+        now = time.perf_counter()
+        self.finish_event(now)
+        self.current = f"事件 {event.type().name}"
+        self.started = now
+        return False
+
+    def on_awake(self):
+        self.awoken = time.perf_counter()
+
+    def on_about_to_block(self):
+        now = time.perf_counter()
+        self.finish_event(now)
+        if self.awoken is not None:
+            self.diagnostics.record(self.LOOP, now - self.awoken)
+            self.awoken = None
+
+class Diagnostics:
+    """可选的界面耗时记录，在 vault_config.json 中设置 "diagnostics": true 后开启
+
+    开启后用 timed 装饰的方法开始计时，并安装 EventLoopMonitor；每项耗时保存在
+    LatencyHistogram 中，在设置的"诊断"页查看或导出为 JSON。关闭时这些都不会发生。"""
+    def __init__(self):
+        self.enabled = False
+        self.histograms = {}  # 名称 -> LatencyHistogram
+        self.monitor = None
+
+    def enable(self, app):
+        """开启记录，只在第一次调用时生效"""
+        if self.enabled:
+            return
+        self.enabled = True
+        self.monitor = EventLoopMonitor(self, app)
+
+    def record(self, name, seconds):
+        histogram = self.histograms.get(name)
+        if histogram is None:
+            histogram = self.histograms.setdefault(name, LatencyHistogram())
+        histogram.add(seconds)
+
+    def snapshot(self):
+        """各项耗时的统计，按名称排序"""
+        return {name: self.histograms[name].summary() for name in sorted(self.histograms)}
+
+    def dump(self, path):
+        data = {
+            'time': str(datetime.now()),
+            'window': LatencyHistogram.WINDOW,
+            'timings': self.snapshot(),
+        }
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+
+DIAGNOSTICS = Diagnostics()
+
+class ThemeEngine:
+    """浅色、深色两套主题：启动时各生成一次 QPalette，切换主题只更换应用程序的调色板
+
+    控件和对话框的颜色都来自调色板，新建的窗口直接继承当前主题，不再各自解析样式表。
+    设置了样式表的控件会固定使用样式表解析时的调色板，不再随应用程序的调色板变化，
+    因此全局不设样式表：彩色按钮在两种主题下颜色相同，用按钮自己的调色板着色（decorate），
+    只改个别颜色的控件也用 tint 设置局部调色板。"""
+    ROLES = {
+        'window': QPalette.ColorRole.Window,
+        'window_text': QPalette.ColorRole.WindowText,
+        'base': QPalette.ColorRole.Base,
+        'alternate_base': QPalette.ColorRole.AlternateBase,
+        'text': QPalette.ColorRole.Text,
+        'button': QPalette.ColorRole.Button,
+        'button_text': QPalette.ColorRole.ButtonText,
+        'highlight': QPalette.ColorRole.Highlight,
+        'highlighted_text': QPalette.ColorRole.HighlightedText,
+        'mid': QPalette.ColorRole.Mid,
+        'placeholder': QPalette.ColorRole.PlaceholderText,
+        'link': QPalette.ColorRole.Link,
+        'tooltip_base': QPalette.ColorRole.ToolTipBase,
+        'tooltip_text': QPalette.ColorRole.ToolTipText,
+    }
+    COLORS = {
+        False: {'window': '#ffffff', 'window_text': '#2c3e50', 'base': '#ffffff', 'alternate_base': '#f8f9fa',
+                'text': '#2c3e50', 'button': '#f0f0f0', 'button_text': '#2c3e50', 'highlight': '#e3f2fd',
+                'highlighted_text': '#1976d2', 'mid': '#e0e0e0', 'placeholder': '#909399', 'link': '#409eff',
+                'tooltip_base': '#ffffff', 'tooltip_text': '#2c3e50'},
+        True: {'window': '#23272e', 'window_text': '#e0e0e0', 'base': '#1e1e1e', 'alternate_base': '#2d2d2d',
+               'text': '#e0e0e0', 'button': '#424242', 'button_text': '#e0e0e0', 'highlight': '#1565c0',
+               'highlighted_text': '#ffffff', 'mid': '#424242', 'placeholder': '#8a8f98', 'link': '#66b1ff',
+               'tooltip_base': '#2d2d2d', 'tooltip_text': '#e0e0e0'},
+    }
+    # 按对象名着色的按钮，两种主题相同
+    ACCENTS = {
+        'newBtn': '#4CAF50', 'editBtn': '#2196F3', 'deleteBtn': '#F44336', 'shareBtn': '#4CAF50',
+        'settingsBtn': '#607D8B', 'saveBtn': '#2196F3', 'cancelBtn': '#9E9E9E', 'copyBtn': '#4CAF50',
+        'changePasswordBtn': '#4CAF50', 'exportBtn': '#FF9800', 'importBtn': '#9C27B0', 'resetBtn': '#607D8B',
+        'saveShortcutsBtn': '#4CAF50', 'refreshBtn': '#607D8B',
+    }
+    ACCEPT_COLOR = '#2196F3'  # 消息框和输入框的确定、是
+    REJECT_COLOR = '#9E9E9E'  # 取消、否
+    BUTTON_HEIGHT = 32  # 彩色按钮的最小高度，和原来样式表里的内边距相当
+    local_palettes = {}  # (角色, 颜色)... -> 局部调色板，两种主题通用
+
+    def __init__(self, app):
+        self.app = app
+        app.setStyle(QStyleFactory.create('Fusion'))
+        app.setFont(QFont("Microsoft YaHei", 10))
+        self.palettes = {dark: self.build_palette(colors) for dark, colors in self.COLORS.items()}
+        self.dark = None
+
+    def build_palette(self, colors):
+        palette = QPalette()
+        for name, role in self.ROLES.items():
+            palette.setColor(role, QColor(colors[name]))
+        return palette
+
+    def apply(self, dark):
+        """切换主题：应用程序的调色板变化后 Qt 只通知控件重绘，不需要重新解析样式"""
+        if dark != self.dark:
+            self.dark = dark
+            self.app.setPalette(self.palettes[dark])
+
+    @classmethod
+    def tint(cls, widget, **colors):
+        """只设置 widget 的个别颜色角色，其余角色仍然继承当前主题"""
+        key = tuple(sorted(colors.items()))
+        palette = cls.local_palettes.get(key)
+        if palette is None:
+            palette = QPalette()
+            for name, color in key:
+                palette.setColor(cls.ROLES[name], QColor(color))
+            cls.local_palettes[key] = palette
+        widget.setPalette(palette)
+
+    @classmethod
+    def accent(cls, button, color):
+        cls.tint(button, button=color, button_text='#ffffff')
+        button.setMinimumHeight(max(button.minimumHeight(), cls.BUTTON_HEIGHT))
+
+    @classmethod
+    def decorate(cls, widget, accents=None):
+        """按对象名给 widget 中的按钮着色，accents 覆盖默认的颜色"""
+        for button in widget.findChildren(QPushButton):
+            name = button.objectName()
+            color = (accents or {}).get(name) or cls.ACCENTS.get(name)
+            if color:
+                cls.accent(button, color)
+
+    @classmethod
+    def decorate_dialog_buttons(cls, box):
+        """消息框、输入框的标准按钮：确定、是用蓝色，取消、否用灰色"""
+        for button in box.findChildren(QPushButton):
+            text = button.text()
+            if text in ("&Yes", "Yes", "是", "确定", "OK", "&OK"):
+                cls.accent(button, cls.ACCEPT_COLOR)
+            elif text in ("&No", "No", "否", "取消", "Cancel", "&Cancel"):
+                cls.accent(button, cls.REJECT_COLOR)
+
+class NotesView(QPlainTextEdit):
+    """详情面板中的备注：只读、无边框，和其他字段的 QLabel 一样用 setText 更新"""
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setReadOnly(True)
+        self.setFrameShape(QFrame.Shape.NoFrame)
+        self.document().setDocumentMargin(0)
+        self.setMaximumHeight(240)
+        # 不画输入框的底色，和其他字段一样显示在面板上
+        self.viewport().setBackgroundRole(QPalette.ColorRole.Window)
+
+    def setText(self, text):
+        self.setPlainText(text)
+
+class UrlLabel(QLabel):
+    """登录地址标签：按住 Ctrl 点击时发出 ctrl_clicked，普通点击仍可选择文字"""
+    ctrl_clicked = pyqtSignal()
+
+    def mousePressEvent(self, event):
+        if event.modifiers() & Qt.KeyboardModifier.ControlModifier:
+            self.ctrl_clicked.emit()
+        super().mousePressEvent(event)
+
+class DetailPanel(QFrame):
+    """右侧的条目详情：字段标签和复制、打开按钮只创建一次，切换条目时只更新文字
+
+    以前每次选中都把整张 HTML 表格交给富文本 QLabel 重新解析和排版，现在字段内容用纯文本标签显示，
+    登录地址和备注为空时隐藏整行。备注可能很长，用只读的 QPlainTextEdit 显示，只排版可见的部分，
+    也不需要像自动换行的 QLabel 那样为计算高度反复排版全文。没有选中条目时显示使用说明。
+    颜色都来自调色板，切换主题时面板不需要做任何事。"""
+    copy_requested = pyqtSignal(str)
+    open_requested = pyqtSignal(str)
+    COPY_COLOR = '#67c23a'  # 复制操作使用绿色
+    OPEN_COLOR = '#409eff'
+    TUTORIAL_TIPS = [
+        '点击左侧面板底部的"新建密码"按钮，填写密码信息并保存',
+        '在左侧搜索框中输入关键词，可以快速查找密码',
+        '选择密码项后，点击右侧的"修改"按钮进行编辑',
+        '选择密码项后，点击右侧的"删除"按钮删除密码',
+        '选择密码项后，点击右侧的"分享"按钮，可以通过局域网或热点分享密码',
+        '• 点击密码详情中的"复制"按钮可以快速复制内容<br>'
+        '• 点击"打开"按钮可以在浏览器中打开登录地址<br>'
+        '• 按住Ctrl点击登录地址也可以直接打开链接',
+    ]
+    # 不写文字颜色，随调色板变化；边框用两种主题下都看得清的灰色
+    TUTORIAL = ('<table width="100%" cellspacing="0" cellpadding="12" border="1" '
+                'style="border-color: #909399; border-style: solid;">'
+                '<tr><th align="left">功能说明</th></tr>'
+                + ''.join(f'<tr><td style="line-height: 150%;">{tip}</td></tr>' for tip in TUTORIAL_TIPS)
+                + '</table>')
+    FIELDS = [('username', '用户名'), ('password', '密码'), ('url', '登录地址'), ('notes', '备注')]
+    OPTIONAL = ('url', 'notes')  # 内容为空时隐藏整行
+    MONOSPACE = ('username', 'password')
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setObjectName("detailPanel")
+        self.values = {}  # 字段 -> 当前显示的内容，复制按钮从这里取值
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(20, 20, 20, 20)
+
+        self.tutorial_label = QLabel(self.TUTORIAL)
+        self.tutorial_label.setTextFormat(Qt.TextFormat.RichText)
+        self.tutorial_label.setWordWrap(True)
+        layout.addWidget(self.tutorial_label)
+
+        monospace = QFont("Consolas")
+        monospace.setStyleHint(QFont.StyleHint.Monospace)
+        self.fields = QWidget()
+        grid = QGridLayout(self.fields)
+        grid.setContentsMargins(0, 0, 0, 0)
+        grid.setHorizontalSpacing(20)
+        grid.setVerticalSpacing(16)
+        grid.setColumnStretch(1, 1)
+        self.rows = {}  # 字段 -> 这一行的控件，第二个是显示内容的标签
+        self.actions = {}  # 字段 -> 这一行按钮所在的布局
+        for row, (field, name) in enumerate(self.FIELDS):
+            name_label = QLabel(name)
+            name_label.setForegroundRole(QPalette.ColorRole.PlaceholderText)
+            if field == 'notes':
+                value_label = NotesView()
+            else:
+                value_label = UrlLabel() if field == 'url' else QLabel()
+                if field in self.MONOSPACE:
+                    value_label.setFont(monospace)
+                value_label.setTextFormat(Qt.TextFormat.PlainText)
+                value_label.setWordWrap(True)
+                value_label.setTextInteractionFlags(Qt.TextInteractionFlag.TextSelectableByMouse)
+            copy_btn = self.link_button("复制", self.COPY_COLOR)
+            copy_btn.clicked.connect(lambda checked=False, field=field: self.copy_requested.emit(self.values.get(field, '')))
+            actions = QHBoxLayout()
+            actions.setSpacing(8)
+            actions.addWidget(copy_btn)
+            actions.addStretch()
+            grid.addWidget(name_label, row, 0, Qt.AlignmentFlag.AlignTop)
+            grid.addWidget(value_label, row, 1)
+            grid.addLayout(actions, row, 2, Qt.AlignmentFlag.AlignTop)
+            self.rows[field] = [name_label, value_label, copy_btn]
+            self.actions[field] = actions
+
+        # 登录地址可以用打开按钮打开，按住 Ctrl 点击地址也能打开
+        self.open_btn = self.link_button("打开", self.OPEN_COLOR)
+        self.open_btn.clicked.connect(lambda: self.open_requested.emit(self.values.get('url', '')))
+        url_row = self.rows['url']
+        self.actions['url'].insertWidget(1, self.open_btn)
+        url_row.append(self.open_btn)
+        url_row[1].setToolTip("按住Ctrl点击打开")
+        url_row[1].ctrl_clicked.connect(self.open_url)
+        layout.addWidget(self.fields)
+
+        self.show_tutorial()
+
+    @staticmethod
+    def link_button(text, color):
+        """只显示彩色文字的扁平按钮"""
+        button = QPushButton(text)
+        button.setFlat(True)
+        button.setCursor(Qt.CursorShape.PointingHandCursor)
+        ThemeEngine.tint(button, button_text=color)
+        return button
+
+    def show_entry(self, entry):
+        """显示完整条目（含密码和备注），只更新各行的文字和可见性"""
+        for field, widgets in self.rows.items():
+            value = str(entry.get(field) or '')
+            self.values[field] = value
+            widgets[1].setText(value)
+            if field in self.OPTIONAL:
+                for widget in widgets:
+                    widget.setVisible(bool(value))
+        self.open_btn.setVisible(self.values['url'].startswith('http'))
+        self.tutorial_label.hide()
+        self.fields.show()
+
+    def show_tutorial(self):
+        # 不再保留上一个条目的明文
+        self.values.clear()
+        for widgets in self.rows.values():
+            widgets[1].clear()
+        self.fields.hide()
+        self.tutorial_label.show()
+
+    def open_url(self):
+        url = self.values.get('url', '')
+        if url.startswith('http'):
+            self.open_requested.emit(url)
+
 class PasswordDialog(QDialog):
+    @timed
     def __init__(self, parent=None, password_data=None):
         super().__init__(parent)
-        self.password_data = password_data
         self.is_password_visible = False  # 添加密码显示状态标志
         self.setup_ui()
         self.setup_style()
+        self.reset(password_data)
         
     def setup_style(self):
-        self.setStyleSheet("""
-            QDialog {
-                background-color: #ffffff;
-                font-family: "Microsoft YaHei", "微软雅黑";
-            }
-            QLabel {
-                font-size: 13px;
-                color: #2c3e50;
-            }
-            QLineEdit, QTextEdit {
-                padding: 8px 12px;
-                border: 2px solid #e0e0e0;
-                border-radius: 6px;
-                background-color: #f8f9fa;
-                font-size: 13px;
-                selection-background-color: #a8d8ff;
-            }
-            QLineEdit:focus, QTextEdit:focus {
-                border: 2px solid #7eb9ff;
-                background-color: #ffffff;
-            }
-            QPushButton {
-                padding: 8px 16px;
-                background-color: #7eb9ff;
-                color: white;
-                border: none;
-                border-radius: 6px;
-                font-size: 13px;
-                min-width: 90px;
-                font-weight: 500;
-            }
-            QPushButton:hover {
-                background-color: #5ca3ff;
-            }
-            QPushButton:pressed {
-                background-color: #4b8fe0;
-            }
-            QPushButton#showPasswordBtn {
-                background-color: #f0f0f0;
-                color: #2c3e50;
-            }
-            QPushButton#showPasswordBtn:hover {
-                background-color: #e0e0e0;
-            }
-            QPushButton#showPasswordBtn:checked {
-                background-color: #7eb9ff;
-                color: white;
-            }
-        """)
+        # 颜色继承应用程序的主题，只给按钮着色
+        ThemeEngine.decorate(self)
         
     def setup_ui(self):
         self.setWindowTitle("密码详情")
@@ -136,29 +2558,18 @@ class PasswordDialog(QDialog):
         url_label = QLabel("登录地址：")
         notes_label = QLabel("备注：")
         
-        for label in [title_label, username_label, password_label, url_label, notes_label]:
-            label.setStyleSheet("font-weight: 500;")
-        
         layout.addRow(title_label, self.title_edit)
         layout.addRow(username_label, self.username_edit)
         layout.addRow(password_label, password_layout)
         layout.addRow(url_label, self.url_edit)
         layout.addRow(notes_label, self.notes_edit)
         
-        if self.password_data:
-            self.title_edit.setText(self.password_data.get('title', ''))
-            self.username_edit.setText(self.password_data.get('username', ''))
-            self.password_edit.setText(self.password_data.get('password', ''))
-            self.url_edit.setText(self.password_data.get('url', ''))
-            self.notes_edit.setText(self.password_data.get('notes', ''))
-            self.password_edit.setEchoMode(QLineEdit.EchoMode.Password)
-            self.is_password_visible = False
-            self.show_password_btn.setChecked(False)
-        
         buttons = QHBoxLayout()
         buttons.setSpacing(12)
         save_btn = QPushButton("保存")
         cancel_btn = QPushButton("取消")
+        save_btn.setObjectName("saveBtn")
+        cancel_btn.setObjectName("cancelBtn")
         
         save_btn.clicked.connect(self.accept)
         cancel_btn.clicked.connect(self.reject)
@@ -170,6 +2581,23 @@ class PasswordDialog(QDialog):
         
         self.setLayout(layout)
 
+    @timed
+    def reset(self, password_data=None):
+        """换上要编辑的条目，对话框可以重复使用；不传条目时清空，用于新建密码，也避免关闭后在控件中留下明文"""
+        self.password_data = password_data
+        data = password_data or {}
+        self.title_edit.setText(data.get('title', ''))
+        self.username_edit.setText(data.get('username', ''))
+        self.password_edit.setText(data.get('password', ''))
+        self.url_edit.setText(data.get('url', ''))
+        self.notes_edit.setPlainText(data.get('notes', ''))
+        # 编辑已有条目时默认隐藏密码，新建时显示输入的内容
+        self.password_edit.setEchoMode(QLineEdit.EchoMode.Password if password_data else QLineEdit.EchoMode.Normal)
+        self.is_password_visible = False
+        self.show_password_btn.setChecked(False)
+        self.show_password_btn.setText("显示")
+        self.title_edit.setFocus()
+
     def toggle_password_visibility(self):
         """切换密码显示/隐藏状态"""
         self.is_password_visible = not self.is_password_visible
@@ -180,7 +2608,77 @@ class PasswordDialog(QDialog):
             self.password_edit.setEchoMode(QLineEdit.EchoMode.Password)
             self.show_password_btn.setText("显示")
 
+class QuickSearchDialog(QDialog):
+    """全局快速搜索：输入时模糊匹配标题、用户名和登录地址，回车或双击打开选中的条目"""
+    @timed
+    def __init__(self, parent):
+        super().__init__(parent)
+        self.manager = parent
+        self.matches = []
+        self.setup_ui()
+
+    def setup_ui(self):
+        self.setWindowTitle("快速搜索")
+        self.setMinimumSize(480, 360)
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(15, 15, 15, 15)
+
+        self.query_edit = QLineEdit()
+        self.query_edit.setPlaceholderText("输入标题、用户名或网址中的字符，空格分隔多个词...")
+        self.query_edit.textChanged.connect(self.refresh)
+        self.query_edit.returnPressed.connect(self.open_current)
+        layout.addWidget(self.query_edit)
+
+        self.result_list = QListWidget()
+        self.result_list.itemActivated.connect(self.open_current)
+        layout.addWidget(self.result_list)
+
+    @timed
+    def reset(self):
+        """重新打开时清空上一次的查询"""
+        self.query_edit.blockSignals(True)
+        self.query_edit.clear()
+        self.query_edit.blockSignals(False)
+        self.matches = []
+        self.result_list.clear()
+        self.query_edit.setFocus()
+
+    def refresh(self):
+        self.matches = self.manager.search_index.fuzzy.search(self.query_edit.text())
+        self.result_list.clear()
+        for entry in self.matches:
+            text = entry['title']
+            if entry.get('username'):
+                text = f"{text}  —  {entry['username']}"
+            self.result_list.addItem(text)
+        if self.matches:
+            self.result_list.setCurrentRow(0)
+
+    def keyPressEvent(self, event):
+        # 焦点在输入框时用上下键移动结果列表的选中项
+        if event.key() in (Qt.Key.Key_Up, Qt.Key.Key_Down) and self.matches:
+            step = -1 if event.key() == Qt.Key.Key_Up else 1
+            row = max(0, min(len(self.matches) - 1, self.result_list.currentRow() + step))
+            self.result_list.setCurrentRow(row)
+            return
+        super().keyPressEvent(event)
+
+    def open_current(self, *args):
+        row = self.result_list.currentRow()
+        if 0 <= row < len(self.matches):
+            self.manager.select_entry(self.matches[row])
+            self.accept()
+
 class SettingsDialog(QDialog):
+    # 左侧列表的页面名称和创建页面的方法
+    PAGES = [("主密码设置", 'build_password_page'), ("数据迁移", 'build_migration_page'),
+             ("快捷键设置", 'build_shortcuts_page'), ("诊断", 'build_diagnostics_page')]
+    SHORTCUTS_PAGE = 2
+    DIAGNOSTICS_PAGE = 3
+    DIAGNOSTICS_COLUMNS = [("名称", None), ("次数", 'count'), ("P50(ms)", 'p50_ms'), ("P95(ms)", 'p95_ms'),
+                           ("最大(ms)", 'max_ms')]
+
+    @timed
     def __init__(self, parent=None):
         super().__init__(parent)
         self.parent = parent  # 保存父窗口引用
@@ -188,155 +2686,10 @@ class SettingsDialog(QDialog):
         self.setWindowFlags(self.windowFlags() & ~Qt.WindowType.WindowContextHelpButtonHint)  # 移除帮助按钮
         self.setup_ui()
         self.setup_style()
-        self.load_shortcuts()  # 加载快捷键设置
         
     def setup_style(self):
-        self.setStyleSheet("""
-            QDialog {
-                background-color: #ffffff;
-                font-family: "Microsoft YaHei", "微软雅黑";
-            }
-            QWidget#leftPanel {
-                background-color: #f8f9fa;
-                border-right: 1px solid #e0e0e0;
-            }
-            QWidget#rightPanel {
-                background-color: #ffffff;
-            }
-            QListWidget {
-                border: none;
-                background-color: transparent;
-                outline: none;
-                font-size: 14px;
-            }
-            QListWidget::item {
-                padding: 12px 15px;
-                color: #2c3e50;
-                border-radius: 4px;
-                margin: 2px 8px;
-            }
-            QListWidget::item:selected {
-                background-color: #e3f2fd;
-                color: #1976d2;
-            }
-            QListWidget::item:hover {
-                background-color: #f5f5f5;
-            }
-            QLabel {
-                font-size: 14px;
-                color: #2c3e50;
-                font-weight: 500;
-            }
-            QPushButton {
-                padding: 10px 20px;
-                border: none;
-                border-radius: 8px;
-                font-size: 14px;
-                min-width: 100px;
-                font-weight: 500;
-            }
-            QPushButton:hover {
-                opacity: 0.9;
-            }
-            QPushButton:pressed {
-                opacity: 0.8;
-            }
-            QPushButton#saveBtn {
-                background-color: #2196f3;
-                color: white;
-            }
-            QPushButton#saveBtn:hover {
-                background-color: #1976d2;
-            }
-            QPushButton#cancelBtn {
-                background-color: #9E9E9E;
-                color: white;
-            }
-            QPushButton#cancelBtn:hover {
-                background-color: #757575;
-            }
-            QPushButton#changePasswordBtn {
-                background-color: #4CAF50;
-                color: white;
-            }
-            QPushButton#changePasswordBtn:hover {
-                background-color: #43A047;
-            }
-            QPushButton#exportBtn {
-                background-color: #FF9800;
-                color: white;
-            }
-            QPushButton#exportBtn:hover {
-                background-color: #F57C00;
-            }
-            QPushButton#importBtn {
-                background-color: #9C27B0;
-                color: white;
-            }
-            QPushButton#importBtn:hover {
-                background-color: #7B1FA2;
-            }
-            QPushButton#resetBtn {
-                background-color: #607D8B;
-                color: white;
-            }
-            QPushButton#resetBtn:hover {
-                background-color: #546E7A;
-            }
-            QPushButton#saveShortcutsBtn {
-                background-color: #4CAF50;
-                color: white;
-            }
-            QPushButton#saveShortcutsBtn:hover {
-                background-color: #43A047;
-            }
-            QLineEdit {
-                padding: 8px 12px;
-                border: 2px solid #e0e0e0;
-                border-radius: 6px;
-                background-color: #f8f9fa;
-                font-size: 13px;
-            }
-            QLineEdit:focus {
-                border: 2px solid #7eb9ff;
-                background-color: #ffffff;
-            }
-            QGroupBox {
-                font-size: 14px;
-                font-weight: 500;
-                color: #2c3e50;
-                border: 2px solid #e0e0e0;
-                border-radius: 8px;
-                margin-top: 20px;
-                padding-top: 15px;
-            }
-            QGroupBox::title {
-                subcontrol-origin: margin;
-                left: 10px;
-                padding: 0 5px;
-            }
-            QScrollBar:vertical {
-                border: none;
-                background: #f5f5f5;
-                width: 8px;
-                border-radius: 4px;
-                margin: 0px;
-            }
-            QScrollBar::handle:vertical {
-                background: #bdbdbd;
-                border-radius: 4px;
-                min-height: 20px;
-            }
-            QScrollBar::handle:vertical:hover {
-                background: #9e9e9e;
-            }
-            QScrollBar::add-line:vertical, QScrollBar::sub-line:vertical {
-                height: 0px;
-            }
-            QScrollBar::add-page:vertical, QScrollBar::sub-page:vertical {
-                background: none;
-            }
-        """)
+        # 颜色继承应用程序的主题，只给按钮着色
+        ThemeEngine.decorate(self)
         
     def setup_ui(self):
         self.setWindowTitle("设置")
@@ -349,13 +2702,15 @@ class SettingsDialog(QDialog):
         left_panel = QWidget()
         left_panel.setFixedWidth(200)
         left_panel.setObjectName("leftPanel")
+        left_panel.setAutoFillBackground(True)
+        left_panel.setBackgroundRole(QPalette.ColorRole.AlternateBase)
         left_layout = QVBoxLayout()
         left_layout.setSpacing(0)
         left_layout.setContentsMargins(0, 0, 0, 0)
         
         # 设置列表
         self.settings_list = QListWidget()
-        self.settings_list.addItems(["主密码设置", "数据迁移", "快捷键设置"])
+        self.settings_list.addItems([name for name, builder in self.PAGES])
         self.settings_list.currentRowChanged.connect(self.show_settings_page)
         left_layout.addWidget(self.settings_list)
         
@@ -370,10 +2725,40 @@ class SettingsDialog(QDialog):
         right_layout.setContentsMargins(30, 30, 30, 30)
         right_panel.setLayout(right_layout)
         
-        # 创建堆叠窗口
+        # 创建堆叠窗口，页面在第一次显示时才创建
         self.settings_stack = QStackedWidget()
+        self.pages = {}  # 页码 -> 已创建的页面
+        right_layout.addWidget(self.settings_stack)
+        layout.addWidget(right_panel)
         
-        # 主密码设置页面
+        # 底部按钮
+        self.bottom_button_layout = QHBoxLayout()
+        self.bottom_button_layout.setContentsMargins(30, 0, 30, 30)
+        
+        # 保存按钮
+        self.save_btn = QPushButton("保存")
+        self.save_btn.setObjectName("saveBtn")
+        self.save_btn.clicked.connect(self.accept)
+        self.bottom_button_layout.addWidget(self.save_btn)
+        
+        # 取消按钮
+        self.cancel_btn = QPushButton("取消")
+        self.cancel_btn.setObjectName("cancelBtn")
+        self.cancel_btn.clicked.connect(self.reject)
+        self.bottom_button_layout.addWidget(self.cancel_btn)
+        
+        layout.addLayout(self.bottom_button_layout)
+        self.setLayout(layout)
+        
+        # 初始化快捷键捕获状态
+        self.capturing_shortcut = False
+        self.current_shortcut_key = None
+        self.current_shortcut_edit = None
+        
+        # 默认选中第一项
+        self.settings_list.setCurrentRow(0)
+        
+    def build_password_page(self):
         password_page = QWidget()
         password_layout = QVBoxLayout()
         
@@ -413,7 +2798,7 @@ class SettingsDialog(QDialog):
             "• 包含数字\n" +
             "• 包含特殊字符（如：!@#$%^&*等）"
         )
-        password_requirements.setStyleSheet("color: #666; font-size: 12px;")
+        password_requirements.setForegroundRole(QPalette.ColorRole.PlaceholderText)
         password_layout.addWidget(password_requirements)
         
         # 修改密码按钮
@@ -424,8 +2809,9 @@ class SettingsDialog(QDialog):
         
         password_layout.addStretch()
         password_page.setLayout(password_layout)
-        
-        # 数据迁移页面
+        return password_page
+
+    def build_migration_page(self):
         migration_page = QWidget()
         migration_layout = QVBoxLayout()
         
@@ -443,8 +2829,9 @@ class SettingsDialog(QDialog):
         
         migration_layout.addStretch()
         migration_page.setLayout(migration_layout)
-        
-        # 快捷键设置页面
+        return migration_page
+
+    def build_shortcuts_page(self):
         shortcuts_page = QWidget()
         shortcuts_layout = QVBoxLayout()
         
@@ -521,45 +2908,104 @@ class SettingsDialog(QDialog):
         
         shortcuts_layout.addLayout(button_layout)
         shortcuts_page.setLayout(shortcuts_layout)
+        self.load_shortcuts()  # 加载快捷键设置
+        return shortcuts_page
+
+    def build_diagnostics_page(self):
+        diagnostics_page = QWidget()
+        diagnostics_layout = QVBoxLayout()
         
-        # 添加页面到堆叠窗口
-        self.settings_stack.addWidget(password_page)
-        self.settings_stack.addWidget(migration_page)
-        self.settings_stack.addWidget(shortcuts_page)
-        
-        right_layout.addWidget(self.settings_stack)
-        layout.addWidget(right_panel)
-        
-        # 底部按钮
-        self.bottom_button_layout = QHBoxLayout()
-        self.bottom_button_layout.setContentsMargins(30, 0, 30, 30)
+        # 说明：未开启时提示开启方法
+        if DIAGNOSTICS.enabled:
+            hint = (f"最近 {LatencyHistogram.WINDOW} 次的耗时。以\"事件\"开头的是按事件类型估计的处理耗时，"
+                    "\"事件循环 每轮处理\"是界面每次无法响应输入的时长。")
+        else:
+            hint = "诊断未开启：在 vault_config.json 中设置 \"diagnostics\": true 后重新启动程序，即可记录界面各处理的耗时。"
+        hint_label = QLabel(hint)
+        hint_label.setWordWrap(True)
+        hint_label.setForegroundRole(QPalette.ColorRole.PlaceholderText)
+        diagnostics_layout.addWidget(hint_label)
         
-        # 保存按钮
-        self.save_btn = QPushButton("保存")
-        self.save_btn.setObjectName("saveBtn")
-        self.save_btn.clicked.connect(self.accept)
-        self.bottom_button_layout.addWidget(self.save_btn)
+        # 耗时统计表
+        self.diagnostics_table = QTableWidget(0, len(self.DIAGNOSTICS_COLUMNS))
+        self.diagnostics_table.setHorizontalHeaderLabels([title for title, key in self.DIAGNOSTICS_COLUMNS])
+        self.diagnostics_table.verticalHeader().setVisible(False)
+        self.diagnostics_table.setEditTriggers(QTableWidget.EditTrigger.NoEditTriggers)
+        self.diagnostics_table.horizontalHeader().setSectionResizeMode(0, QHeaderView.ResizeMode.Stretch)
+        diagnostics_layout.addWidget(self.diagnostics_table)
         
-        # 取消按钮
-        self.cancel_btn = QPushButton("取消")
-        self.cancel_btn.setObjectName("cancelBtn")
-        self.cancel_btn.clicked.connect(self.reject)
-        self.bottom_button_layout.addWidget(self.cancel_btn)
+        # 按钮组
+        button_layout = QHBoxLayout()
         
-        layout.addLayout(self.bottom_button_layout)
-        self.setLayout(layout)
+        # 刷新按钮
+        refresh_btn = QPushButton("刷新")
+        refresh_btn.setObjectName("refreshBtn")
+        refresh_btn.clicked.connect(self.refresh_diagnostics)
+        button_layout.addWidget(refresh_btn)
         
-        # 默认选中第一项
-        self.settings_list.setCurrentRow(0)
+        # 导出按钮
+        dump_btn = QPushButton("导出JSON")
+        dump_btn.setObjectName("exportBtn")
+        dump_btn.clicked.connect(self.dump_diagnostics)
+        button_layout.addWidget(dump_btn)
         
-        # 初始化快捷键捕获状态
+        diagnostics_layout.addLayout(button_layout)
+        diagnostics_page.setLayout(diagnostics_layout)
+        return diagnostics_page
+
+    def refresh_diagnostics(self):
+        """用当前的耗时统计填充诊断页的表格"""
+        snapshot = DIAGNOSTICS.snapshot()
+        self.diagnostics_table.setRowCount(len(snapshot))
+        for row, (name, summary) in enumerate(snapshot.items()):
+            for column, (title, key) in enumerate(self.DIAGNOSTICS_COLUMNS):
+                item = QTableWidgetItem(name if key is None else str(summary[key]))
+                if key is not None:
+                    item.setTextAlignment(Qt.AlignmentFlag.AlignRight | Qt.AlignmentFlag.AlignVCenter)
+                self.diagnostics_table.setItem(row, column, item)
+
+    def dump_diagnostics(self):
+        """把耗时统计导出为 JSON 文件"""
+        try:
+            from PyQt6.QtWidgets import QFileDialog
+            file_path, _ = QFileDialog.getSaveFileName(
+                self,
+                "导出诊断数据",
+                "diagnostics.json",
+                "JSON Files (*.json)"
+            )
+            if file_path:
+                DIAGNOSTICS.dump(file_path)
+                self.parent.show_messagebox('info', "成功", "诊断数据导出成功！")
+        except Exception as e:
+            self.parent.show_messagebox('crit', "错误", f"导出诊断数据时发生错误：{str(e)}")
+
+    @timed
+    def reset(self):
+        """对话框重复使用：回到第一页，清空输入过的主密码，快捷键页已创建时重新读取设置"""
+        self.current_password_edit.clear()
+        self.new_password_edit.clear()
+        self.confirm_password_edit.clear()
+        if self.current_shortcut_edit is not None:
+            self.current_shortcut_edit.setPalette(QPalette())
         self.capturing_shortcut = False
         self.current_shortcut_key = None
         self.current_shortcut_edit = None
-        
+        if self.SHORTCUTS_PAGE in self.pages:
+            self.load_shortcuts()
+        self.settings_list.setCurrentRow(0)
+
     def show_settings_page(self, index):
-        """切换设置页面"""
-        self.settings_stack.setCurrentIndex(index)
+        """切换设置页面，页面第一次显示时才创建，大多数时候只用到其中一页"""
+        page = self.pages.get(index)
+        if page is None:
+            page = self.pages[index] = getattr(self, self.PAGES[index][1])()
+            ThemeEngine.decorate(page)
+            self.settings_stack.addWidget(page)
+        self.settings_stack.setCurrentWidget(page)
+        if index == self.DIAGNOSTICS_PAGE:
+            # 每次切换到诊断页时显示最新的统计
+            self.refresh_diagnostics()
         
         # 隐藏所有页面的底部按钮
         self.save_btn.setVisible(False)
@@ -571,15 +3017,7 @@ class SettingsDialog(QDialog):
         self.current_shortcut_key = shortcut_key
         self.current_shortcut_edit = edit
         edit.setText("请按下快捷键...")
-        edit.setStyleSheet("""
-            QLineEdit {
-                padding: 8px 12px;
-                border: 2px solid #2196f3;
-                border-radius: 6px;
-                background-color: #e3f2fd;
-                font-size: 13px;
-            }
-        """)
+        ThemeEngine.tint(edit, base='#e3f2fd', text='#1976d2')
         
     def keyPressEvent(self, event):
         """处理按键事件"""
@@ -606,7 +3044,8 @@ class SettingsDialog(QDialog):
             if key_text:
                 shortcut = "+".join(modifiers + [key_text])
                 self.current_shortcut_edit.setText(shortcut)
-                self.current_shortcut_edit.setStyleSheet("")
+                # 恢复为继承当前主题
+                self.current_shortcut_edit.setPalette(QPalette())
                 self.capturing_shortcut = False
                 self.current_shortcut_key = None
                 self.current_shortcut_edit = None
@@ -692,10 +3131,7 @@ class SettingsDialog(QDialog):
                 self.parent.show_messagebox('warn', "错误", "请输入当前主密码")
                 return
                 
-            key = PBKDF2(current_password.encode(), self.parent.salt, dkLen=32)
-            with open('master.key', 'rb') as f:
-                stored_key = f.read()
-            if key != stored_key:
+            if not self.parent.session_key.matches_password(current_password, self.parent.salt):
                 self.parent.show_messagebox('warn', "错误", "当前主密码不正确")
                 return
             
@@ -704,19 +3140,29 @@ class SettingsDialog(QDialog):
             file_path, _ = QFileDialog.getSaveFileName(
                 self,
                 "导出数据",
-                "password_manager_backup.json",
-                "JSON Files (*.json)"
+                "password_manager_backup.pmv",
+                "密码库备份 (*.pmv);;JSON Files (*.json)"
             )
             
-            if file_path:
-                # 导出数据
-                with open(self.parent.data_file, 'r', encoding='utf-8') as f:
-                    encrypted_data = f.read()
+            if file_path and not file_path.lower().endswith('.json'):
+                # 默认使用分块流式加密导出，大密码库也只占用一个块的内存
+                temp_file = file_path + '.tmp'
+                with open(temp_file, 'wb') as f:
+                    entries = (self.parent.full_entry(p, cache=False) for p in self.parent.passwords)
+                    StreamVault.write(f, self.parent.session_key, self.parent.salt, entries)
+                os.replace(temp_file, file_path)
+                self.parent.show_messagebox('info', "成功", "数据导出成功！")
+            elif file_path:
+                # JSON 格式：2.0 数据文件只有记录表，导出时生成自包含的 1.0 格式密文
+                encrypted_data = self.parent.encrypt_data(self.parent.full_entries(self.parent.passwords))
+                if not encrypted_data:
+                    return
                 
                 # 保存加密数据和盐值
                 export_data = {
-                    'encrypted_data': encrypted_data,
-                    'salt': base64.b64encode(self.parent.salt).decode('utf-8')
+                    'encrypted_data': json.loads(encrypted_data),
+                    'salt': base64.b64encode(self.parent.salt).decode('utf-8'),
+                    'kdf': self.parent.session_key.kdf_params
                 }
                 
                 with open(file_path, 'w', encoding='utf-8') as f:
@@ -736,20 +3182,26 @@ class SettingsDialog(QDialog):
                 self,
                 "导入数据",
                 "",
-                "JSON Files (*.json)"
+                "密码库备份 (*.pmv *.json)"
             )
             
             if not file_path:
                 return
                 
-            # 读取导入数据
-            with open(file_path, 'r', encoding='utf-8') as f:
-                import_data = json.load(f)
+            with open(file_path, 'rb') as f:
+                is_stream = f.read(len(VAULT_MAGIC)) == VAULT_MAGIC
             
-            # 验证数据格式
-            if not isinstance(import_data, dict) or 'encrypted_data' not in import_data or 'salt' not in import_data:
-                self.parent.show_messagebox('warn', "错误", "无效的数据文件格式")
-                return
+            if is_stream:
+                import_data = None
+            else:
+                # 读取导入数据
+                with open(file_path, 'r', encoding='utf-8') as f:
+                    import_data = json.load(f)
+                
+                # 验证数据格式
+                if not isinstance(import_data, dict) or 'encrypted_data' not in import_data or 'salt' not in import_data:
+                    self.parent.show_messagebox('warn', "错误", "无效的数据文件格式")
+                    return
             
             # 验证当前密码
             current_password = self.current_password_edit.text()
@@ -759,11 +3211,22 @@ class SettingsDialog(QDialog):
             
             # 尝试解密数据
             try:
-                salt = base64.b64decode(import_data['salt'])
-                key = PBKDF2(current_password.encode(), salt, dkLen=32)
-                cipher = AES.new(key, AES.MODE_CBC, base64.b64decode(import_data['encrypted_data']['iv']))
-                pt = unpad(cipher.decrypt(base64.b64decode(import_data['encrypted_data']['ciphertext'])), AES.block_size)
-                json.loads(pt.decode('utf-8'))  # 验证JSON格式
+                if is_stream:
+                    # 流式备份逐块解密校验
+                    with open(file_path, 'rb') as f:
+                        kdf_params, salt, header = StreamVault.read_header(f)
+                        session_key = SessionKey.derive(current_password, salt, kdf_params)
+                        entries = list(StreamVault.iter_entries(f, session_key.key, header))
+                else:
+                    salt = base64.b64decode(import_data['salt'])
+                    encrypted_data = import_data['encrypted_data']
+                    if isinstance(encrypted_data, str):
+                        encrypted_data = json.loads(encrypted_data)
+                    kdf_params = import_data.get('kdf', LEGACY_KDF_PARAMS)
+                    session_key = SessionKey.derive(current_password, salt, kdf_params)
+                    cipher = AES.new(session_key.key, AES.MODE_CBC, base64.b64decode(encrypted_data['iv']))
+                    pt = unpad(cipher.decrypt(base64.b64decode(encrypted_data['ciphertext'])), AES.block_size)
+                    entries = json.loads(pt.decode('utf-8'))  # 验证JSON格式
             except Exception as e:
                 self.parent.show_messagebox('warn', "错误", "密码不正确或数据已损坏")
                 return
@@ -775,21 +3238,14 @@ class SettingsDialog(QDialog):
             )
             
             if reply == QMessageBox.StandardButton.Yes:
-                # 更新盐值
-                self.parent.salt = salt
-                with open('salt.bin', 'wb') as f:
-                    f.write(salt)
-                
-                # 更新主密码
-                self.parent.master_password = current_password
-                self.parent.save_master_key()
-                
-                # 保存加密数据
-                with open(self.parent.data_file, 'w', encoding='utf-8') as f:
-                    f.write(json.dumps(import_data['encrypted_data']))
+                # 用导入的密钥全量写入当前存储后端，写入成功后才替换盐值、主密码文件和会话密钥
+                self.parent.ensure_entry_ids(entries)
+                self.parent.rekey(session_key, entries, salt)
                 
                 # 重新加载数据
                 self.parent.load_data()
+                if not self.parent.vault_loaded:
+                    return
                 
                 self.parent.show_messagebox('info', "成功", "数据导入成功！")
                 
@@ -830,16 +3286,16 @@ class SettingsDialog(QDialog):
             
         try:
             # 验证当前密码
-            key = PBKDF2(current_password.encode(), self.parent.salt, dkLen=32)
-            with open('master.key', 'rb') as f:
-                stored_key = f.read()
-            if key != stored_key:
+            if not self.parent.session_key.matches_password(current_password, self.parent.salt):
                 self.parent.show_messagebox('warn', "错误", "当前主密码不正确")
                 return
                 
-            # 更新主密码
-            self.parent.master_password = new_password
-            self.parent.save_master_key()
+            # 更新主密码：数据用新密钥重新加密并写入后，旧会话密钥才失效
+            # 按需解密的密码和备注在旧密钥失效前全部解密，内存中的条目不变
+            entries = self.parent.full_entries(self.parent.passwords)
+            self.parent.rekey(SessionKey.derive(new_password, self.parent.salt, self.parent.calibrated_kdf_params()),
+                              entries)
+            del entries
             
             # 清空输入框
             self.current_password_edit.clear()
@@ -852,14 +3308,17 @@ class SettingsDialog(QDialog):
             self.parent.show_messagebox('crit', "错误", f"修改主密码时发生错误：{str(e)}")
 
 class ShareDialog(QDialog):
+    SHARE_COLOR = '#2196F3'
+    STOP_COLOR = '#F44336'  # 分享进行中，按钮变为停止分享
+
+    @timed
     def __init__(self, parent=None, password_data=None):
         super().__init__(parent)
-        self.password_data = password_data
         self.server = None
         self.server_thread = None
-        self.share_path = self.generate_random_path()  # 生成随机路径
         self.is_sharing = False  # 添加分享状态标志
         self.setup_ui()
+        self.reset(password_data)
         
     def generate_random_path(self):
         """生成随机路径"""
@@ -877,25 +3336,14 @@ class ShareDialog(QDialog):
         layout.setContentsMargins(25, 25, 25, 25)
         
         # 显示要分享的密码标题
-        title_label = QLabel(f"正在分享: {self.password_data['title']}")
-        title_label.setStyleSheet("font-size: 14px; font-weight: bold; margin-bottom: 10px;")
-        layout.addWidget(title_label)
+        self.title_label = QLabel()
+        title_font = self.title_label.font()
+        title_font.setBold(True)
+        self.title_label.setFont(title_font)
+        layout.addWidget(self.title_label)
         
         # 网络地址信息
         network_group = QGroupBox("访问地址")
-        network_group.setStyleSheet("""
-            QGroupBox {
-                border: 2px solid #e0e0e0;
-                border-radius: 6px;
-                margin-top: 10px;
-                padding-top: 15px;
-            }
-            QGroupBox::title {
-                subcontrol-origin: margin;
-                left: 10px;
-                padding: 0 5px;
-            }
-        """)
         network_layout = QVBoxLayout()
         
         # 局域网地址
@@ -903,7 +3351,6 @@ class ShareDialog(QDialog):
         lan_label = QLabel("局域网地址:")
         self.lan_edit = QLineEdit()
         self.lan_edit.setReadOnly(True)
-        self.lan_edit.setText(self.get_local_ip())
         lan_copy_btn = QPushButton("复制")
         lan_copy_btn.setObjectName("copyBtn")
         lan_copy_btn.clicked.connect(lambda: self.copy_address("lan"))
@@ -927,7 +3374,6 @@ class ShareDialog(QDialog):
         path_label = QLabel("访问路径:")
         self.path_edit = QLineEdit()
         self.path_edit.setReadOnly(True)
-        self.path_edit.setText(self.share_path)
         path_copy_btn = QPushButton("复制")
         path_copy_btn.setObjectName("copyBtn")
         path_copy_btn.clicked.connect(lambda: self.copy_address("path"))
@@ -976,89 +3422,29 @@ class ShareDialog(QDialog):
         
         self.setLayout(layout)
         
-        # 设置样式
-        self.setStyleSheet("""
-            QDialog {
-                background-color: #ffffff;
-                font-family: "Microsoft YaHei", "微软雅黑";
-            }
-            QLabel {
-                font-size: 14px;
-                color: #2c3e50;
-            }
-            QLineEdit {
-                padding: 8px 12px;
-                border: 2px solid #e0e0e0;
-                border-radius: 6px;
-                background-color: #f8f9fa;
-                font-size: 13px;
-            }
-            QLineEdit:focus {
-                border: 2px solid #7eb9ff;
-                background-color: #ffffff;
-            }
-            QPushButton {
-                padding: 8px 16px;
-                border: none;
-                border-radius: 6px;
-                font-size: 13px;
-                min-width: 90px;
-                font-weight: 500;
-            }
-            QPushButton:hover {
-                opacity: 0.9;
-            }
-            QPushButton:pressed {
-                opacity: 0.8;
-            }
-            QPushButton#copyBtn {
-                background-color: #4CAF50;
-                color: white;
-            }
-            QPushButton#copyBtn:hover {
-                background-color: #43A047;
-            }
-            QPushButton#shareBtn {
-                background-color: #2196F3;
-                color: white;
-            }
-            QPushButton#shareBtn:hover {
-                background-color: #1E88E5;
-            }
-            QPushButton#shareBtn:checked {
-                background-color: #F44336;
-            }
-            QPushButton#shareBtn:checked:hover {
-                background-color: #E53935;
-            }
-            QPushButton#cancelBtn {
-                background-color: #9E9E9E;
-                color: white;
-            }
-            QPushButton#cancelBtn:hover {
-                background-color: #757575;
-            }
-            QGroupBox {
-                font-size: 13px;
-                font-weight: 500;
-                color: #2c3e50;
-            }
-            QLabel#statusLabel {
-                color: #4CAF50;
-                font-size: 13px;
-            }
-            QLabel#errorLabel {
-                color: #f44336;
-                font-size: 13px;
-            }
-            QLabel#qrLabel {
-                background-color: white;
-                border: 1px solid #e0e0e0;
-                border-radius: 6px;
-                padding: 10px;
-            }
-        """)
+        # 颜色继承应用程序的主题；分享按钮在这里是蓝色，状态和错误提示用绿色和红色文字
+        ThemeEngine.decorate(self, {'shareBtn': self.SHARE_COLOR})
+        ThemeEngine.tint(self.status_label, window_text='#4CAF50')
+        ThemeEngine.tint(self.error_label, window_text='#f44336')
+        # 二维码在深色主题下也保持白底
+        self.qr_label.setAutoFillBackground(True)
+        ThemeEngine.tint(self.qr_label, window='#ffffff')
     
+    @timed
+    def reset(self, password_data=None):
+        """换上要分享的条目，对话框可以重复使用：停止上一次的分享，每次打开使用新的随机路径"""
+        if self.is_sharing:
+            self.stop_sharing()
+        self.password_data = password_data
+        self.share_path = self.generate_random_path()  # 生成随机路径
+        self.title_label.setText(f"正在分享: {password_data['title']}" if password_data else "")
+        self.lan_edit.setText(self.get_local_ip())
+        self.path_edit.setText(self.share_path)
+        self.qr_label.clear()
+        self.qr_label.hide()
+        self.status_label.hide()
+        self.error_label.hide()
+
     def toggle_sharing(self):
         """切换分享状态"""
         if not self.is_sharing:
@@ -1101,7 +3487,7 @@ class ShareDialog(QDialog):
             # 更新按钮状态
             self.is_sharing = True
             self.share_btn.setText("停止分享")
-            self.share_btn.setChecked(True)
+            ThemeEngine.accent(self.share_btn, self.STOP_COLOR)
             
         except Exception as e:
             self.error_label.setText(f"启动分享失败: {str(e)}")
@@ -1127,7 +3513,7 @@ class ShareDialog(QDialog):
             # 更新按钮状态
             self.is_sharing = False
             self.share_btn.setText("开始分享")
-            self.share_btn.setChecked(False)
+            ThemeEngine.accent(self.share_btn, self.SHARE_COLOR)
             
         except Exception as e:
             self.error_label.setText(f"停止分享失败: {str(e)}")
@@ -1415,28 +3801,70 @@ class ShareRequestHandler(SimpleHTTPRequestHandler):
             self.send_error(500, str(e))
 
 class PasswordManager(QMainWindow):
+    SEARCH_DEBOUNCE_MS = 150
+    SEARCH_DONE = "搜索 发起到结果全部显示"  # 诊断中的记录名称
+
     def __init__(self):
         super().__init__()
-        self.passwords = []
-        self.groups = ["默认分组"]  # 默认分组
+        self.entries_by_id = {}  # 条目ID -> 条目，按加入顺序排列，是全部条目的唯一来源
         self.current_group = "默认分组"
         self.data_file = 'passwords.json'
-        self.master_password = None
+        self.vault_config = load_vault_config()
+        if self.vault_config['diagnostics']:
+            DIAGNOSTICS.enable(QApplication.instance())
+        self.record_vault = RecordVault(self.data_file, lazy=self.vault_config['lazy_secrets'])
+        self.journal = VaultJournal(self.data_file)
+        self.search_index = SearchIndex()
+        self.index_sidecar = IndexSidecar(self.data_file)  # 搜索索引缓存，解锁时不必重建索引
+        self.index_digest = None  # 磁盘上的索引缓存对应的密码库摘要
+        self.index_cached = False  # 本次加载可以使用索引缓存，分批送回的条目不再逐条加入索引
+        self.loaded_index = None  # 读取线程从缓存恢复的索引
+        self.index_ready = False  # 索引已包含全部条目，可以写入缓存
+        self.search_worker = SearchWorker(self.search_index)  # 搜索在后台线程执行，结果分批加入列表
+        self.search_worker.batch.connect(self.on_search_batch)
+        self.search_worker.finished.connect(self.on_search_finished)
+        self.pending_search = None  # 还没有收到第一批结果的查询编号
+        self.search_started = None  # 最近一次搜索的开始时间，结果全部显示后清除
+        self.secret_cache = SecretCache(self.vault_config['secret_cache_size'], self.vault_config['secret_cache_ttl'])
+        self.secret_cache_timer = QTimer(self)  # 定期丢弃过期的已解密字段
+        self.secret_cache_timer.timeout.connect(self.secret_cache.purge)
+        self.secret_cache_timer.start(30 * 1000)
+        self.storage_lock = threading.Lock()  # 快照写入与后台合并互斥
+        self.compaction_thread = None
+        self.saver = VaultSaver(self.write_passwords)  # 保存在后台线程执行，不阻塞界面
+        self.saver.saved.connect(self.on_passwords_saved)
+        self.saver.failed.connect(self.on_save_failed)
+        self.unlock_pipeline = UnlockPipeline(self.read_vault)
+        self.unlock_pipeline.rejected.connect(self.on_unlock_rejected)
+        self.unlock_pipeline.unlocked.connect(self.on_unlocked)
+        self.unlock_pipeline.batch.connect(self.on_entries_batch)
+        self.unlock_pipeline.loaded.connect(self.finish_loading)
+        self.unlock_pipeline.failed.connect(self.on_unlock_failed)
+        self.unlock_pipeline.load_failed.connect(self.on_load_failed)
+        self.sqlite_path = os.path.splitext(self.data_file)[0] + '.db'
+        self.sqlite_vault = None
+        if self.vault_config['backend'] == 'sqlite':
+            self.sqlite_vault = SqliteVault(self.sqlite_path)
+        self.loaded_version = None  # 最近一次成功解密的数据版本
+        self.session_key = None  # 解锁后派生的会话密钥，不保存明文主密码
+        self.vault_loaded = False  # 条目已全部读入，之前不能修改或保存
         self.salt = None
         self.is_dark_mode = False  # 添加主题状态
+        self.theme = ThemeEngine(QApplication.instance())
+        self.dialog_pool = {}  # 对话框类 -> 重复使用的实例
         
         # 初始化全局快捷键
         self.global_shortcuts = {}
         self.setup_global_shortcuts()
         
-        # 先初始化加密，再设置UI
-        self.initialize_encryption()
+        # 先绘制界面，再在事件循环中解锁；密钥派生和解密在后台线程进行
         self.setup_ui()
         self.setup_style()
-        self.load_data()
         # 确保在启动时显示教程
         self.password_list.clearSelection()
         self.show_password_details(None, None)
+        self.set_loading("正在解锁…")
+        QTimer.singleShot(0, self.initialize_encryption)
         
     def setup_global_shortcuts(self):
         """设置全局快捷键"""
@@ -1472,24 +3900,75 @@ class PasswordManager(QMainWindow):
             self.global_shortcuts['global_hide'].activated.connect(self.hide_application)
             self.global_shortcuts['app_search'].activated.connect(self.focus_search)
             self.global_shortcuts['app_add'].activated.connect(self.new_password)
+            self.set_shortcuts_enabled(self.vault_loaded)
             
         except Exception as e:
             self.show_messagebox('warn', "错误", f"设置全局快捷键失败：{str(e)}")
             
+    def set_shortcuts_enabled(self, enabled):
+        """解锁和加载期间停用快捷键；锁定快捷键保持可用，随时可以放弃解锁"""
+        for key, shortcut in self.global_shortcuts.items():
+            if key != 'global_lock':
+                shortcut.setEnabled(enabled)
+
     def show_global_search(self):
         """显示全局搜索窗口"""
+        if not self.ensure_unlocked():
+            return
         if not self.isVisible():
             self.show()
         self.activateWindow()
-        self.search_input.setFocus()
+        dialog = self.pooled_dialog(QuickSearchDialog)
+        dialog.reset()
+        dialog.exec()
+
+    def select_entry(self, entry):
+        """清空搜索条件，切换到条目所在的分组并选中它"""
+        self.search_input.blockSignals(True)
+        self.search_input.clear()
+        self.search_input.blockSignals(False)
+        self.current_group = entry.get('group', '默认分组')
+        self.refresh_groups()
+        self.update_list()
+        row = self.list_model.row_of(entry['id'])
+        if row is None:
+            # 条目已被删除或不在列表中
+            self.password_list.clearSelection()
+            self.password_list.setCurrentIndex(QModelIndex())
+        else:
+            self.password_list.setCurrentIndex(self.list_model.index(row))
         
     def lock_application(self):
         """锁定应用程序"""
         self.hide()
-        # 这里可以添加锁定逻辑，比如要求重新输入主密码
+        # 清除会话密钥和内存中的明文数据，再次显示时需要重新输入主密码
+        self.unlock_pipeline.cancel()
+        self.vault_loaded = False
+        if self.flush_saves():
+            self.save_search_index()
+        self.wait_for_compaction()
+        self.index_ready = False
+        self.replace_session_key(None)
+        self.secret_cache.clear()
+        self.search_worker.cancel()
+        self.search_index.clear()
+        self.entries_by_id = {}
+        self.list_model.set_entries([])
+        self.refresh_groups()
+        self.show_password_details(None, None)
+        self.reset_dialogs()
+        
+    def ensure_unlocked(self):
+        """返回密码库是否已解锁并加载完成；锁定状态下要求重新验证主密码，解锁和加载在后台进行"""
+        if self.vault_loaded:
+            return True
+        if self.session_key is None and not self.unlock_pipeline.running():
+            self.verify_master_password()
+        return False
         
     def show_application(self):
-        """显示应用程序"""
+        """显示应用程序，未解锁时窗口显示加载状态"""
+        self.ensure_unlocked()
         self.show()
         self.activateWindow()
         
@@ -1497,6 +3976,12 @@ class PasswordManager(QMainWindow):
         """隐藏应用程序"""
         self.hide()
         
+    def closeEvent(self, event):
+        # 关闭窗口前写完排队的保存
+        if self.flush_saves():
+            self.save_search_index()
+        super().closeEvent(event)
+        
     def focus_search(self):
         """聚焦到搜索框"""
         self.search_input.setFocus()
@@ -1516,171 +4001,9 @@ class PasswordManager(QMainWindow):
             self.show_messagebox('warn', "错误", f"更新快捷键设置失败：{str(e)}")
             
     def setup_style(self):
-        # 定义亮色主题样式
-        self.setStyleSheet("""
-            QMainWindow, QWidget {
-                background-color: #ffffff;
-                color: #2c3e50;
-                font-family: "Microsoft YaHei", "微软雅黑";
-            }
-            QWidget#leftPanel {
-                background-color: #f8f9fa;
-                border-right: 1px solid #e9ecef;
-            }
-            QWidget#rightPanel {
-                background-color: #ffffff;
-            }
-            QPushButton#newBtn {
-                background-color: #4CAF50;
-                color: white;
-                padding: 12px 24px;
-                border: none;
-                border-radius: 8px;
-                font-size: 14px;
-                min-width: 120px;
-                font-weight: 500;
-                margin: 15px;
-                box-shadow: 0 2px 4px rgba(0,0,0,0.1);
-            }
-            QPushButton#newBtn:hover {
-                background-color: #43A047;
-                box-shadow: 0 4px 8px rgba(0,0,0,0.15);
-            }
-            QLineEdit {
-                padding: 12px 16px;
-                border: 2px solid #e0e0e0;
-                border-radius: 8px;
-                background-color: #ffffff;
-                font-size: 14px;
-                min-height: 20px;
-                margin: 15px;
-                box-shadow: 0 1px 3px rgba(0,0,0,0.05);
-            }
-            QLineEdit:focus {
-                border: 2px solid #4CAF50;
-                background-color: #ffffff;
-                box-shadow: 0 2px 6px rgba(0,0,0,0.1);
-            }
-            QPushButton {
-                padding: 10px 20px;
-                border: none;
-                border-radius: 8px;
-                font-size: 14px;
-                min-width: 100px;
-                font-weight: 500;
-                transition: all 0.3s;
-            }
-            QPushButton:hover {
-                opacity: 0.9;
-                transform: translateY(-1px);
-            }
-            QPushButton:pressed {
-                opacity: 0.8;
-                transform: translateY(1px);
-            }
-            QPushButton#editBtn {
-                background-color: #2196F3;
-                color: white;
-                box-shadow: 0 2px 4px rgba(33,150,243,0.2);
-            }
-            QPushButton#editBtn:hover {
-                background-color: #1E88E5;
-                box-shadow: 0 4px 8px rgba(33,150,243,0.3);
-            }
-            QPushButton#deleteBtn {
-                background-color: #F44336;
-                color: white;
-                box-shadow: 0 2px 4px rgba(244,67,54,0.2);
-            }
-            QPushButton#deleteBtn:hover {
-                background-color: #E53935;
-                box-shadow: 0 4px 8px rgba(244,67,54,0.3);
-            }
-            QPushButton#settingsBtn {
-                background-color: #607D8B;
-                color: white;
-                box-shadow: 0 2px 4px rgba(96,125,139,0.2);
-            }
-            QPushButton#settingsBtn:hover {
-                background-color: #546E7A;
-                box-shadow: 0 4px 8px rgba(96,125,139,0.3);
-            }
-            QPushButton#shareBtn {
-                background-color: #4CAF50;
-                color: white;
-                box-shadow: 0 2px 4px rgba(76,175,80,0.2);
-            }
-            QPushButton#shareBtn:hover {
-                background-color: #43A047;
-                box-shadow: 0 4px 8px rgba(76,175,80,0.3);
-            }
-            QListWidget {
-                border: none;
-                background-color: transparent;
-                outline: none;
-                font-size: 14px;
-                padding: 5px;
-            }
-            QListWidget::item {
-                padding: 12px 15px;
-                margin: 2px 5px;
-                border-radius: 6px;
-                color: #2c3e50;
-            }
-            QListWidget::item:selected {
-                background-color: #E3F2FD;
-                color: #1976D2;
-            }
-            QListWidget::item:hover {
-                background-color: #F5F5F5;
-            }
-            QLabel {
-                color: #2c3e50;
-                font-size: 14px;
-            }
-            QTextEdit {
-                border: 2px solid #e0e0e0;
-                border-radius: 8px;
-                background-color: #ffffff;
-                padding: 12px;
-                font-size: 14px;
-                selection-background-color: #a8d8ff;
-                box-shadow: 0 1px 3px rgba(0,0,0,0.05);
-            }
-            QTextEdit:focus {
-                border: 2px solid #4CAF50;
-                background-color: #ffffff;
-                box-shadow: 0 2px 6px rgba(0,0,0,0.1);
-            }
-            QScrollBar:vertical {
-                border: none;
-                background: #f5f5f5;
-                width: 8px;
-                border-radius: 4px;
-                margin: 0px;
-            }
-            QScrollBar::handle:vertical {
-                background: #bdbdbd;
-                border-radius: 4px;
-                min-height: 20px;
-            }
-            QScrollBar::handle:vertical:hover {
-                background: #9e9e9e;
-            }
-            QScrollBar::add-line:vertical, QScrollBar::sub-line:vertical {
-                height: 0px;
-            }
-            QScrollBar::add-page:vertical, QScrollBar::sub-page:vertical {
-                background: none;
-            }
-            QLabel#detailLabel {
-                background-color: #ffffff;
-                border-radius: 8px;
-                padding: 20px;
-                font-size: 14px;
-                box-shadow: 0 2px 8px rgba(0,0,0,0.05);
-            }
-        """)
+        # 两套主题在 ThemeEngine 中已经生成好，这里只选用当前主题并给按钮着色
+        self.theme.apply(self.is_dark_mode)
+        ThemeEngine.decorate(self)
 
     def setup_ui(self):
         self.setWindowTitle("密码管理器")
@@ -1700,41 +4023,49 @@ class PasswordManager(QMainWindow):
         left_panel = QWidget()
         left_panel.setFixedWidth(300)
         left_panel.setObjectName("leftPanel")  # 添加对象名以便设置样式
+        left_panel.setAutoFillBackground(True)
+        left_panel.setBackgroundRole(QPalette.ColorRole.AlternateBase)
         left_layout = QVBoxLayout()
-        left_layout.setSpacing(0)
-        left_layout.setContentsMargins(0, 0, 0, 0)
+        left_layout.setSpacing(10)
+        left_layout.setContentsMargins(15, 15, 15, 15)
         left_panel.setLayout(left_layout)
         
         # 搜索框
         self.search_input = QLineEdit()
         self.search_input.setPlaceholderText("搜索密码...")
-        self.search_input.textChanged.connect(self.search_passwords)
-        self.search_input.setStyleSheet("""
-            QLineEdit {
-                margin: 15px;
-                border-radius: 6px;
-            }
-        """)
+        self.search_input.setToolTip("多个词之间用空格分隔，都要匹配\n"
+                                     "title: user: url: host: group: notes: 只在对应字段中查找\n"
+                                     "\"双引号\" 括起短语，-词 排除，group: 可以搜索其他分组")
+        # 输入停顿一段时间后才搜索，连续输入只搜索一次
+        self.search_timer = QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.setInterval(self.SEARCH_DEBOUNCE_MS)
+        self.search_timer.timeout.connect(self.search_passwords)
+        self.search_input.textChanged.connect(lambda: self.search_timer.start())
+        
+        # 分组选择，显示每个分组的条目数
+        self.group_combo = QComboBox()
+        self.group_combo.currentIndexChanged.connect(self.group_changed)
         
-        # 密码列表
-        self.password_list = QListWidget()
+        # 密码列表：视图只为可见的行取数据，行高一致时不需要逐行计算大小
+        self.list_model = EntryListModel(self)
+        self.password_list = QListView()
+        self.password_list.setModel(self.list_model)
+        self.password_list.setUniformItemSizes(True)
+        self.password_list.setEditTriggers(QListView.EditTrigger.NoEditTriggers)
         self.password_list.setAlternatingRowColors(True)
-        self.password_list.currentItemChanged.connect(self.show_password_details)
+        self.password_list.selectionModel().currentChanged.connect(self.show_password_details)
         
         # 新建密码按钮
-        new_btn = QPushButton("新建密码")
-        new_btn.clicked.connect(self.new_password)
-        new_btn.setObjectName("newBtn")  # 添加对象名以便设置样式
-        new_btn.setStyleSheet("""
-            QPushButton {
-                margin: 15px;
-            }
-        """)
+        self.new_btn = QPushButton("新建密码")
+        self.new_btn.clicked.connect(self.new_password)
+        self.new_btn.setObjectName("newBtn")  # 添加对象名以便设置样式
         
         # 添加到左侧布局
         left_layout.addWidget(self.search_input)
+        left_layout.addWidget(self.group_combo)
         left_layout.addWidget(self.password_list)
-        left_layout.addWidget(new_btn)
+        left_layout.addWidget(self.new_btn)
         
         # 右侧面板
         right_panel = QWidget()
@@ -1745,18 +4076,9 @@ class PasswordManager(QMainWindow):
         right_panel.setLayout(right_layout)
         
         # 详情内容
-        self.details_label = QLabel()
-        self.details_label.setObjectName("detailLabel")
-        self.details_label.setAlignment(Qt.AlignmentFlag.AlignLeft | Qt.AlignmentFlag.AlignTop)
-        self.details_label.setWordWrap(True)
-        self.details_label.setTextFormat(Qt.TextFormat.RichText)
-        self.details_label.setTextInteractionFlags(
-            Qt.TextInteractionFlag.TextSelectableByMouse | 
-            Qt.TextInteractionFlag.LinksAccessibleByMouse |
-            Qt.TextInteractionFlag.LinksAccessibleByKeyboard
-        )
-        self.details_label.linkActivated.connect(self.handle_link_click)
-        self.details_label.mousePressEvent = self.handle_mouse_press
+        self.details_panel = DetailPanel()
+        self.details_panel.copy_requested.connect(self.copy_to_clipboard)
+        self.details_panel.open_requested.connect(self.open_url)
         
         # 操作按钮
         button_layout = QHBoxLayout()
@@ -1766,6 +4088,8 @@ class PasswordManager(QMainWindow):
         self.delete_btn = QPushButton("删除")
         self.settings_btn = QPushButton("设置")
         self.share_btn = QPushButton("分享")  # 新增分享按钮
+        self.theme_btn = QPushButton("🌙")
+        self.theme_btn.setToolTip("切换浅色/深色主题")
         
         # 设置按钮对象名
         self.edit_btn.setObjectName("editBtn")
@@ -1777,7 +4101,9 @@ class PasswordManager(QMainWindow):
         self.delete_btn.clicked.connect(self.delete_password)
         self.settings_btn.clicked.connect(self.show_settings)
         self.share_btn.clicked.connect(self.share_password)  # 连接分享功能
+        self.theme_btn.clicked.connect(self.toggle_theme)
         
+        button_layout.addWidget(self.theme_btn)
         button_layout.addStretch()
         button_layout.addWidget(self.edit_btn)
         button_layout.addWidget(self.delete_btn)
@@ -1785,16 +4111,20 @@ class PasswordManager(QMainWindow):
         button_layout.addWidget(self.settings_btn)
         
         # 添加到右侧布局
-        right_layout.addWidget(self.details_label)
+        right_layout.addWidget(self.details_panel)
         right_layout.addStretch()
         right_layout.addLayout(button_layout)
         
         # 添加到主布局
         layout.addWidget(left_panel)
         layout.addWidget(right_panel)
+        
+        # 状态栏显示后台保存状态
+        self.save_status_label = QLabel()
+        self.statusBar().addPermanentWidget(self.save_status_label)
 
     def initialize_encryption(self):
-        """初始化加密系统"""
+        """初始化加密系统：首次运行时设置主密码，否则提示输入主密码并在后台解锁"""
         try:
             # 生成或加载盐值
             if os.path.exists('salt.bin'):
@@ -1806,21 +4136,23 @@ class PasswordManager(QMainWindow):
                     f.write(self.salt)
             
             # 检查主密码文件
-            if not os.path.exists('master.key'):
-                # 首次运行时要求用户设置主密码
-                self.set_master_password()
-            else:
-                # 验证主密码
+            if os.path.exists('master.key'):
+                # 验证主密码，解锁完成后自动加载数据
                 self.verify_master_password()
-                
+                return
+            
+            # 首次运行时要求用户设置主密码
+            self.set_master_password()
+            
             # 确保主密码已设置
-            if not self.master_password:
+            if self.session_key is None:
                 QMessageBox.critical(
                     self, "错误",
                     "主密码设置失败，程序将退出。\n\n" +
                     "如果问题持续存在，请删除 master.key 和 salt.bin 文件后重试。"
                 )
                 sys.exit(1)
+            self.load_data()
                 
         except Exception as e:
             QMessageBox.critical(
@@ -1851,13 +4183,6 @@ class PasswordManager(QMainWindow):
                     box = QMessageBox(self)
                     box.setWindowTitle("确认退出")
                     box.setText("您确定要退出程序吗？\n如果不设置主密码，将无法使用密码管理器。")
-                    if self.is_dark_mode:
-                        box.setStyleSheet("""
-                            QMessageBox { background-color: #23272e; color: #e0e0e0; }
-                            QLabel { color: #e0e0e0; }
-                            QPushButton { background-color: #424242; color: #e0e0e0; border-radius: 6px; padding: 8px 18px; }
-                            QPushButton:hover { background-color: #616161; }
-                        """)
                     box.setIcon(QMessageBox.Icon.Question)
                     box.setStandardButtons(QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No)
                     box.setDefaultButton(QMessageBox.StandardButton.No)
@@ -1893,7 +4218,7 @@ class PasswordManager(QMainWindow):
                     self.show_messagebox('warn', "密码不匹配", "两次输入的密码不一致，请重新设置。")
                     continue
                 try:
-                    self.master_password = password
+                    self.replace_session_key(SessionKey.derive(password, self.salt, self.calibrated_kdf_params()))
                     self.save_master_key()
                     self.show_messagebox('info', "设置成功", "主密码设置成功！\n\n请务必记住您的主密码，如果忘记将无法恢复您的密码数据。")
                     break
@@ -1905,7 +4230,7 @@ class PasswordManager(QMainWindow):
             sys.exit(1)
 
     def verify_master_password(self):
-        """验证主密码"""
+        """提示输入主密码，校验和加载在后台线程中进行"""
         while True:
             password, ok = self.get_text_input(
                 "验证主密码",
@@ -1920,55 +4245,63 @@ class PasswordManager(QMainWindow):
                 box.setStandardButtons(QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No)
                 box.setDefaultButton(QMessageBox.StandardButton.No)
                 
-                # 设置按钮样式
-                for btn in box.buttons():
-                    if btn.text() in ["&Yes", "Yes", "是"]:
-                        btn.setStyleSheet("""
-                            QPushButton {
-                                background-color: #2196f3;
-                                color: white;
-                                border: none;
-                                border-radius: 6px;
-                                padding: 8px 18px;
-                                font-size: 14px;
-                                min-width: 80px;
-                            }
-                            QPushButton:hover {
-                                background-color: #1976d2;
-                            }
-                        """)
-                    elif btn.text() in ["&No", "No", "否"]:
-                        btn.setStyleSheet("""
-                            QPushButton {
-                                background-color: #9E9E9E;
-                                color: white;
-                                border: none;
-                                border-radius: 6px;
-                                padding: 8px 18px;
-                                font-size: 14px;
-                                min-width: 80px;
-                            }
-                            QPushButton:hover {
-                                background-color: #757575;
-                            }
-                        """)
+                ThemeEngine.decorate_dialog_buttons(box)
                 
                 reply = box.exec()
                 if reply == QMessageBox.StandardButton.Yes:
                     sys.exit(0)
                 continue
-            key = PBKDF2(password.encode(), self.salt, dkLen=32)
-            try:
-                with open('master.key', 'rb') as f:
-                    stored_key = f.read()
-                if key == stored_key:
-                    self.master_password = password
-                    break
-                else:
-                    self.show_messagebox('warn', "密码错误", "您输入的主密码不正确，请重试。\n\n如果忘记主密码，将无法恢复您的密码数据。")
-            except Exception as e:
-                self.show_messagebox('crit', "验证失败", f"验证主密码时发生错误：\n{str(e)}\n\n如果问题持续存在，请联系技术支持。")
-                sys.exit(1)
+            # 使用 master.key 中记录的参数派生，结果通过信号回到 GUI 线程
+            self.entries_by_id = {}
+            self.list_model.set_entries([])
+            self.set_loading("正在解锁…")
+            self.unlock_pipeline.start(password, self.salt)
+            break
+
+    def on_unlock_rejected(self):
+        self.set_loading(None)
+        self.show_messagebox('warn', "密码错误", "您输入的主密码不正确，请重试。\n\n如果忘记主密码，将无法恢复您的密码数据。")
+        self.verify_master_password()
+
+    def on_unlock_failed(self, error):
+        self.show_messagebox('crit', "验证失败", f"验证主密码时发生错误：\n{error}\n\n如果问题持续存在，请联系技术支持。")
+        sys.exit(1)
+
+    def on_unlocked(self, session_key):
+        self.replace_session_key(session_key)
+        self.set_loading("正在加载…")
+
+    @timed
+    def on_entries_batch(self, entries):
+        """解锁线程每解密一批条目就加入列表"""
+        if self.session_key is None:
+            return
+        for entry in entries:
+            self.entries_by_id[entry['id']] = entry
+            if not self.index_cached:
+                self.search_index.add(entry)
+        self.append_list_items([entry for entry in entries
+                                if entry.get('group', '默认分组') == self.current_group])
+        self.refresh_group_counts()
+
+    def on_load_failed(self, error):
+        self.show_messagebox('warn', "错误", f"加载密码失败: {error}")
+        self.entries_by_id = {}
+        self.search_index.clear()
+        self.update_list()
+        self.refresh_groups()
+        # 保持加载状态：没有读入的条目不能被保存覆盖
+        self.set_loading("加载失败，数据未修改。请锁定后重新解锁")
+
+    def set_loading(self, text):
+        """显示解锁或加载状态，期间禁用修改数据的按钮和快捷键；text 为 None 时结束加载状态"""
+        for button in (self.new_btn, self.edit_btn, self.delete_btn, self.share_btn, self.settings_btn):
+            button.setEnabled(text is None)
+        self.set_shortcuts_enabled(text is None)
+        if text is None:
+            self.statusBar().clearMessage()
+        else:
+            self.statusBar().showMessage(text)
 
     def is_password_strong(self, password):
         """检查密码强度"""
@@ -1984,12 +4317,55 @@ class PasswordManager(QMainWindow):
             return False
         return True
 
+    def replace_session_key(self, session_key):
+        """替换会话密钥，旧密钥立即清零失效"""
+        if self.session_key is not None and self.session_key is not session_key:
+            # 排队的保存仍使用旧密钥，先写完再清零
+            self.flush_saves()
+            self.session_key.wipe()
+        self.session_key = session_key
+
+    def rekey(self, session_key, entries, salt=None):
+        """用新的会话密钥（导入时还有新的盐值）全量写入 entries，成功后才切换密钥
+
+        先写完排队的保存，再同步写入新密钥加密的快照，然后替换 salt.bin 和 master.key，
+        最后切换会话密钥。任何一步失败都抛出异常，存储、主密码文件和当前密钥保持原样。"""
+        if not self.saver.flush():
+            raise RuntimeError("之前的修改保存失败，请先重新保存")
+        self.write_snapshot(session_key, entries)
+        files = [('master.key', session_key.master_key_data())]
+        if salt is not None:
+            files.insert(0, ('salt.bin', salt))
+        replaced = []
+        try:
+            # 两个文件都写好临时文件后再依次替换，缩短不一致的时间
+            for path, data in files:
+                with open(path + '.tmp', 'wb') as f:
+                    f.write(data)
+                    f.flush()
+                    os.fsync(f.fileno())
+            for path, _ in files:
+                os.replace(path + '.tmp', path)
+                replaced.append(path)
+        except Exception:
+            # 恢复已替换的文件和用原来的密钥加密的快照
+            if 'salt.bin' in replaced:
+                write_file_atomic('salt.bin', self.salt)
+            self.write_snapshot(self.session_key, entries)
+            raise
+        if salt is not None:
+            self.salt = salt
+        self.replace_session_key(session_key)
+        self.secret_cache.clear()
+
+    def calibrated_kdf_params(self):
+        """按存储配置校准新主密码使用的密钥派生参数"""
+        return calibrate_kdf(self.vault_config['kdf'], self.vault_config['kdf_target_ms'])
+
     def save_master_key(self):
-        """保存主密码密钥"""
+        """保存主密码的密钥派生参数和校验值"""
         try:
-            key = PBKDF2(self.master_password.encode(), self.salt, dkLen=32)
-            with open('master.key', 'wb') as f:
-                f.write(key)
+            write_file_atomic('master.key', self.session_key.master_key_data())
         except Exception as e:
             self.show_messagebox('crit', "错误", f"保存主密码密钥时发生错误：{str(e)}")
             sys.exit(1)
@@ -1997,8 +4373,8 @@ class PasswordManager(QMainWindow):
     def encrypt_data(self, data):
         """加密数据"""
         try:
-            # 使用 PBKDF2 生成密钥
-            key = PBKDF2(self.master_password.encode(), self.salt, dkLen=32)
+            # 使用会话密钥，无需重复派生
+            key = self.session_key.key
             
             # 生成随机 IV
             iv = get_random_bytes(AES.block_size)
@@ -2023,268 +4399,447 @@ class PasswordManager(QMainWindow):
             self.show_messagebox('crit', "错误", f"加密数据时发生错误：{str(e)}")
             return None
 
-    def decrypt_data(self, encrypted_data):
-        """解密数据"""
+    def decrypt_data(self, encrypted_data, on_batch=None, session_key=None):
+        """解密数据，失败时抛出异常
+
+        可能在解锁线程中执行，不能访问界面，这时由调用方传入 session_key。on_batch 用于 2.0 格式边解密边显示。"""
+        session_key = session_key or self.session_key
+        self.loaded_version = None
+        if not isinstance(encrypted_data, str):
+            # 二进制容器直接在缓冲区上解析，其余按 JSON 包装的旧格式处理
+            if encrypted_data[:len(VAULT_MAGIC)] == VAULT_MAGIC:
+                version = unpack_container_prefix(encrypted_data)[0]
+                if version in (RecordVault.CONTAINER_VERSION, RecordVault.LEGACY_CONTAINER_VERSION):
+                    entries = self.record_vault.load_container(encrypted_data, session_key, on_batch)
+                    self.loaded_version = RecordVault.VERSION
+                elif version == StreamVault.CONTAINER_VERSION:
+                    entries = self.decrypt_stream(encrypted_data, session_key)
+                    self.loaded_version = StreamVault.VERSION
+                else:
+                    raise ValueError(f"不支持的加密版本: {version}")
+                return entries
+            encrypted_data = encrypted_data[:].decode('utf-8')
+        # 尝试解析为新格式
         try:
-            # 尝试解析为新格式
+            data = json.loads(encrypted_data)
+            # 检查版本（如果没有version字段，默认为1.0）
+            version = data.get('version', '1.0')
+            if version == RecordVault.VERSION:
+                entries = self.record_vault.load(data, session_key, on_batch)
+                self.loaded_version = version
+                return entries
+            if version != '1.0':
+                raise ValueError(f"不支持的加密版本: {version}")
+            # 解码 IV 和密文
+            iv = base64.b64decode(data['iv'])
+            ct = base64.b64decode(data['ciphertext'])
+            # 使用会话密钥
+            key = session_key.key
+            # 创建解密器
+            cipher = AES.new(key, AES.MODE_CBC, iv)
+            # 解密数据
+            pt = unpad(cipher.decrypt(ct), AES.block_size)
+            entries = json.loads(pt.decode('utf-8'))
+            self.loaded_version = version
+            return entries
+        except (json.JSONDecodeError, KeyError, TypeError):
+            # 如果不是JSON格式或缺少字段，尝试作为旧格式处理
             try:
-                data = json.loads(encrypted_data)
-                # 检查版本（如果没有version字段，默认为1.0）
-                version = data.get('version', '1.0')
-                if version != '1.0':
-                    raise ValueError(f"不支持的加密版本: {version}")
-                # 解码 IV 和密文
-                iv = base64.b64decode(data['iv'])
-                ct = base64.b64decode(data['ciphertext'])
-                # 使用 PBKDF2 生成密钥
-                key = PBKDF2(self.master_password.encode(), self.salt, dkLen=32)
-                # 创建解密器
-                cipher = AES.new(key, AES.MODE_CBC, iv)
-                # 解密数据
-                pt = unpad(cipher.decrypt(ct), AES.block_size)
-                return json.loads(pt.decode('utf-8'))
-            except (json.JSONDecodeError, KeyError, TypeError):
-                # 如果不是JSON格式或缺少字段，尝试作为旧格式处理
-                try:
-                    ct = base64.b64decode(encrypted_data)
-                    key = PBKDF2(self.master_password.encode(), self.salt, dkLen=32)
-                    cipher = AES.new(key, AES.MODE_CBC, ct[:16])  # 前16字节作为IV
-                    pt = unpad(cipher.decrypt(ct[16:]), AES.block_size)
-                    return json.loads(pt.decode('utf-8'))
-                except Exception as e:
-                    raise ValueError(f"解密旧版本数据失败: {str(e)}")
-        except Exception as e:
-            self.show_messagebox('crit', "错误", f"解密数据时发生错误：{str(e)}")
-            return []  # 确保返回空列表而不是 None
+                ct = base64.b64decode(encrypted_data)
+                key = session_key.key
+                cipher = AES.new(key, AES.MODE_CBC, ct[:16])  # 前16字节作为IV
+                pt = unpad(cipher.decrypt(ct[16:]), AES.block_size)
+                entries = json.loads(pt.decode('utf-8'))
+                self.loaded_version = 'legacy'
+                return entries
+            except Exception as e:
+                raise ValueError(f"解密旧版本数据失败: {str(e)}")
+
+    def decrypt_stream(self, stream, session_key=None):
+        """解密 3.0 流式容器（文件对象或 mmap）"""
+        session_key = session_key or self.session_key
+        stream.seek(0)
+        kdf_params, salt, header = StreamVault.read_header(stream)
+        check_kdf_params(kdf_params, session_key)
+        if salt != self.salt:
+            raise ValueError("数据文件的盐值与当前密码库不一致")
+        return list(StreamVault.iter_entries(stream, session_key.key, header))
 
+    @timed
     def load_data(self):
-        """加载密码数据"""
+        """加载密码数据（导入数据等需要立即刷新时同步调用）"""
+        try:
+            # 先写完排队的保存，保证读到的是最新数据
+            self.flush_saves()
+            self.finish_loading(self.read_vault(self.session_key))
+        except Exception as e:
+            self.show_messagebox('warn', "错误", f"加载密码失败: {str(e)}")
+            self.entries_by_id = {}
+            self.vault_loaded = False
+            self.set_loading("加载失败，数据未修改。请锁定后重新解锁")
+
+    @timed
+    def read_vault(self, session_key, on_batch=None):
+        """读取并解密当前存储后端的条目，返回 (条目列表, 是否需要全量保存)
+
+        解锁时在后台线程中执行，不能访问界面，也不设置 self.session_key，解密路径都使用传入的会话密钥。"""
+        self.index_cached = False
+        self.loaded_index = None
+        if self.sqlite_vault is None:
+            self.migrate_from_sqlite(session_key)
+            return self.read_json_vault(session_key, on_batch)
+        with self.storage_lock:
+            if self.sqlite_vault.initialized():
+                return self.sqlite_vault.load(session_key.key), False
+        # 首次使用 SQLite 时从 JSON 数据文件一次性迁移，原文件保留作为备份
+        if not os.path.exists(self.data_file):
+            return [], True
+        entries, _ = self.read_json_vault(session_key, on_batch)
+        return entries, self.loaded_version is not None
+
+    def migrate_from_sqlite(self, session_key):
+        """切换回 JSON 后端后第一次解锁时，把 SQLite 数据库中的条目写回数据文件
+
+        数据库比数据文件新，写入成功后改名为 .db.bak 保留作为备份，之后不再迁移；
+        写入失败时数据库保持不变，下次解锁重试。"""
+        if not os.path.exists(self.sqlite_path):
+            return
+        vault = SqliteVault(self.sqlite_path)
+        try:
+            if not vault.initialized():
+                return
+            entries = vault.load(session_key.key)
+        finally:
+            vault.close()
         if os.path.exists(self.data_file):
-            try:
-                with open(self.data_file, 'r', encoding='utf-8') as f:
-                    encrypted_data = f.read()
-                    if not encrypted_data:  # 如果文件为空
-                        self.passwords = []
-                        return
-                    decrypted_data = self.decrypt_data(encrypted_data)
-                    if decrypted_data is None:  # 如果解密失败
-                        self.passwords = []
-                        return
-                    self.passwords = decrypted_data
-                # 收集所有分组
-                all_groups = set([p.get("group", "默认分组") for p in self.passwords])
-                self.groups = ["默认分组"] + [g for g in all_groups if g != "默认分组"]
-                self.password_list.clear()
-                self.password_list.addItems(self.groups)
-                self.update_list()
-            except Exception as e:
-                self.show_messagebox('warn', "错误", f"加载密码失败: {str(e)}")
-                self.passwords = []
-        else:
-            self.passwords = []
+            # 先读入旧数据文件的记录表，全量写入时换用新一代记录文件并删除旧的
+            self.read_json_vault(session_key)
+        self.write_snapshot(session_key, entries)
+        os.replace(self.sqlite_path, self.sqlite_path + '.bak')
+        for suffix in ('-wal', '-shm'):
+            if os.path.exists(self.sqlite_path + suffix):
+                os.remove(self.sqlite_path + suffix)
+
+    def read_json_vault(self, session_key, on_batch=None):
+        """从数据文件和日志读取条目，返回 (条目列表, 是否需要全量保存)"""
+        self.loaded_version = None
+        if not os.path.exists(self.data_file):
+            return [], True  # 新密码库，创建数据文件
+        # 索引缓存与数据文件和日志一致时，分批送回的条目不必逐条加入索引
+        digest = self.index_sidecar.digest(session_key.key, self.record_vault.lazy)
+        self.index_cached = self.index_sidecar.matches(digest)
+        with open(self.data_file, 'rb') as f:
+            if os.fstat(f.fileno()).st_size == 0:  # 如果文件为空
+                return [], False
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as encrypted_data:
+                entries = self.decrypt_data(encrypted_data, on_batch, session_key)
+        # 旧版本数据透明迁移为 2.0 逐条加密格式
+        ids_added = self.ensure_entry_ids(entries)
+        # 在快照之上重放日志
+        entries = self.journal.replay(session_key.key, entries)
+        if self.record_vault.lazy:
+            # 日志中的条目带有密码和备注，和快照中的条目一样只保留元数据，需要时从日志中读取
+            changed_ids = self.journal.changed_ids
+            entries = [split_secrets(entry)[0] if entry['id'] in changed_ids else entry for entry in entries]
+        if self.index_cached:
+            self.loaded_index = self.index_sidecar.load(session_key.key, digest, entries)
+        # 没有用上缓存时，锁定时需要重新写入
+        self.index_digest = digest if self.loaded_index is not None else None
+        return entries, self.loaded_version != RecordVault.VERSION or ids_added
+
+    @timed
+    def finish_loading(self, result):
+        """在 GUI 线程中使用读取结果，结束加载状态"""
+        entries, needs_save = result
+        streamed = self.passwords
+        self.entries_by_id = {entry['id']: entry for entry in entries}
+        # 条目已全部读入，从这里开始才允许保存
+        self.vault_loaded = True
+        if needs_save:
             self.save_passwords()
+        elif self.sqlite_vault is None and self.loaded_version is not None:
+            self.maybe_compact()
+        changed = len(streamed) != len(entries) or any(a is not b for a, b in zip(streamed, entries))
+        if self.loaded_index is not None:
+            # 从索引缓存恢复，索引是按日志重放后的条目建立的
+            self.search_index.take(self.loaded_index)
+            self.loaded_index = None
+        elif changed or self.index_cached:
+            # 日志重放或旧格式迁移改变了条目，或者索引缓存读取失败，重新建立搜索索引
+            self.search_index.build(entries)
+        self.index_cached = False
+        self.index_ready = True
+        # 快速搜索的位图在后台建立，第一次按键不必等待
+        threading.Thread(target=self.search_index.prepare_fuzzy, daemon=True).start()
+        if changed:
+            self.update_list()
+        # 分组随条目加入索引时已经收集好
+        self.refresh_groups()
+        self.set_loading(None)
     
-    def save_passwords(self):
-        """保存密码数据"""
+    def ensure_entry_ids(self, entries=None):
+        """为缺少ID的条目补充稳定ID，返回是否有补充"""
+        added = False
+        for password in self.passwords if entries is None else entries:
+            if not password.get('id'):
+                password['id'] = new_entry_id()
+                added = True
+        return added
+
+    @timed
+    def save_passwords(self, changed=None, deleted=None):
+        """保存密码数据
+
+        changed/deleted 为本次变更的条目和被删除的条目ID；都不指定时全量写入。
+        实际写入在后台保存线程中进行，连续的多次保存会合并为一次写入。"""
         try:
-            encrypted_data = self.encrypt_data(self.passwords)
-            if encrypted_data:
-                # 使用临时文件进行原子写入
-                temp_file = self.data_file + '.tmp'
-                with open(temp_file, 'w', encoding='utf-8') as f:
-                    f.write(encrypted_data)
-                # 原子性地替换原文件
-                os.replace(temp_file, self.data_file)
+            if not self.vault_loaded:
+                # 只读入了部分条目时，全量快照会覆盖还没有读入的条目
+                raise RuntimeError("密码库尚未加载完成")
+            full = changed is None and deleted is None
+            if full or (self.sqlite_vault is None and not self.record_vault.loaded):
+                self.saver.submit_full(self.full_entries(self.passwords))
+            else:
+                self.saver.submit(self.full_entries(changed or []), deleted or [])
+            self.save_status_label.setText("正在保存…")
         except Exception as e:
             self.show_messagebox('crit', "错误", f"保存密码数据时发生错误：{str(e)}")
+
+    def write_snapshot(self, session_key, entries):
+        """用 session_key 全量写入 entries；写入失败时存储中仍是原来的数据"""
+        if self.sqlite_vault is not None:
+            with self.storage_lock:
+                self.sqlite_vault.replace_all(session_key.key, entries)
+            return
+        # 全量写入快照后日志中的变更都已包含在内
+        self.wait_for_compaction()
+        with self.storage_lock:
+            self.record_vault.write_all(session_key, entries)
+            self.journal.reset()
+
+    def write_passwords(self, full, changed, deleted):
+        """把一批变更写入存储（在保存线程中执行）"""
+        key = self.session_key.key
+        if full is not None:
+            self.write_snapshot(self.session_key, full)
+        elif self.sqlite_vault is not None:
+            # 只写入变更的行
+            with self.storage_lock:
+                self.sqlite_vault.apply_changes(key, changed, deleted)
+        else:
+            # 增量变更只追加到日志，耗时与密码库大小无关
+            ops = [{'op': 'put', 'entry': entry} for entry in changed]
+            ops += [{'op': 'delete', 'id': entry_id} for entry_id in deleted]
+            self.journal.append_many(key, ops)
+
+    def on_passwords_saved(self):
+        """保存线程写完队列后回到 GUI 线程"""
+        self.save_status_label.setText("已保存")
+        if self.sqlite_vault is None and self.session_key is not None:
+            self.maybe_compact()
+
+    def on_save_failed(self, error):
+        """写入失败的变更已被丢弃，询问是否用内存中的当前数据重新全量保存"""
+        self.save_status_label.setText("保存失败")
+        if self.session_key is None:
+            self.show_messagebox('crit', "错误", f"保存密码数据时发生错误：{error}")
+            return
+        reply = self.show_messagebox('yesno', "保存失败",
+            f"保存密码数据时发生错误：{error}\n\n" +
+            "是否用当前数据重新保存？")
+        if reply == QMessageBox.StandardButton.Yes:
+            self.save_passwords()
+
+    def save_search_index(self):
+        """变更都已写入后保存索引缓存，密码库自上次保存后没有变化时跳过"""
+        if self.sqlite_vault is not None or not self.index_ready or self.session_key is None:
+            return
+        self.wait_for_compaction()
+        try:
+            key = self.session_key.key
+            digest = self.index_sidecar.digest(key, self.record_vault.lazy)
+            if digest != self.index_digest:
+                self.index_sidecar.write(key, digest, self.search_index)
+                self.index_digest = digest
+        except Exception as e:
+            # 缓存只影响下次解锁的速度，写入失败时下次重新建立索引
+            print(f"保存搜索索引失败: {str(e)}")
+
+    def flush_saves(self):
+        """等待后台保存写完，返回是否全部写入"""
+        if self.saver.flush():
+            return True
+        self.show_messagebox('crit', "错误", "保存密码数据失败，部分修改尚未写入磁盘")
+        return False
+
+    def full_entry(self, entry, cache=True):
+        """返回包含密码和备注的完整条目；lazy 模式下只有元数据的条目按需解密
+
+        cache 为 False 时不放入缓存，用于导出、全量保存等批量操作。"""
+        if 'password' in entry or self.sqlite_vault is not None:
+            return entry
+        secrets = self.secret_cache.get(entry['id'])
+        if secrets is None:
+            with self.storage_lock:
+                # 日志中的记录比快照新，先查日志
+                secrets = self.journal.read_secrets(self.session_key.key, entry['id'])
+                if secrets is None:
+                    secrets = self.record_vault.read_secrets(self.session_key.key, entry['id'])
+            if secrets is None:
+                return entry
+            if cache:
+                self.secret_cache.put(entry['id'], secrets)
+        return {**entry, **secrets}
+
+    def keep_secrets(self, entry):
+        """lazy 模式下返回去掉密码和备注的条目，密码和备注放入缓存，和加载时一样只在内存中保留元数据
+
+        传入的完整条目不会被修改，用于保存。"""
+        if not self.record_vault.lazy or self.sqlite_vault is not None:
+            return entry
+        meta, secrets = split_secrets(entry)
+        self.secret_cache.put(entry['id'], secrets)
+        return meta
+
+    @property
+    def passwords(self):
+        """全部条目的列表，按加入顺序，由 entries_by_id 生成"""
+        return list(self.entries_by_id.values())
+
+    def full_entries(self, entries):
+        return [self.full_entry(entry, cache=False) for entry in entries]
+
+    def group_entries(self, group):
+        """返回指定分组的条目，不需要扫描全部条目
+
+        SQLite 后端在没有待写入的修改时通过分组列的索引查出条目ID；否则数据库还不是最新的，
+        和 JSON 后端一样从内存中的分组索引取。"""
+        if self.sqlite_vault is not None and self.vault_loaded and self.saver.idle():
+            with self.storage_lock:
+                ids = self.sqlite_vault.group_ids(self.session_key.key, group)
+            by_id = self.entries_by_id
+            return [by_id[entry_id] for entry_id in ids if entry_id in by_id]
+        return self.search_index.group_entries(group)
+
+    def maybe_compact(self):
+        """日志超过配置的大小或记录数时，在后台线程中合并到快照"""
+        if not self.journal.needs_compaction(self.vault_config):
+            return
+        if self.compaction_thread is not None and self.compaction_thread.is_alive():
+            return
+        changed_ids, deleted_ids, offset, records = self.journal.take_pending()
+        by_id = self.entries_by_id
+        changed = [dict(entry) for entry in self.full_entries(by_id[entry_id] for entry_id in changed_ids if entry_id in by_id)]
+        self.compaction_thread = threading.Thread(
+            target=self.compact_journal,
+            args=(changed, deleted_ids, offset, records),
+            daemon=True
+        )
+        self.compaction_thread.start()
+
+    def compact_journal(self, changed, deleted_ids, offset, records):
+        """把日志中的变更写入快照（后台线程执行）"""
+        try:
+            with self.storage_lock:
+                self.record_vault.write_changes(self.session_key, changed, deleted_ids)
+                self.journal.discard_until(offset, records)
+        except Exception as e:
+            # 日志仍然完整，下次合并时重试
+            self.journal.restore_pending([entry['id'] for entry in changed], deleted_ids)
+            print(f"合并日志失败: {str(e)}")
+
+    def wait_for_compaction(self):
+        """等待正在进行的后台合并完成（GUI 线程和保存线程都会调用）"""
+        thread = self.compaction_thread
+        if thread is not None:
+            thread.join()
     
+    @timed
     def update_list(self):
-        self.password_list.clear()
-        for password in self.passwords:
-            item = QListWidgetItem(password['title'])
-            if password.get('group', '默认分组') != '默认分组':
-                item.setText(f"{password['title']} ({password['group']})")
-            self.password_list.addItem(item)
+        self.search_worker.cancel()
+        self.list_model.set_entries(self.group_entries(self.current_group))
+
+    def group_label(self, group):
+        return f"{group} ({self.search_index.groups.count(group)})"
+
+    def refresh_groups(self):
+        """重新填充分组选择框并选中当前分组，不触发切换"""
+        groups = self.search_index.groups
+        if self.current_group not in groups.members:
+            self.current_group = groups.DEFAULT
+        self.group_combo.blockSignals(True)
+        self.group_combo.clear()
+        for group in groups.names():
+            self.group_combo.addItem(self.group_label(group), group)
+        self.group_combo.setCurrentIndex(self.group_combo.findData(self.current_group))
+        self.group_combo.blockSignals(False)
+
+    def refresh_group_counts(self):
+        """条目增删后只更新各分组显示的数量"""
+        for i in range(self.group_combo.count()):
+            self.group_combo.setItemText(i, self.group_label(self.group_combo.itemData(i)))
+
+    def append_list_items(self, entries):
+        self.list_model.append_entries(entries)
     
+    def selected_entry(self):
+        """当前选中行的条目，通过行上记录的ID查找"""
+        current = self.password_list.currentIndex()
+        if not current.isValid():
+            return None
+        return self.entries_by_id.get(current.data(Qt.ItemDataRole.UserRole))
+
+    @timed
     def show_password_details(self, current, previous):
-        if current is None:
+        entry = None
+        if current is not None and current.isValid():
+            entry = self.entries_by_id.get(current.data(Qt.ItemDataRole.UserRole))
+        if entry is None:
             # 显示使用教程
-            text_color = "#606266"
-            border_color = "#dcdfe6"
-            header_bg = "#f5f7fa"
-            row_bg = "#ffffff"
-            hover_bg = "#f5f7fa"
-            header_text = "#909399"
-            container_bg = "#ffffff"
-            
-            tutorial = f"""
-            <div style="font-family: 'Microsoft YaHei', '微软雅黑', sans-serif; background-color: {container_bg}; padding: 20px; border-radius: 8px;">
-                <table style="width: 100%; border-collapse: separate; border-spacing: 0; border-radius: 4px; overflow: hidden; border: 1px solid {border_color};">
-                    <thead>
-                        <tr>
-                            <th style="background-color: {header_bg}; padding: 12px 20px; text-align: left; font-weight: 500; color: {header_text}; font-size: 14px;">功能说明</th>
-                        </tr>
-                    </thead>
-                    <tbody>
-                        <tr style="background-color: {row_bg};">
-                            <td style="padding: 12px 20px; color: {text_color}; font-size: 14px; line-height: 1.5;">
-                                点击左侧面板底部的"新建密码"按钮，填写密码信息并保存
-                            </td>
-                        </tr>
-                        <tr style="background-color: {row_bg};">
-                            <td style="padding: 12px 20px; color: {text_color}; font-size: 14px; line-height: 1.5;">
-                                在左侧搜索框中输入关键词，可以快速查找密码
-                            </td>
-                        </tr>
-                        <tr style="background-color: {row_bg};">
-                            <td style="padding: 12px 20px; color: {text_color}; font-size: 14px; line-height: 1.5;">
-                                选择密码项后，点击右侧的"修改"按钮进行编辑
-                            </td>
-                        </tr>
-                        <tr style="background-color: {row_bg};">
-                            <td style="padding: 12px 20px; color: {text_color}; font-size: 14px; line-height: 1.5;">
-                                选择密码项后，点击右侧的"删除"按钮删除密码
-                            </td>
-                        </tr>
-                        <tr style="background-color: {row_bg};">
-                            <td style="padding: 12px 20px; color: {text_color}; font-size: 14px; line-height: 1.5;">
-                                选择密码项后，点击右侧的"分享"按钮，可以通过局域网或热点分享密码
-                            </td>
-                        </tr>
-                        <tr style="background-color: {row_bg};">
-                            <td style="padding: 12px 20px; color: {text_color}; font-size: 14px; line-height: 1.5;">
-                                • 点击密码详情中的"复制"按钮可以快速复制内容<br>
-                                • 点击"显示"按钮可以查看密码明文<br>
-                                • 按住Ctrl点击登录地址可以直接打开链接
-                            </td>
-                        </tr>
-                    </tbody>
-                </table>
-            </div>
-            """
-            self.details_label.setText(tutorial)
+            self.details_panel.show_tutorial()
             return
             
-        # 密码详情显示
-        index = self.password_list.row(current)
-        password = self.passwords[index]
-        
-        # 根据当前主题设置颜色
-        text_color = "#e0e0e0" if self.is_dark_mode else "#606266"
-        border_color = "#424242" if self.is_dark_mode else "#dcdfe6"
-        header_bg = "#2d2d2d" if self.is_dark_mode else "#f5f7fa"
-        row_bg = "#1e1e1e" if self.is_dark_mode else "#ffffff"
-        hover_bg = "#2d2d2d" if self.is_dark_mode else "#f5f7fa"
-        header_text = "#e0e0e0" if self.is_dark_mode else "#909399"
-        link_color = "#409eff" if self.is_dark_mode else "#409eff"
-        copy_color = "#67c23a" if self.is_dark_mode else "#67c23a"  # 复制操作使用绿色
-        show_color = "#e6a23c" if self.is_dark_mode else "#e6a23c"  # 显示操作使用橙色
-        link_hover = "#66b1ff" if self.is_dark_mode else "#66b1ff"
-        copy_hover = "#85ce61" if self.is_dark_mode else "#85ce61"
-        show_hover = "#ebb563" if self.is_dark_mode else "#ebb563"
-        
-        details = f"""
-        <div style="font-family: 'Microsoft YaHei', '微软雅黑', sans-serif;">
-            <table style="width: 100%; border-collapse: separate; border-spacing: 0; border-radius: 4px; overflow: hidden;">
-                <thead>
-                    <tr>
-                        <th style="background-color: {header_bg}; padding: 12px 20px; text-align: left; font-weight: 500; color: {header_text}; font-size: 14px; width: 120px;">字段</th>
-                        <th style="background-color: {header_bg}; padding: 12px 20px; text-align: left; font-weight: 500; color: {header_text}; font-size: 14px;">内容</th>
-                        <th style="background-color: {header_bg}; padding: 12px 20px; text-align: center; font-weight: 500; color: {header_text}; font-size: 14px; width: 120px;">操作</th>
-                    </tr>
-                </thead>
-                <tbody>
-                    <tr style="background-color: {row_bg};">
-                        <td style="padding: 12px 20px; color: {text_color}; font-size: 14px;">用户名</td>
-                        <td style="padding: 12px 20px; color: {text_color}; font-size: 14px; font-family: Consolas, Monaco, monospace;">{password["username"]}</td>
-                        <td style="padding: 12px 20px; text-align: center;">
-                            <a href="copy:{password["username"]}" class="el-link" style="color: {copy_color}; text-decoration: none; font-size: 14px; margin: 0 4px; transition: color 0.3s;">
-                                复制
-                            </a>
-                        </td>
-                    </tr>
-                    <tr style="background-color: {row_bg};">
-                        <td style="padding: 12px 20px; color: {text_color}; font-size: 14px;">密码</td>
-                        <td style="padding: 12px 20px; color: {text_color}; font-size: 14px; font-family: Consolas, Monaco, monospace;">
-                            {password["password"]}
-                        </td>
-                        <td style="padding: 12px 20px; text-align: center;">
-                            <a href="copy:{password["password"]}" class="el-link" style="color: {copy_color}; text-decoration: none; font-size: 14px; transition: color 0.3s;">
-                                复制
-                            </a>
-                        </td>
-                    </tr>
-        """
-        
-        if password.get('url'):
-            details += f"""
-                    <tr style="background-color: {row_bg};">
-                        <td style="padding: 12px 20px; color: {text_color}; font-size: 14px;">登录地址</td>
-                        <td style="padding: 12px 20px; color: {text_color}; font-size: 14px;">
-                            <a href="{password["url"]}" style="color: {link_color}; text-decoration: none; transition: color 0.3s;">{password["url"]}</a>
-                            <span style="color: #909399; margin-left: 8px; font-size: 12px;">(按住Ctrl点击打开)</span>
-                        </td>
-                        <td style="padding: 12px 20px; text-align: center;">
-                            <a href="copy:{password["url"]}" class="el-link" style="color: {copy_color}; text-decoration: none; font-size: 14px; transition: color 0.3s;">
-                                复制
-                            </a>
-                        </td>
-                    </tr>
-            """
-        
-        if password.get('notes'):
-            details += f"""
-                    <tr style="background-color: {row_bg};">
-                        <td style="padding: 12px 20px; color: {text_color}; font-size: 14px;">备注</td>
-                        <td style="padding: 12px 20px; color: {text_color}; font-size: 14px; white-space: pre-wrap; line-height: 1.5;">{password["notes"]}</td>
-                        <td style="padding: 12px 20px; text-align: center;">
-                            <a href="copy:{password["notes"]}" class="el-link" style="color: {copy_color}; text-decoration: none; font-size: 14px; transition: color 0.3s;">
-                                复制
-                            </a>
-                        </td>
-                    </tr>
-            """
-        
-        details += """
-                </tbody>
-            </table>
-            <style>
-                tr:hover {{
-                    background-color: {hover_bg} !important;
-                }}
-                .el-link:hover {{
-                    color: {link_hover} !important;
-                }}
-                .el-link[href^="copy:"]:hover {{
-                    color: {copy_hover} !important;
-                }}
-            </style>
-            <script>
-                // 移除不再需要的密码显示/隐藏相关代码
-            </script>
-        </div>
-        """
-        
-        self.details_label.setText(details)
+        # 密码详情显示，只更新详情面板中各字段的文字
+        self.search_index.fuzzy.touch(entry['id'])
+        self.details_panel.show_entry(self.full_entry(entry))
     
     def new_group(self):
         group_name, ok = self.get_text_input("新建分组", "请输入分组名称：")
         if ok and group_name:
-            if group_name in self.groups:
+            if not self.search_index.groups.add_group(group_name):
                 self.show_messagebox('warn', "警告", "该分组已存在！")
                 return
-            self.groups.append(group_name)
-            self.password_list.addItem(group_name)
-            self.password_list.setCurrentRow(self.password_list.count() - 1)
+            self.current_group = group_name
+            self.refresh_groups()
+            self.search_passwords()
 
-    def group_changed(self, current, previous):
-        if current is None:
+    def group_changed(self, index):
+        group = self.group_combo.itemData(index)
+        if group is None or group == self.current_group:
             return
-        self.current_group = current.text()
-        self.update_list()
+        self.current_group = group
+        # 保留搜索条件，在新分组内重新搜索
+        self.search_passwords()
+
+    def pooled_dialog(self, dialog_class):
+        """每种对话框只创建一次，之后打开时调用方用 reset 换上新的数据，不再重新构建界面"""
+        dialog = self.dialog_pool.get(dialog_class)
+        if dialog is None:
+            dialog = self.dialog_pool[dialog_class] = dialog_class(self)
+        return dialog
+
+    def reset_dialogs(self):
+        """锁定时关闭打开的对话框，清空其中的明文"""
+        for dialog in self.dialog_pool.values():
+            if dialog.isVisible():
+                dialog.reject()
+            dialog.reset()
 
     def new_password(self):
-        dialog = PasswordDialog(self)
+        if not self.vault_loaded:
+            return  # 解锁和加载期间不能修改
+        dialog = self.pooled_dialog(PasswordDialog)
+        dialog.reset()
         if dialog.exec():
             password_data = {
                 'title': dialog.title_edit.text(),
@@ -2292,39 +4847,60 @@ class PasswordManager(QMainWindow):
                 'password': dialog.password_edit.text(),
                 'url': dialog.url_edit.text(),
                 'notes': dialog.notes_edit.toPlainText(),
-                'group': self.current_group
+                'group': self.current_group,
+                'id': new_entry_id()
             }
-            self.passwords.append(password_data)
-            self.save_passwords()
-            self.update_list()
+            entry = self.keep_secrets(password_data)
+            self.entries_by_id[entry['id']] = entry
+            self.search_index.add(entry)
+            self.save_passwords(changed=[password_data])
+            self.refresh_group_counts()
+            if self.search_input.text():
+                self.search_passwords()
+            else:
+                self.list_model.append_entries([entry])
+        dialog.reset()
 
     def edit_password(self):
-        current = self.password_list.currentItem()
-        if current is None:
+        if not self.vault_loaded:
+            return  # 解锁和加载期间不能修改
+        password = self.selected_entry()
+        if password is None:
             self.show_messagebox('warn', "警告", "请先选择一个密码项")
             return
-             
-        index = self.password_list.row(current)
-        group_passwords = [p for p in self.passwords if p.get('group', '默认分组') == self.current_group]
-        password = group_passwords[index]
-        actual_index = self.passwords.index(password)
         
-        dialog = PasswordDialog(self, password)
+        dialog = self.pooled_dialog(PasswordDialog)
+        dialog.reset(self.full_entry(password))
         if dialog.exec():
-            self.passwords[actual_index] = {
+            self.secret_cache.discard(password['id'])
+            password_data = {
+                **password,
                 'title': dialog.title_edit.text(),
                 'username': dialog.username_edit.text(),
                 'password': dialog.password_edit.text(),
                 'url': dialog.url_edit.text(),
                 'notes': dialog.notes_edit.toPlainText(),
-                'group': self.current_group
+                # 用 group: 搜索时列表中可能有其他分组的条目，保持条目原来的分组
+                'group': password.get('group', self.current_group)
             }
-            self.save_passwords()
-            self.update_list()
+            # 原地修改，列表、索引和 entries_by_id 中引用的都是同一个条目
+            password.clear()
+            password.update(self.keep_secrets(password_data))
+            self.search_index.add(password)
+            self.save_passwords(changed=[password_data])
+            self.list_model.replace_entry(self.password_list.currentIndex().row(), password)
+            # 当前行没有变化，不会触发 currentChanged，直接刷新详情
+            self.show_password_details(self.password_list.currentIndex(), None)
+            if self.search_input.text():
+                # 修改后可能不再匹配搜索条件
+                self.search_passwords()
+        dialog.reset()
 
     def delete_password(self):
-        current = self.password_list.currentItem()
-        if current is None:
+        if not self.vault_loaded:
+            return  # 解锁和加载期间不能修改
+        password = self.selected_entry()
+        if password is None:
             self.show_messagebox('warn', "警告", "请先选择一个密码项")
             return
              
@@ -2333,77 +4909,89 @@ class PasswordManager(QMainWindow):
                                    QMessageBox.StandardButton.No)
         
         if reply == QMessageBox.StandardButton.Yes:
-            index = self.password_list.row(current)
-            group_passwords = [p for p in self.passwords if p.get('group', '默认分组') == self.current_group]
-            password = group_passwords[index]
-            actual_index = self.passwords.index(password)
-            del self.passwords[actual_index]
-            self.save_passwords()
-            self.update_list()
+            row = self.password_list.currentIndex().row()
+            del self.entries_by_id[password['id']]
+            self.secret_cache.discard(password['id'])
+            self.search_index.remove(password['id'])
+            self.save_passwords(deleted=[password['id']])
+            self.list_model.remove_rows(row)
+            self.refresh_group_counts()
 
+    @timed
     def search_passwords(self):
-        search_text = self.search_input.text().lower()
-        self.password_list.clear()
-        
-        for password in self.passwords:
-            if password.get('group', '默认分组') == self.current_group:
-                if (search_text in password['title'].lower() or
-                    search_text in password['username'].lower() or
-                    search_text in password['notes'].lower()):
-                    self.password_list.addItem(password['title'])
+        self.search_timer.stop()
+        self.search_worker.cancel()
+        self.search_started = time.perf_counter()
+        text = self.search_input.text()
+        if not self.search_index.parse(text):
+            self.list_model.apply(self.group_entries(self.current_group))
+            self.record_search_done()
+            return
+        # 缓存中已有结果时直接显示，否则在后台通过倒排索引在当前分组内查找
+        matches = self.search_index.cached_search(text, self.current_group)
+        if matches is not None:
+            self.list_model.apply(matches)
+            self.record_search_done()
+            return
+        self.pending_search = self.search_worker.start(text, self.current_group)
+
+    def on_search_batch(self, generation, entries):
+        if generation != self.search_worker.generation:
+            return  # 已被新的输入取消
+        if generation == self.pending_search:
+            # 第一批结果替换列表，之后的按顺序追加
+            self.pending_search = None
+            self.list_model.apply(entries)
+        else:
+            self.list_model.append_entries(entries)
+
+    def on_search_finished(self, generation):
+        if generation != self.search_worker.generation:
+            return
+        if generation == self.pending_search:
+            self.pending_search = None
+            self.list_model.apply([])
+        self.record_search_done()
+
+    def record_search_done(self):
+        """诊断：search_passwords 只计入发起搜索的耗时，这里记录从发起到结果全部显示的耗时"""
+        if DIAGNOSTICS.enabled and self.search_started is not None:
+            DIAGNOSTICS.record(self.SEARCH_DONE, time.perf_counter() - self.search_started)
+        self.search_started = None
 
     def show_settings(self):
-        dialog = SettingsDialog(self)
+        dialog = self.pooled_dialog(SettingsDialog)
+        dialog.reset()
         dialog.exec()
+        dialog.reset()
 
     def toggle_theme(self):
         self.is_dark_mode = not self.is_dark_mode
         self.theme_btn.setText("☀️" if self.is_dark_mode else "🌙")
-        self.setStyleSheet(self.dark_style if self.is_dark_mode else self.light_style)
-        
-        # 更新详情显示以适应新主题
-        current_item = self.password_list.currentItem()
-        if current_item:
-            self.show_password_details(current_item, None)
-
-    def handle_link_click(self, url):
-        if url.startswith("copy:"):
-            QApplication.clipboard().setText(url[5:])
-            self.show_messagebox('info', "提示", "已复制到剪贴板")
-        elif url.startswith("http"):
-            webbrowser.open(url)
+        # 只更换应用程序的调色板，所有窗口和对话框随之重绘，不重新解析样式表
+        self.theme.apply(self.is_dark_mode)
 
-    def handle_mouse_press(self, event):
-        if event.modifiers() & Qt.KeyboardModifier.ControlModifier:
-            # 获取点击位置的文本
-            pos = event.pos()
-            text = self.details_label.text()
-            
-            # 检查是否点击了链接
-            if '<a href="' in text:
-                # 使用简单的文本匹配来查找链接
-                start = text.find('<a href="', pos.x())
-                if start != -1:
-                    end = text.find('">', start)
-                    if end != -1:
-                        url = text[start + 9:end]
-                        if url.startswith("http"):
-                            webbrowser.open(url)
-        else:
-            # 正常的选择文本行为
-            super().mousePressEvent(event)
+    def copy_to_clipboard(self, text):
+        QApplication.clipboard().setText(text)
+        self.show_messagebox('info', "提示", "已复制到剪贴板")
+
+    def open_url(self, url):
+        if url.startswith("http"):
+            webbrowser.open(url)
 
     def share_password(self):
-        current = self.password_list.currentItem()
-        if current is None:
+        password = self.selected_entry()
+        if password is None:
             self.show_messagebox('warn', "警告", "请先选择一个密码项")
             return
              
-        index = self.password_list.row(current)
-        password = self.passwords[index]
+        password = self.full_entry(password)
         
-        dialog = ShareDialog(self, password)
+        dialog = self.pooled_dialog(ShareDialog)
+        dialog.reset(password)
         dialog.exec()
+        # 关闭对话框后停止分享，清除对话框中的条目
+        dialog.reset()
         
         # 清理临时文件
         try:
@@ -2433,74 +5021,8 @@ class PasswordManager(QMainWindow):
             box.setIcon(QMessageBox.Icon.NoIcon)
             box.setStandardButtons(QMessageBox.StandardButton.Ok)
 
-        # 主题样式
-        if self.is_dark_mode:
-            box.setStyleSheet("""
-                QMessageBox {
-                    background-color: #23272e;
-                    color: #e0e0e0;
-                    font-family: 'Microsoft YaHei', '微软雅黑';
-                }
-                QLabel {
-                    color: #e0e0e0;
-                    font-size: 14px;
-                    padding: 10px;
-                }
-                QPushButton {
-                    border: none;
-                    border-radius: 6px;
-                    padding: 8px 18px;
-                    font-size: 14px;
-                    min-width: 80px;
-                }
-                QPushButton:enabled {
-                    background-color: #424242;
-                    color: #e0e0e0;
-                }
-                QPushButton:enabled:focus {
-                    outline: 2px solid #2196f3;
-                }
-                QPushButton:hover {
-                    background-color: #616161;
-                }
-            """)
-        else:
-            box.setStyleSheet("""
-                QMessageBox {
-                    background-color: #ffffff;
-                    color: #2c3e50;
-                    font-family: 'Microsoft YaHei', '微软雅黑';
-                }
-                QLabel {
-                    color: #2c3e50;
-                    font-size: 14px;
-                    padding: 10px;
-                }
-                QPushButton {
-                    border: none;
-                    border-radius: 6px;
-                    padding: 8px 18px;
-                    font-size: 14px;
-                    min-width: 80px;
-                }
-                QPushButton:enabled {
-                    background-color: #f0f0f0;
-                    color: #2c3e50;
-                }
-                QPushButton:enabled:focus {
-                    outline: 2px solid #2196f3;
-                }
-                QPushButton:hover {
-                    background-color: #e0e0e0;
-                }
-            """)
-        # 按钮着色
-        for btn in box.buttons():
-            role = box.buttonRole(btn)
-            if btn.text() in ["&Yes", "Yes", "确定", "OK", "&OK"]:
-                btn.setStyleSheet("background-color: #2196f3; color: #fff;" if not self.is_dark_mode else "background-color: #2196f3; color: #fff;")
-            elif btn.text() in ["&No", "No", "取消", "Cancel", "&Cancel"]:
-                btn.setStyleSheet("background-color: #9E9E9E; color: #fff;" if not self.is_dark_mode else "background-color: #9E9E9E; color: #fff;")
+        # 颜色继承当前主题，只给确定、取消按钮着色
+        ThemeEngine.decorate_dialog_buttons(box)
         return box.exec()
 
     def get_text_input(self, title, label, echo=QLineEdit.EchoMode.Normal):
@@ -2509,73 +5031,8 @@ class PasswordManager(QMainWindow):
         dialog.setLabelText(label)
         dialog.setTextEchoMode(echo)
         
-        # 设置对话框样式
-        dialog.setStyleSheet("""
-            QInputDialog {
-                background-color: #ffffff;
-                color: #2c3e50;
-                font-family: 'Microsoft YaHei', '微软雅黑';
-            }
-            QLabel {
-                color: #2c3e50;
-                font-size: 14px;
-                padding: 10px;
-            }
-            QLineEdit {
-                background-color: #f8f9fa;
-                color: #2c3e50;
-                border: 2px solid #e0e0e0;
-                border-radius: 6px;
-                padding: 8px 12px;
-                font-size: 14px;
-                min-height: 20px;
-            }
-            QLineEdit:focus {
-                border: 2px solid #4CAF50;
-                background-color: #ffffff;
-            }
-            QPushButton {
-                border: none;
-                border-radius: 6px;
-                padding: 8px 18px;
-                font-size: 14px;
-                min-width: 80px;
-            }
-        """)
-            
-        # 设置按钮颜色
-        for btn in dialog.findChildren(QPushButton):
-            if btn.text() in ["确定", "OK", "&OK"]:
-                btn.setStyleSheet("""
-                    QPushButton {
-                        background-color: #2196f3;
-                        color: white;
-                        border: none;
-                        border-radius: 6px;
-                        padding: 8px 18px;
-                        font-size: 14px;
-                        min-width: 80px;
-                    }
-                    QPushButton:hover {
-                        background-color: #1976d2;
-                    }
-                """)
-            elif btn.text() in ["取消", "Cancel", "&Cancel"]:
-                btn.setStyleSheet("""
-                    QPushButton {
-                        background-color: #9E9E9E;
-                        color: white;
-                        border: none;
-                        border-radius: 6px;
-                        padding: 8px 18px;
-                        font-size: 14px;
-                        min-width: 80px;
-                    }
-                    QPushButton:hover {
-                        background-color: #757575;
-                    }
-                """)
-            
+        # 颜色继承当前主题，只给确定、取消按钮着色
+        ThemeEngine.decorate_dialog_buttons(dialog)
         ok = dialog.exec()
         return dialog.textValue(), ok == QDialog.DialogCode.Accepted
 
@@ -2583,7 +5040,10 @@ def main():
     app = QApplication(sys.argv)
     window = PasswordManager()
     window.show()
-    sys.exit(app.exec())
+    code = app.exec()
+    # 退出前写完排队的保存
+    window.flush_saves()
+    sys.exit(code)
 
 if __name__ == "__main__":
     try: